@@ -0,0 +1,161 @@
+"""
+Load test the client against a stand-in Fishbowl server.
+
+Each client thread logs in with its own connection and makes requests back to
+back, reporting the overall requests per second and the p50 / p99 latency of
+each call. A local :class:`~fishbowl.fakeserver.FishbowlTestServer` is started
+unless ``--host`` and ``--port`` are given.
+
+Run with::
+
+    python benchmarks/bench_load.py [--clients 8] [--requests 200] \\
+        [--operation mixed] [--latency 0.002] [--drop-rate 0.01]
+
+Connections dropped or timed out by injected faults are counted as errors
+and reconnected.
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from fishbowl import api, fakeserver  # noqa: E402
+
+
+def query(fb, rng, args):
+    return list(fb.send_query("SELECT * FROM part LIMIT {}".format(args.rows)))
+
+
+def parts(fb, rng, args):
+    return fb.get_parts(populate_uoms=False)
+
+
+def customer(fb, rng, args):
+    name = "Customer {:06d}".format(rng.randint(1, args.customers))
+    return fb.send_request("CustomerGetRq", {"Name": name}, "CustomerGetRs")
+
+
+def product(fb, rng, args):
+    number = "P{:06d}".format(rng.randint(1, args.parts))
+    return fb.send_request("ProductGetRq", {"Number": number}, "ProductGetRs")
+
+
+OPERATIONS = {"query": query, "parts": parts, "customer": customer, "product": product}
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def client(connection_args, args, seed, latencies, errors):
+    rng = random.Random(seed)
+    if args.operation == "mixed":
+        operations = list(OPERATIONS.values())
+    else:
+        operations = [OPERATIONS[args.operation]]
+    fb = api.Fishbowl()
+    for _ in range(args.requests):
+        operation = rng.choice(operations)
+        start = time.perf_counter()
+        try:
+            if not fb.connected:
+                fb.connect(timeout=args.timeout, **connection_args)
+            operation(fb, rng, args)
+        except api.FishbowlError:
+            errors.append(time.perf_counter() - start)
+            continue
+        latencies.append(time.perf_counter() - start)
+    fb.close(skip_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="per client")
+    parser.add_argument("--operation", choices=sorted(OPERATIONS) + ["mixed"], default="mixed")
+    parser.add_argument("--rows", type=int, default=100, help="rows per query")
+    parser.add_argument("--timeout", type=float, default=5, help="client socket timeout")
+    parser.add_argument("--host", help="use a running server rather than starting one")
+    parser.add_argument("--port", type=int, default=28192)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    server_args = parser.add_argument_group("local server")
+    server_args.add_argument("--parts", type=int, default=1000)
+    server_args.add_argument("--customers", type=int, default=100)
+    server_args.add_argument("--latency", type=float, default=0.0, help="seconds")
+    server_args.add_argument("--bandwidth", type=int, help="bytes per second")
+    server_args.add_argument("--error-rate", type=float, default=0.0)
+    server_args.add_argument("--drop-rate", type=float, default=0.0)
+    server_args.add_argument("--timeout-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    # Injected faults are expected, so don't log each one.
+    logging.getLogger("fishbowl").setLevel(logging.CRITICAL)
+
+    server = None
+    if args.host:
+        connection_args = {
+            "host": args.host,
+            "port": args.port,
+            "username": args.username,
+            "password": args.password,
+        }
+    else:
+        server = fakeserver.FishbowlTestServer(
+            parts=args.parts,
+            customers=args.customers,
+            latency=args.latency,
+            bandwidth=args.bandwidth,
+            faults=fakeserver.Faults(
+                error_rate=args.error_rate,
+                drop_rate=args.drop_rate,
+                timeout_rate=args.timeout_rate,
+                hang=args.timeout * 2,
+                seed=0,
+            ),
+        ).start()
+        connection_args = server.connection_args
+
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(target=client, args=(connection_args, args, seed, latencies, errors))
+        for seed in range(args.clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.stop()
+
+    total = len(latencies) + len(errors)
+    print(
+        "{} clients, {} requests ({}) in {:.2f}s".format(
+            args.clients, total, args.operation, elapsed
+        )
+    )
+    print("{:>12} {:>10} {:>10} {:>10} {:>10}".format("req/s", "p50", "p99", "max", "errors"))
+    print(
+        "{:>12.1f} {:>8.2f}ms {:>8.2f}ms {:>8.2f}ms {:>10}".format(
+            total / elapsed,
+            percentile(latencies, 50) * 1000,
+            percentile(latencies, 99) * 1000,
+            max(latencies or [0]) * 1000,
+            len(errors),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark building FishbowlObjects from query rows, as the ``*_fast``
+loaders do.
+
+Run with::
+
+    python benchmarks/bench_objects.py [--rows 20000]
+
+The memory section compares holding every product as a full
+:class:`~fishbowl.objects.Product` against a compact
+:class:`~fishbowl.objects.Record` (``compact=True`` on the bulk loaders).
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from fishbowl import objects  # noqa: E402
+
+
+def product_row(i):
+    return {
+        "id": str(i),
+        "partId": str(i),
+        "num": "P{}".format(i),
+        "description": "Product {}".format(i),
+        "price": "12.50",
+        "uomId": "1",
+        "weight": "1.5",
+        "weightUomId": "2",
+        "width": "3",
+        "height": "4",
+        "len": "5",
+        "sizeUomId": "3",
+        "sellableInOtherUomFlag": "0",
+        "activeFlag": "1",
+        "taxableFlag": "1",
+        "usePriceFlag": "1",
+        "kitFlag": "0",
+        "showSoComboFlag": "1",
+        "dateCreated": "2019-01-01 10:00:00.0",
+        "dateLastModified": "2019-06-01 10:00:00.0",
+        "StandardCost": "7.25",
+        "TypeID": "10",
+        "ApiField": "1",
+    }
+
+
+def customer_row(i):
+    return {
+        "id": str(i),
+        "accountId": str(i),
+        "name": "Customer {}".format(i),
+        "number": str(i),
+        "statusId": "10",
+        "creditLimit": "1000.00",
+        "taxExempt": "0",
+        "activeFlag": "1",
+        "dateCreated": "2019-01-01 10:00:00.0",
+        "dateLastModified": "2019-06-01 10:00:00.0",
+        "jobDepth": "1",
+        "url": "",
+    }
+
+
+def address_row(i):
+    return {
+        "id": str(i),
+        "accountId": str(i),
+        "name": "Main Office",
+        "attn": "Someone",
+        "address": "1 Street",
+        "city": "Springfield",
+        "zip": "12345",
+        "locationGroupId": "1",
+        "defaultFlag": "1",
+        "residentialFlag": "0",
+        "typeID": "50",
+        "stateId": "1",
+        "countryId": "2",
+    }
+
+
+def run(label, build, rows):
+    start = time.perf_counter()
+    for row in rows:
+        build(row)
+    elapsed = time.perf_counter() - start
+    print("{:<28} {:>8.3f}s {:>10.1f} us/object".format(label, elapsed, elapsed / len(rows) * 1e6))
+
+
+def retained(label, build, rows):
+    rows = [dict(row) for row in rows]
+    tracemalloc.start()
+    objs = [build(row) for row in rows]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print("{:<28} {:>8.1f}MB {:>9.0f} B/object".format(label, size / 1e6, size / len(objs)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    custom_fields = {"ApiField": objects.fishbowl_boolean}
+    products = [product_row(i) for i in range(args.rows)]
+    customers = [customer_row(i) for i in range(args.rows)]
+    addresses = [address_row(i) for i in range(args.rows)]
+    run("Product", objects.Product, products)
+    run(
+        "Part (custom fields)",
+        lambda row: objects.Part(row, custom_fields=custom_fields),
+        products,
+    )
+    run("Customer", objects.Customer, customers)
+    run("Address", objects.Address, addresses)
+    run("Product record", objects.Product.record, products)
+    run("Customer record", objects.Customer.record, customers)
+
+    print()
+    retained("Product", objects.Product, products)
+    retained("Product record", objects.Product.record, products)
+    retained("Customer", objects.Customer, customers)
+    retained("Customer record", objects.Customer.record, customers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark the Fishbowl response receive path.
+
+Compares ``BaseFishbowl.read_response_buffer`` (a preallocated buffer filled
+with ``recv_into``) against the previous ``response += buff`` implementation
+reading fixed 1024 byte chunks, using an in-memory stream so only client side
+costs are measured.
+
+Run with::
+
+    python benchmarks/bench_read_response.py [--sizes 1 10 100] [--legacy-max 10]
+
+The previous implementation copies the whole response on every chunk, so by
+default it is skipped for sizes above 10 MB (100 MB takes around an hour).
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from fishbowl.api import BaseFishbowl  # noqa: E402
+
+MB = 1024 * 1024
+
+
+class MemoryStream:
+    """
+    A socket stand in that serves a framed response, returning at most
+    ``segment`` bytes per call like a real socket would.
+    """
+
+    def __init__(self, payload, segment=64 * 1024):
+        self.data = memoryview(struct.pack(">L", len(payload)) + payload)
+        self.pos = 0
+        self.segment = segment
+
+    def recv(self, bufsize):
+        size = min(bufsize, self.segment)
+        chunk = self.data[self.pos : self.pos + size].tobytes()
+        self.pos += len(chunk)
+        return chunk
+
+    def recv_into(self, buffer, nbytes=0):
+        size = min(nbytes or len(buffer), self.segment)
+        chunk = self.data[self.pos : self.pos + size]
+        buffer[: len(chunk)] = chunk
+        self.pos += len(chunk)
+        return len(chunk)
+
+
+def legacy_read_response(fb, stream):
+    """
+    The receive loop as it was before the zero copy buffer.
+    """
+    response = b""
+    packed_length = b""
+    while len(packed_length) < 4:
+        packed_length += stream.recv(4 - len(packed_length))
+    length = struct.unpack(">L", packed_length)[0]
+    left_to_read = length
+    while left_to_read > 0:
+        if left_to_read < fb.chunk_size:
+            buff = stream.recv(left_to_read)
+        else:
+            buff = stream.recv(fb.chunk_size)
+        response += buff
+        left_to_read -= len(buff)
+    return response.decode(fb.encoding)
+
+
+def make_payload(size):
+    row = b'<Row>"1","BB2005","Custom Value Bike","0.00"</Row>\n'
+    body = row * (size // len(row) + 1)
+    return b"<FbiXml><Rows>" + body[: size - 29] + b"</Rows></FbiXml>"
+
+
+def timed(func, payload, repeat):
+    best = None
+    for _ in range(repeat):
+        stream = MemoryStream(payload)
+        start = time.perf_counter()
+        func(stream)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100], help="in MB")
+    parser.add_argument("--legacy-max", type=int, default=10, help="in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    fb = BaseFishbowl()
+    fb.close = lambda skip_errors=False: None
+    print("{:>8} {:>14} {:>14} {:>10}".format("size", "legacy", "buffer", "speedup"))
+    for size in args.sizes:
+        payload = make_payload(size * MB)
+        new = timed(fb.read_response_buffer, payload, args.repeat)
+        if size <= args.legacy_max:
+            old = timed(lambda stream: legacy_read_response(fb, stream), payload, 1)
+            old_text = "{:.4f}s".format(old)
+            speedup = "{:.1f}x".format(old / new)
+        else:
+            old_text = speedup = "skipped"
+        print("{:>6}MB {:>14} {:>13.4f}s {:>10}".format(size, old_text, new, speedup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark the bulk loaders against recorded traffic.
+
+First record the traffic of ``get_products_fast``, ``get_customers_fast`` and
+``get_pricing_rules`` (from a local
+:class:`~fishbowl.fakeserver.FishbowlTestServer` unless ``--host`` is
+given), then replay it as many times as needed without a server::
+
+    python benchmarks/bench_replay.py record traffic.gz [--host 10.0.0.1 \\
+        --username admin --password pw]
+    python benchmarks/bench_replay.py replay traffic.gz [--repeat 10] \\
+        [--time-scale 1]
+
+Without ``--time-scale`` responses are replayed as fast as possible, so the
+timings are the client's parsing and materializing alone.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from fishbowl import api, fakeserver, replay  # noqa: E402
+
+LOADERS = ("get_products_fast", "get_customers_fast", "get_pricing_rules")
+
+
+def run_loaders(fishbowl_api, loaders):
+    timings = {}
+    with fishbowl_api as fb:
+        for loader in loaders:
+            start = time.perf_counter()
+            getattr(fb, loader)()
+            timings[loader] = time.perf_counter() - start
+    return timings
+
+
+def record(args):
+    recorder = replay.Recorder()
+    if args.host:
+        connection_args = {
+            "host": args.host,
+            "port": args.port,
+            "username": args.username,
+            "password": args.password,
+        }
+        run_loaders(api.FishbowlAPI(transport=recorder, **connection_args), args.loaders)
+    else:
+        with fakeserver.FishbowlTestServer(parts=args.parts, customers=args.customers) as server:
+            run_loaders(
+                api.FishbowlAPI(transport=recorder, **server.connection_args), args.loaders
+            )
+    recorder.save(args.archive)
+    size = sum(len(exchange.response) for exchange in recorder.exchanges)
+    print(
+        "Recorded {} exchanges ({:.1f} MB of responses) to {}".format(
+            len(recorder.exchanges), size / 1e6, args.archive
+        )
+    )
+
+
+def replay_traffic(args):
+    replayer = replay.Replayer.load(args.archive, time_scale=args.time_scale)
+    fishbowl_api = api.FishbowlAPI(
+        transport=replayer, host="replay", port=28192, username="admin", password="replay"
+    )
+    timings = dict((loader, []) for loader in args.loaders)
+    for _ in range(args.repeat):
+        for loader, elapsed in run_loaders(fishbowl_api, args.loaders).items():
+            timings[loader].append(elapsed)
+    print("{:<20} {:>10} {:>10} {:>10}".format("loader", "min", "mean", "max"))
+    for loader, values in timings.items():
+        print(
+            "{:<20} {:>8.1f}ms {:>8.1f}ms {:>8.1f}ms".format(
+                loader,
+                min(values) * 1000,
+                sum(values) / len(values) * 1000,
+                max(values) * 1000,
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="record traffic to an archive")
+    record_parser.add_argument("archive")
+    record_parser.add_argument("--host", help="record a real server rather than a local one")
+    record_parser.add_argument("--port", type=int, default=28192)
+    record_parser.add_argument("--username", default="admin")
+    record_parser.add_argument("--password", default="admin")
+    record_parser.add_argument("--parts", type=int, default=20000)
+    record_parser.add_argument("--customers", type=int, default=2000)
+    record_parser.set_defaults(func=record)
+
+    replay_parser = subparsers.add_parser("replay", help="benchmark against an archive")
+    replay_parser.add_argument("archive")
+    replay_parser.add_argument("--repeat", type=int, default=5)
+    replay_parser.add_argument(
+        "--time-scale", type=float, help="pace responses like the recording, scaled by this"
+    )
+    replay_parser.set_defaults(func=replay_traffic)
+
+    for subparser in (record_parser, replay_parser):
+        subparser.add_argument("--loaders", nargs="+", choices=LOADERS, default=list(LOADERS))
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
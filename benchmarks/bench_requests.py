@@ -0,0 +1,70 @@
+"""
+Benchmark building the frequently sent requests.
+
+Compares a :class:`~fishbowl.xmlrequests.SimpleRequest` (an lxml tree
+serialized with ``pretty_print``) against rendering the same request from its
+precompiled :class:`~fishbowl.xmlrequests.RequestTemplate`, each including
+finding the request type as the connection does before sending.
+
+Run with::
+
+    python benchmarks/bench_requests.py [--number 20000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from fishbowl import cache, xmlrequests  # noqa: E402
+
+KEY = "eCWMhC5n/E48OP7307qmZg=="
+
+REQUESTS = [
+    ("ExecuteQueryRq", {"Query": "SELECT * FROM part WHERE id > 1000 ORDER BY id LIMIT 1000"}),
+    ("CustomerGetRq", {"Name": "Smith & Sons Hardware"}),
+    ("ProductGetRq", {"Number": "B201"}),
+    ("InvQtyRq", {"PartNum": "B201"}),
+]
+
+
+def tree_builder(name, value):
+    request = xmlrequests.SimpleRequest(name, value, key=KEY)
+    return cache.request_types(request), request.request
+
+
+def template_builder(name, value):
+    request = xmlrequests.simple_request(name, value, key=KEY)
+    return cache.request_types(request), request.request
+
+
+def bench(builder, name, value, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        builder(name, value)
+    return (time.perf_counter() - start) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--number", type=int, default=20000, help="builds of each request")
+    args = parser.parse_args()
+
+    print("{:<16} {:>10} {:>10} {:>8} {:>12}".format("request", "tree", "template", "", "bytes"))
+    for name, value in REQUESTS:
+        tree = bench(tree_builder, name, value, args.number)
+        template = bench(template_builder, name, value, args.number)
+        sizes = "{}/{}".format(
+            len(tree_builder(name, value)[1]), len(template_builder(name, value)[1])
+        )
+        print(
+            "{:<16} {:>8.2f}us {:>8.2f}us {:>7.1f}x {:>12}".format(
+                name, tree * 1e6, template * 1e6, tree / template, sizes
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,630 @@
+"""
+An asyncio Fishbowl client.
+
+This speaks the same 4 byte length prefixed protocol as
+:cls:`fishbowl.api.Fishbowl`, but over asyncio streams so a single event loop
+can drive many sessions at once.
+
+Example usage::
+
+    from fishbowl.aio import AsyncFishbowlAPI
+    fishbowl_api = AsyncFishbowlAPI(
+        username='admin', password='pw', host='10.0.0.1', port=28192)
+
+    async def my_func():
+        async with fishbowl_api as connection:
+            products = await connection.get_products_fast()
+
+Requests sent through the same session are serialized, so to run requests in
+parallel use one session per task.
+
+Pass a ``metrics`` sink to record the same request timings and sizes as the
+blocking client (see :mod:`fishbowl.metrics`). Tracing, response caching and
+session recovery are only supported by the blocking client.
+"""
+
+from __future__ import unicode_literals
+
+import asyncio
+import base64
+import contextvars
+import hashlib
+import logging
+import struct
+import time
+
+from lxml import etree
+
+from . import cache, columns, metrics, objects, xmlrequests
+from .api import (
+    CUSTOMER_GROUP_PRICING_RULES_SQL,
+    PARTS_SQL,
+    PRICING_RULES_SQL,
+    SERIAL_NUMBER_SQL,
+    BaseFishbowl,
+    FishbowlConnectionError,
+    FishbowlError,
+    FishbowlTimeoutError,
+    build_address_map,
+    build_country_map,
+    build_state_map,
+    check_status,
+    customer_from_row,
+    parse_locations,
+    parse_query_rows,
+    part_from_row,
+    populate_light_part_uoms,
+    process_pricing_rules,
+    product_from_row,
+    products_query,
+    require_connected,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFishbowl(BaseFishbowl):
+    """
+    Asyncio Fishbowl API connection.
+
+    For standard higher level usage, use the :cls:`AsyncFishbowlAPI` that
+    creates instances of this class as required.
+    """
+
+    auth_request = xmlrequests.Login
+
+    def __init__(self, task_name=None):
+        super().__init__(task_name=task_name)
+        self.timeout = None
+        self._lock = asyncio.Lock()
+
+    async def make_stream(self, timeout=5, retry=3):
+        """
+        Open a connection to communicate with the API, returning an asyncio
+        ``(reader, writer)`` pair.
+        """
+        logger.info("Connecting to %s:%s", self.host, self.port)
+        while True:
+            try:
+                started = time.perf_counter()
+                stream = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.login_timeout
+                )
+                self.record(metrics.CONNECT, time.perf_counter() - started, "LoginRq")
+                return stream
+            except (OSError, asyncio.TimeoutError) as e:
+                msg = getattr(e, "strerror", None) or str(e) or "Connection timeout"
+                if not retry:
+                    logger.exception("Fishbowl API connection failure, giving up")
+                    raise FishbowlConnectionError(msg)
+                logger.warning("Fishbowl API connection failure, retrying: %s", msg)
+                await asyncio.sleep(5)
+                retry -= 1
+
+    async def connect(self, username, password, host, port, timeout=5):
+        """
+        Open the stream and log in.
+        """
+        password = base64.b64encode(hashlib.md5(password.encode(self.encoding)).digest()).decode(
+            "ascii"
+        )
+
+        if self.connected:
+            await self.close()
+
+        self.host = host
+        self.port = int(port)
+        self.timeout = float(timeout)
+        self.reader, self.writer = await self.make_stream(timeout=self.timeout)
+        self._connected = True
+
+        try:
+            self.key = None
+            login_xml = self.auth_request(username, password, task_name=self.task_name).request
+            started = time.perf_counter()
+            response = await self.send_message(login_xml)
+            self.record(metrics.LOGIN, time.perf_counter() - started, "LoginRq")
+            for element in response.iter():
+                if element.tag == "Key":
+                    self.key = element.text
+                if element.tag in ("loginRs", "LoginRs", "FbiMsgsRs"):
+                    check_status(element, allow_none=True)
+
+            if not self.key:
+                msg = "No login key in response"
+                logger.error(msg)
+                raise FishbowlError(msg)
+        except Exception:
+            logger.exception(
+                "Unexpected exception while connecting to Fishbowl, closing connection"
+            )
+            await self.close(skip_errors=True)
+            raise
+        self.username = username
+
+    async def close(self, skip_errors=False):
+        """
+        Close connection to Fishbowl API.
+        """
+        try:
+            has_key = getattr(self, "key", None)
+            if has_key:
+                # Unset key first to avoid a loop if the logout request fails.
+                self.key = None
+                logout_xml = self.auth_request(
+                    self.username, "", logout=self.key, task_name=self.task_name
+                ).request
+                logout_response = await self.send_message(logout_xml)
+            if not self.connected:
+                raise OSError("Not connected")
+            self._connected = False
+            self.writer.close()
+            if has_key:
+                check_status(logout_response.find("FbiMsgsRs"), expected="1010")
+        except Exception:
+            if not skip_errors:
+                logger.exception(
+                    "Unexpected error while trying to close the Fishbowl " "connection"
+                )
+                raise
+
+    def _abort(self):
+        """
+        Drop the connection without logging out (the stream can no longer be
+        trusted to be in sync).
+        """
+        self.key = None
+        self._connected = False
+        self.writer.close()
+
+    async def read_response(self, reader):
+        """
+        Read a Fishbowl formatted network response from the provided stream
+        reader.
+
+        See :meth:`fishbowl.api.BaseFishbowl.read_response` for the format.
+        """
+        received_length = False
+        try:
+            packed_length = await asyncio.wait_for(reader.readexactly(4), self.timeout)
+            length = struct.unpack(">L", packed_length)[0]
+            received_length = True
+            first_byte = time.perf_counter()
+            response = await asyncio.wait_for(reader.readexactly(length), self.timeout)
+        except asyncio.TimeoutError:
+            self._abort()
+            if received_length:
+                msg = "Connection timeout (after length received)"
+            else:
+                msg = "Connection timeout"
+            logger.exception(msg)
+            raise FishbowlTimeoutError(msg)
+        except asyncio.IncompleteReadError:
+            self._abort()
+            msg = "Connection closed by the server"
+            logger.exception(msg)
+            raise FishbowlConnectionError(msg)
+        self._received(first_byte, length + 4)
+        response = response.decode(self.encoding)
+        logger.debug("Response received:\n%s", response)
+        return response
+
+    @require_connected
+    async def send_message(self, msg):
+        """
+        Send a message to the API and return the root element of the XML that
+        comes back as a response.
+
+        For higher level usage, see :meth:`send_request`.
+        """
+        types = cache.request_types(msg)
+        if isinstance(msg, (xmlrequests.Request, xmlrequests.CompiledRequest)):
+            msg = msg.request
+
+        logger.info("Sending message (%s)", types[0] if types else "unknown")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sending message:\n" + msg.decode(self.encoding))
+        data = self.pack_message(msg)
+        async with self._lock:
+            if not self.connected:
+                # Dropped while waiting for the lock.
+                raise OSError("Not connected")
+            self._sending(metrics.request_label(types), len(data))
+            try:
+                self.writer.write(data)
+                await self.writer.drain()
+                response = await self.read_response(self.reader)
+            except BaseException:
+                # Cancelled (or failed) part way through, so the response
+                # could still arrive and be read as the next one's.
+                if self.connected:
+                    self._abort()
+                raise
+            request_type = self._request_type
+
+        started = time.perf_counter()
+        root = etree.fromstring(response)
+        self.record(metrics.PARSE, time.perf_counter() - started, request_type)
+        return root
+
+    @require_connected
+    async def send_request(
+        self, request, value=None, response_node_name=None, single=True, silence_errors=False
+    ):
+        """
+        Send a simple request to the API that follows the standard method.
+
+        See :meth:`fishbowl.api.Fishbowl.send_request` for the parameters.
+        """
+        if isinstance(request, str):
+            request = xmlrequests.simple_request(request, value, key=self.key)
+        root = await self.send_message(request)
+        if response_node_name:
+            try:
+                resp = root.find("FbiMsgsRs")
+                check_status(resp, allow_none=True)
+                root = resp.find(response_node_name)
+                check_status(root, allow_none=True)
+            except FishbowlError:
+                if silence_errors:
+                    return etree.Element("empty")
+                logger.error("Unexpected response status")
+                raise
+            if single:
+                if len(root):
+                    root = root[0]
+                else:
+                    root = etree.Element("empty")
+        return root
+
+    @require_connected
+    async def send_query(self, query, columnar=False, schema=None):
+        """
+        Send a SQL query to be executed on the server, returning an iterator
+        of the rows returned as dictionaries.
+
+        :param columnar: Return a :cls:`fishbowl.columns.ColumnarResult` of
+            typed column arrays instead
+        :param schema: A :cls:`fishbowl.objects.FishbowlObject` class
+            declaring the column types of a columnar result
+        """
+        response = await self.send_request(
+            "ExecuteQueryRq", {"Query": query}, response_node_name="ExecuteQueryRs"
+        )
+        texts = (row.text for row in response.iter("Row"))
+        if columnar:
+            return columns.from_rows(parse_query_rows(texts, as_tuples=True), schema=schema)
+        return parse_query_rows(texts)
+
+    @require_connected
+    async def basic_query(self, sql, serializer, columnar=False):
+        if columnar:
+            return await self.send_query(sql, columnar=True, schema=serializer)
+        objs = []
+        for row in await self.send_query(sql):
+            obj = serializer(row)
+            if not obj:
+                continue
+            objs.append((obj, row))
+        return objs
+
+    @require_connected
+    async def add_inventory(self, partnum, qty, uomid, cost, loctagnum):
+        """
+        Add inventory.
+        """
+        request = xmlrequests.AddInventory(partnum, qty, uomid, cost, loctagnum, key=self.key)
+        response = await self.send_message(request)
+        for element in response.iter("AddInventoryRs"):
+            check_status(element, allow_none=True)
+            logger.info(
+                ",".join(
+                    ["{}".format(val) for val in ["add_inv", partnum, qty, uomid, cost, loctagnum]]
+                )
+            )
+
+    @require_connected
+    async def get_part_info(self, partnum):
+        """
+        Returns all information relating to a part
+        """
+        request = xmlrequests.simple_request("InvQtyRq", {"PartNum": partnum}, key=self.key)
+        return await self.send_message(request)
+
+    @require_connected
+    async def get_total_inventory(self, partnum, locationgroup):
+        """
+        Returns total inventory count at specified location
+        """
+        request = xmlrequests.GetTotalInventory(partnum, locationgroup, key=self.key)
+        return await self.send_message(request)
+
+    @require_connected
+    async def get_locations(self, partnum, locationgroup=None):
+        """
+        Returns locations of the specified part
+        """
+        return parse_locations(await self.get_part_info(partnum), locationgroup)
+
+    @require_connected
+    async def cycle_inventory(self, partnum, qty, locationid):
+        """
+        Cycle inventory of part in Fishbowl.
+        """
+        request = xmlrequests.CycleCount(partnum, qty, locationid, key=self.key)
+        response = await self.send_message(request)
+        for element in response.iter("CycleCountRs"):
+            check_status(element, allow_none=True)
+            logger.info(
+                ",".join(["{}".format(val) for val in ["cycle_inv", partnum, qty, locationid]])
+            )
+
+    @require_connected
+    async def get_po_list(self, locationgroup):
+        """
+        Get list of POs.
+        """
+        request = xmlrequests.GetPOList(locationgroup, key=self.key)
+        return await self.send_message(request)
+
+    @require_connected
+    async def get_taxrates(self):
+        """
+        Get tax rates.
+
+        :returns: A list of :cls:`fishbowl.objects.TaxRate` objects
+        """
+        response = await self.send_request(
+            "TaxRateGetRq", response_node_name="TaxRateGetRs", single=False
+        )
+        return [objects.TaxRate(node) for node in response.iter("TaxRate")]
+
+    @require_connected
+    async def get_location_groups(self, only_active=True):
+        """
+        Get location groups.
+
+        :returns: A list of :cls:`fishbowl.objects.LocationGroup` objects
+        """
+        location_groups = []
+        for row in await self.send_query("SELECT * FROM LOCATIONGROUP"):
+            obj = objects.LocationGroup(row)
+            if not only_active or obj["ActiveFlag"]:
+                location_groups.append(obj)
+        return location_groups
+
+    @require_connected
+    async def get_customers(self):
+        """
+        Get customers.
+
+        Lazy loading isn't supported by the asyncio client, so this always
+        preloads all customer data.
+
+        :returns: A list of :cls:`fishbowl.objects.Customer` objects
+        """
+        response = await self.send_request(
+            "CustomerListRq", response_node_name="CustomerListRs", single=False
+        )
+        return [objects.Customer(node) for node in response.iter("Customer")]
+
+    @require_connected
+    async def get_uom_map(self):
+        response = await self.send_request("UOMRq", response_node_name="UOMRs", single=False)
+        return dict(
+            (uom["UOMID"], uom) for uom in [objects.UOM(node) for node in response.iter("UOM")]
+        )
+
+    @require_connected
+    async def get_parts(self, populate_uoms=True):
+        """
+        Get a light list of parts.
+
+        :param populate_uoms: Whether to populate the UOM for each part
+            (default ``True``)
+        :returns: A list of cls:`fishbowl.objects.Part`
+        """
+        response = await self.send_request(
+            "LightPartListRq", response_node_name="LightPartListRs", single=False
+        )
+        parts = [objects.Part(node) for node in response.iter("LightPart")]
+        if populate_uoms:
+            populate_light_part_uoms(parts, await self.get_uom_map())
+        return parts
+
+    @require_connected
+    async def get_parts_all(self):
+        parts = []
+        uom_map = await self.get_uom_map()
+        for row in await self.send_query(PARTS_SQL):
+            obj = part_from_row(row, uom_map)
+            if obj:
+                parts.append(obj)
+        return parts
+
+    @require_connected
+    async def get_serial_numbers(self):
+        return [o for o, _ in await self.basic_query(SERIAL_NUMBER_SQL, objects.Serial)]
+
+    @require_connected
+    async def get_products(self):
+        """
+        Get a list of products.
+
+        Lazy loading isn't supported by the asyncio client, so this requests
+        every product (which is intensive).
+
+        :returns: A list of cls:`fishbowl.objects.Product`
+        """
+        products = []
+        added = set()
+        for part in await self.get_parts(populate_uoms=False):
+            part_number = part.get("Num")
+            # Skip parts without a number, and duplicates.
+            if not part_number or part_number in added:
+                continue
+            product_node = await self.send_request(
+                "ProductGetRq",
+                {"Number": part_number},
+                response_node_name="ProductGetRs",
+            )
+            if not len(product_node):
+                continue
+            product = objects.Product(product_node, name=part_number)
+            product.part = part
+            products.append(product)
+            added.add(part_number)
+        return products
+
+    @require_connected
+    async def get_products_fast(self, populate_uoms=True, custom_bools=None):
+        """
+        Quickly get all products.
+
+        See :meth:`fishbowl.api.Fishbowl.get_products_fast`.
+        """
+        products = []
+        uom_map = await self.get_uom_map() if populate_uoms else None
+        sql, custom_fields = products_query(custom_bools)
+        materializing = metrics.Stopwatch()
+        for row in await self.send_query(sql):
+            with materializing:
+                product = product_from_row(row, custom_fields, uom_map)
+            if product:
+                products.append(product)
+        self.record(metrics.MATERIALIZE, materializing.elapsed, "get_products_fast")
+        return products
+
+    @require_connected
+    async def get_pricing_rules(self):
+        """
+        Get a list of pricing rules for products.
+
+        See :meth:`fishbowl.api.Fishbowl.get_pricing_rules`.
+        """
+        pricing_rules = {None: []}
+        process_pricing_rules(await self.send_query(PRICING_RULES_SQL), pricing_rules)
+        process_pricing_rules(
+            await self.send_query(CUSTOMER_GROUP_PRICING_RULES_SQL), pricing_rules
+        )
+        return pricing_rules
+
+    @require_connected
+    async def get_customers_fast(self, populate_addresses=True, populate_pricing_rules=False):
+        customers = []
+        address_map = pricing_rules = None
+        if populate_addresses:
+            country_map = build_country_map(await self.send_query("SELECT * FROM COUNTRYCONST"))
+            state_map = build_state_map(await self.send_query("SELECT * FROM STATECONST"))
+            address_map = build_address_map(
+                await self.send_query("SELECT * FROM ADDRESS"), country_map, state_map
+            )
+        if populate_pricing_rules:
+            pricing_rules = await self.get_pricing_rules()
+        materializing = metrics.Stopwatch()
+        for row in await self.send_query("SELECT * FROM CUSTOMER"):
+            with materializing:
+                customer = customer_from_row(row, address_map, pricing_rules)
+            if customer:
+                customers.append(customer)
+        self.record(metrics.MATERIALIZE, materializing.elapsed, "get_customers_fast")
+        return customers
+
+    @require_connected
+    async def get_so(self, number):
+        response = await self.send_request(
+            "LoadSORq", {"Number": number}, response_node_name="LoadSORs"
+        )
+        if response is None or response.tag != "SalesOrder":
+            return None
+        return objects.SalesOrder(response)
+
+    @require_connected
+    async def save_so(self, so):
+        request = xmlrequests.SaveSO(so, key=self.key)
+        response = await self.send_message(request)
+        check_status(response.find("FbiMsgsRs"))
+        return objects.SalesOrder(response.find("SalesOrder"))
+
+    @require_connected
+    async def get_available_imports(self):
+        request = xmlrequests.ImportListRequest(key=self.key)
+        response = await self.send_message(request)
+        check_status(response.find("FbiMsgsRs"))
+        return [x.text for x in response.xpath("//ImportNames/ImportName")]
+
+    @require_connected
+    async def get_import_headers(self, import_type):
+        request = xmlrequests.ImportHeaders(import_type, key=self.key)
+        response = await self.send_message(request)
+        check_status(response.find("FbiMsgsRs"))
+        return response.xpath("//Header/Row")[0].text
+
+    @require_connected
+    async def run_import(self, import_type, rows):
+        """
+        Run the provided import type with the provided rows.
+
+        See :meth:`fishbowl.api.Fishbowl.run_import`.
+        """
+        request = xmlrequests.ImportRequest(import_type, rows, key=self.key)
+        response = await self.send_message(request)
+        check_status(response.xpath("//ImportRs")[0])
+
+    @require_connected
+    async def get_available_exports(self):
+        request = xmlrequests.ExportListRequest(key=self.key)
+        response = await self.send_message(request)
+        check_status(response.find("FbiMsgsRs"))
+        return [x.text for x in response.xpath("//Exports/ExportName")]
+
+    @require_connected
+    async def run_export(self, export_type):
+        """
+        Return the result rows of the provided export type.
+
+        See :meth:`fishbowl.api.Fishbowl.run_export`.
+        """
+        request = xmlrequests.ExportRequest(export_type, key=self.key)
+        response = await self.send_message(request)
+        check_status(response.find("FbiMsgsRs"))
+        return [x.text for x in response.xpath("//Rows/Row")]
+
+
+class AsyncFishbowlAPI:
+    """
+    Create (preferably short lived) asyncio Fishbowl connections.
+
+    Each ``async with`` block gets its own session, so the same instance can
+    be used by many tasks at once.
+    """
+
+    client = AsyncFishbowl
+
+    def __init__(self, task_name=None, metrics=None, **connection_args):
+        self.task_name = task_name
+        self.metrics = metrics
+        self.connection_args = connection_args
+        # Track sessions per task so concurrent blocks don't trip each other.
+        self._sessions = contextvars.ContextVar("fishbowl_sessions", default=())
+
+    async def __aenter__(self):
+        fb = self.client(task_name=self.task_name)
+        if self.metrics is not None:
+            fb.metrics = self.metrics
+        await fb.connect(**self.connection_args)
+        self._sessions.set(self._sessions.get() + (fb,))
+        return fb
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """
+        Close the connection, but only show any errors while attempting this if
+        the context didn't raise an exception.
+        """
+        sessions = self._sessions.get()
+        fb = sessions[-1]
+        self._sessions.set(sessions[:-1])
+        try:
+            await fb.close(skip_errors=bool(traceback))
+        except FishbowlTimeoutError:
+            pass
@@ -1,20 +1,35 @@
 from __future__ import unicode_literals
 
 import base64
+import codecs
 import csv
 import functools
 import hashlib
+import inspect
 import json
 import logging
+import re
 import socket
 import struct
 import time
+from contextlib import contextmanager
+from datetime import datetime
 from functools import partial
 from io import StringIO
 
 from lxml import etree
 
-from . import jsonrequests, objects, statuscodes, xmlrequests
+from . import (
+    cache,
+    columns,
+    exports,
+    jsonrequests,
+    metrics,
+    objects,
+    statuscodes,
+    tracing,
+    xmlrequests,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -66,23 +81,122 @@ SERIAL_NUMBER_SQL = (
     "LEFT JOIN part p on t.partId = p.id"
 )
 
+# Reference data that rarely changes (see :mod:`fishbowl.refcache`), fetched
+# either with a query or with a request (its response node name and the tag
+# of each item).
+REFERENCE_QUERIES = {
+    "countries": "SELECT * FROM COUNTRYCONST",
+    "states": "SELECT * FROM STATECONST",
+    "location_groups": "SELECT * FROM LOCATIONGROUP",
+}
+REFERENCE_REQUESTS = {
+    "uoms": ("UOMRq", "UOMRs", "UOM"),
+    "taxrates": ("TaxRateGetRq", "TaxRateGetRs", "TaxRate"),
+}
+
+
+def keyset_query(query, key="id", after=None, limit=1000):
+    """
+    Rewrite a query to return a single page of rows, ordered by the ``key``
+    column and starting after the ``after`` key value.
+    """
+    query = query.strip().rstrip(";")
+    where = "" if after is None else " WHERE q.{} > {}".format(key, int(after))
+    return "SELECT * FROM ({}) q{} ORDER BY q.{} LIMIT {}".format(query, where, key, int(limit))
+
+
+def modified_since_query(query, since, column="dateLastModified"):
+    """
+    Rewrite a query to only return rows modified at or after the ``since``
+    watermark (a datetime, or a Fishbowl date string).
+
+    Rows modified exactly at the watermark are returned again, so that rows
+    saved in the same instant as the last sync aren't missed.
+    """
+    if not isinstance(since, datetime):
+        since = objects.fishbowl_datetime(since)
+    query = query.strip().rstrip(";")
+    return "SELECT * FROM ({}) q WHERE q.{} >= '{}'".format(
+        query, column, since.strftime("%Y-%m-%d %H:%M:%S.%f")
+    )
+
+
+def latest_modified(objs, watermark=None):
+    """
+    Return the latest ``DateLastModified`` of the objects, or ``watermark`` if
+    it is later (or there are no dated objects).
+    """
+    for obj in objs:
+        modified = obj.get("DateLastModified")
+        if modified is not None and (watermark is None or modified > watermark):
+            watermark = modified
+    return watermark
+
 
 def UnicodeDictReader(utf8_data, **kwargs):
-    csv_reader = csv.DictReader(utf8_data, **kwargs)
-    for row in csv_reader:
-        yield {key: value for key, value in row.items()}
+    return csv.DictReader(utf8_data, **kwargs)
+
+
+def parse_query_rows(texts, as_tuples=False):
+    """
+    Parse the CSV text of each ``Row`` of an ``ExecuteQueryRs`` response.
+
+    The first row is the header. Other rows are yielded as dictionaries keyed
+    by the header (like :cls:`csv.DictReader`) or, if ``as_tuples`` is set,
+    as tuples that start with the header tuple (like :func:`csv.reader`).
+    """
+    reader = csv.reader("" if text is None else text for text in texts)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = tuple(header)
+    if as_tuples:
+        yield header
+        for values in reader:
+            if values:
+                yield tuple(values)
+        return
+    width = len(header)
+    for values in reader:
+        if len(values) == width:
+            yield dict(zip(header, values))
+        elif values:
+            # Mimic csv.DictReader for ragged rows.
+            row = dict(zip(header, values))
+            if len(values) > width:
+                row[None] = values[width:]
+            else:
+                for key in header[len(values) :]:
+                    row[key] = None
+            yield row
 
 
 class FishbowlError(Exception):
-    pass
+    """
+    An error from the Fishbowl API.
+
+    :attr code: The status code the server responded with, if any
+    """
+
+    def __init__(self, *args, code=None):
+        super().__init__(*args)
+        self.code = code
+
+    @property
+    def retryable(self):
+        """
+        Whether the request could succeed if tried again (see
+        :func:`fishbowl.statuscodes.is_retryable`).
+        """
+        return statuscodes.is_retryable(self.code)
 
 
 class FishbowlTimeoutError(FishbowlError):
-    pass
+    retryable = True
 
 
 class FishbowlConnectionError(FishbowlError):
-    pass
+    retryable = True
 
 
 def require_connected(func):
@@ -91,6 +205,17 @@ def require_connected(func):
     connection to the API server has been made.
     """
 
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_dec(self, *args, **kwargs):
+            if not self.connected:
+                logger.error("API method called but Fishbowl is not connected")
+                raise OSError("Not connected")
+            return await func(self, *args, **kwargs)
+
+        return async_dec
+
     @functools.wraps(func)
     def dec(self, *args, **kwargs):
         if not self.connected:
@@ -101,31 +226,110 @@ def require_connected(func):
     return dec
 
 
+def traced(func):
+    """
+    Decorator recording a span for each call of a connection method (see
+    :meth:`BaseFishbowl.trace`).
+    """
+
+    @functools.wraps(func)
+    def dec(self, *args, **kwargs):
+        if self.tracer is None:
+            return func(self, *args, **kwargs)
+        with self.tracer.span(func.__name__):
+            return func(self, *args, **kwargs)
+
+    return dec
+
+
 class BaseFishbowl:
     host = "localhost"
     port = 28192
     encoding = "latin-1"
     login_timeout = 3
+    # Responses are read in chunks starting at chunk_size bytes, doubling (up
+    # to max_chunk_size) each time a read fills the whole chunk.
     chunk_size = 1024
+    max_chunk_size = 1024 * 1024
+    # Socket SO_RCVBUF / SO_SNDBUF sizes, or None to leave the OS defaults.
+    recv_buffer_size = None
+    send_buffer_size = None
+    # A fishbowl.metrics sink that request timings and sizes are recorded to,
+    # if set.
+    metrics = None
+    # A fishbowl.tracing.Tracer recording the stages of each call, if set.
+    tracer = None
+    # A transport opening the stream in place of a socket, such as a
+    # fishbowl.replay.Recorder or Replayer, if set.
+    transport = None
 
     def __init__(self, task_name=None):
         self._connected = False
         self.task_name = task_name
+        self._request_type = None
+        self._sent_at = None
 
     @property
     def connected(self):
         return self._connected
 
+    def record(self, name, value, request_type):
+        """
+        Record a measurement to the ``metrics`` sink, if there is one.
+        """
+        if self.metrics is None:
+            return
+        try:
+            self.metrics.record(name, value, request_type)
+        except Exception:
+            logger.exception("Failed to record the %s metric", name)
+
+    def trace(self, name, **attributes):
+        """
+        Return a span (see :mod:`fishbowl.tracing`) for a stage of a call,
+        which records nothing if there is no ``tracer``.
+        """
+        if self.tracer is None:
+            return tracing.NULL_SPAN
+        return self.tracer.span(name, **attributes)
+
+    def _sending(self, request_type, size):
+        self._request_type = request_type
+        if self.metrics is not None:
+            self.record(metrics.SENT_BYTES, size, request_type)
+        self._sent_at = time.perf_counter()
+
+    def _received(self, first_byte, size):
+        if self.metrics is None or self._sent_at is None:
+            return
+        self.record(metrics.FIRST_BYTE, first_byte - self._sent_at, self._request_type)
+        self.record(metrics.ROUND_TRIP, time.perf_counter() - self._sent_at, self._request_type)
+        self.record(metrics.RECEIVED_BYTES, size, self._request_type)
+
     def make_stream(self, timeout=5, retry=3):
         """
         Create a connection to communicate with the API.
         """
+        if self.transport is not None:
+            return self.transport.open(self, timeout=timeout, retry=retry)
+        return self.open_socket(timeout=timeout, retry=retry)
+
+    def open_socket(self, timeout=5, retry=3):
+        """
+        Open a socket to the API.
+        """
         logger.info("Connecting to %s:%s", self.host, self.port)
         while True:
             stream = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            if self.recv_buffer_size:
+                stream.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer_size)
+            if self.send_buffer_size:
+                stream.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer_size)
             stream.settimeout(self.login_timeout)
             try:
+                started = time.perf_counter()
                 stream.connect((self.host, self.port))
+                self.record(metrics.CONNECT, time.perf_counter() - started, "LoginRq")
                 break
             except socket.error as e:
                 msg = getattr(e, "strerror", None) or e.message
@@ -185,34 +389,92 @@ class BaseFishbowl:
         is returned after being decoded from a bytestring into whatever
         encoding is currently set.
         """
-        response = b""
+        response = self.read_response_buffer(stream).decode(self.encoding)
+        logger.debug("Response received:\n%s", response)
+        return response
+
+    def read_response_buffer(self, stream):
+        """
+        Read a Fishbowl formatted network response from the provided socket
+        into a ``bytearray``, without decoding it.
+
+        The buffer is allocated once from the length header and filled in
+        place, so large responses are never copied while being received.
+        """
         received_length = False
         try:
-            packed_length = b""
-            while len(packed_length) < 4:
-                packed_length += stream.recv(4 - len(packed_length))
-            length = struct.unpack(">L", packed_length)[0]
+            length = struct.unpack(">L", self._recv_exactly(stream, bytearray(4)))[0]
             received_length = True
-            left_to_read = length
-            while left_to_read > 0:
-                if left_to_read < self.chunk_size:
-                    buff = stream.recv(left_to_read)
-                else:
-                    buff = stream.recv(self.chunk_size)
-                response += buff
-                left_to_read -= len(buff)
+            first_byte = time.perf_counter()
+            response = self._recv_exactly(stream, bytearray(length))
         except socket.timeout:
-            self.close(skip_errors=True)
-            if received_length:
-                msg = "Connection timeout (after length received)"
-            else:
-                msg = "Connection timeout"
-            logger.exception(msg)
-            raise FishbowlTimeoutError(msg)
-        response = response.decode(self.encoding)
-        logger.debug("Response received:\n%s", response)
+            self._read_timeout(received_length)
+        self._received(first_byte, length + 4)
         return response
 
+    def iter_response(self, stream):
+        """
+        Read a Fishbowl formatted network response from the provided socket,
+        yielding the raw bytes in chunks as they arrive.
+
+        The whole response must be consumed to keep the stream in sync.
+        """
+        received_length = False
+        try:
+            length = struct.unpack(">L", self._recv_exactly(stream, bytearray(4)))[0]
+            received_length = True
+            first_byte = time.perf_counter()
+            size = length + 4
+            chunk_size = self.chunk_size
+            while length > 0:
+                chunk = stream.recv(min(chunk_size, length))
+                if not chunk:
+                    self._connection_lost()
+                read = len(chunk)
+                length -= read
+                yield chunk
+                if read == chunk_size and chunk_size < self.max_chunk_size:
+                    chunk_size = min(chunk_size * 2, self.max_chunk_size)
+        except socket.timeout:
+            self._read_timeout(received_length)
+        self._received(first_byte, size)
+
+    def _read_timeout(self, received_length):
+        self.close(skip_errors=True)
+        if received_length:
+            msg = "Connection timeout (after length received)"
+        else:
+            msg = "Connection timeout"
+        logger.exception(msg)
+        raise FishbowlTimeoutError(msg)
+
+    def _connection_lost(self):
+        # The server has gone, so don't bother trying to log out.
+        self.key = None
+        self.close(skip_errors=True)
+        msg = "Connection closed by the server"
+        logger.error(msg)
+        raise FishbowlConnectionError(msg)
+
+    def _recv_exactly(self, stream, buff):
+        """
+        Fill ``buff`` from the socket, growing the read size while the socket
+        keeps up.
+        """
+        view = memoryview(buff)
+        length = len(buff)
+        chunk_size = self.chunk_size
+        received = 0
+        while received < length:
+            wanted = min(chunk_size, length - received)
+            read = stream.recv_into(view[received:], wanted)
+            if not read:
+                self._connection_lost()
+            received += read
+            if read == chunk_size and chunk_size < self.max_chunk_size:
+                chunk_size = min(chunk_size * 2, self.max_chunk_size)
+        return buff
+
 
 class JSONFishbowl(BaseFishbowl):
     auth_request = jsonrequests.Login
@@ -236,7 +498,9 @@ class JSONFishbowl(BaseFishbowl):
         try:
             self.key = None
             login_json = self.auth_request(username, password, task_name=self.task_name).request
+            started = time.perf_counter()
             response = self.send_message(login_json)
+            self.record(metrics.LOGIN, time.perf_counter() - started, "LoginRq")
 
             for key, value in response["FbiJson"].items():
                 if key == "Ticket":
@@ -278,11 +542,25 @@ class JSONFishbowl(BaseFishbowl):
         #     pass
         logger.info("Sending message (%s)", tag)
         logger.debug("Sending message:\n %s", msg)
-        self.stream.send(self.pack_message(msg.encode("utf-8")))
-
-        response = self.read_response(self.stream)
-
-        return json.loads(response)
+        data = self.pack_message(msg.encode("utf-8"))
+        if self.metrics is not None or self.tracer is not None:
+            try:
+                tag = metrics.request_label(list(json.loads(msg)["FbiJson"]["FbiMsgsRq"]))
+            except (ValueError, KeyError, TypeError):
+                pass
+        with self.trace("send_message", request_type=tag, sent_bytes=len(data)) as span:
+            self._sending(tag, len(data))
+            self.stream.send(data)
+
+            with self.trace("read_response"):
+                response = self.read_response(self.stream)
+            span.set(received_bytes=len(response) + 4)
+
+            started = time.perf_counter()
+            with self.trace("parse"):
+                response = json.loads(response)
+            self.record(metrics.PARSE, time.perf_counter() - started, tag)
+        return response
 
     # TODO: Convert to json
     @require_connected
@@ -361,6 +639,102 @@ class JSONFishbowl(BaseFishbowl):
         return self.basic_query(SERIAL_NUMBER_SQL, objects.Serial)
 
 
+class LazyLoader:
+    """
+    Load the data of lazy objects (see :meth:`Fishbowl.get_customers` and
+    :meth:`Fishbowl.get_products`) with one request each, the first time
+    each object is accessed.
+
+    When the objects are accessed in order, the next ``prefetch`` unloaded
+    objects are loaded along with the accessed one in a single batched
+    round trip (see :cls:`RequestBatch`) rather than one at a time.
+
+    The originating connection is used while it is still checked out by the
+    ``with`` block that created the objects. After that, a connection is
+    borrowed from the connection's ``session_factory``.
+    """
+
+    prefetch = 20
+
+    def __init__(
+        self, fishbowl, request_name, response_node_name, silence_errors=False, prefetch=None
+    ):
+        self.fishbowl = fishbowl
+        self.session_factory = fishbowl.session_factory
+        self.request_name = request_name
+        self.response_node_name = response_node_name
+        self.silence_errors = silence_errors
+        if prefetch is not None:
+            self.prefetch = prefetch
+        self.objects = []
+        self.values = []
+        self._prefetched = {}
+        self._last = None
+
+    def add(self, object_class, value, **kwargs):
+        """
+        Create a lazy object, loaded with a request of the given value.
+        """
+        obj = object_class(lazy_data=partial(self.load, len(self.values)), **kwargs)
+        self.values.append(value)
+        self.objects.append(obj)
+        return obj
+
+    @contextmanager
+    def connection(self):
+        fb = self.fishbowl
+        # A new session_factory is set each time a connection is checked out,
+        # so a different one means it has been handed back.
+        if self.session_factory is None or (
+            fb.connected and fb.session_factory is self.session_factory
+        ):
+            yield fb
+        else:
+            with self.session_factory() as fb:
+                yield fb
+
+    def load(self, index):
+        """
+        Return the response node for the object at ``index``.
+        """
+        sequential = self._last is not None and index == self._last + 1
+        self._last = index
+        if index in self._prefetched:
+            return self._prefetched.pop(index)
+        indices = [index]
+        if sequential:
+            for i in range(index + 1, len(self.objects)):
+                if len(indices) > self.prefetch:
+                    break
+                if i not in self._prefetched and not self.objects[i].loaded:
+                    indices.append(i)
+        with self.connection() as fb:
+            if len(indices) == 1:
+                return fb.send_request(
+                    self.request_name,
+                    self.values[index],
+                    response_node_name=self.response_node_name,
+                    silence_errors=self.silence_errors,
+                )
+            with fb.batch(batch_size=None) as batch:
+                items = [
+                    batch.send_request(
+                        self.request_name,
+                        self.values[i],
+                        response_node_name=self.response_node_name,
+                        silence_errors=self.silence_errors,
+                    )
+                    for i in indices
+                ]
+        for i, item in zip(indices[1:], items[1:]):
+            # Failed siblings are left to be loaded (and fail) on access.
+            try:
+                self._prefetched[i] = item.result()
+            except FishbowlError:
+                pass
+        return items[0].result()
+
+
 class Fishbowl(BaseFishbowl):
     """
     Fishbowl API connection.
@@ -376,11 +750,24 @@ class Fishbowl(BaseFishbowl):
     """
 
     auth_request = xmlrequests.Login
+    # A fishbowl.refcache.ReferenceCache that reference data (UOMs, countries,
+    # states, tax rates and location groups) is read through, if set.
+    reference_cache = None
+    # A fishbowl.cache.ResponseCache of read only responses, if set.
+    response_cache = None
+    # A callable returning a context manager that yields another connection,
+    # used by lazy objects once this connection has been handed back (see
+    # LazyLoader).
+    session_factory = None
+    # A fishbowl.recovery.SessionRecovery logging in again and resending
+    # idempotent requests when the session is lost, if set.
+    recovery = None
 
     def connect(self, username, password, host, port, timeout=5):
         """
         Open socket stream, set timeout, and log in.
         """
+        self._login_args = (username, password, host, port, timeout)
         password = base64.b64encode(hashlib.md5(password.encode(self.encoding)).digest()).decode(
             "ascii"
         )
@@ -396,7 +783,9 @@ class Fishbowl(BaseFishbowl):
         try:
             self.key = None
             login_xml = self.auth_request(username, password, task_name=self.task_name).request
+            started = time.perf_counter()
             response = self.send_message(login_xml)
+            self.record(metrics.LOGIN, time.perf_counter() - started, "LoginRq")
             # parse xml, grab api key, check status
             for element in response.iter():
                 if element.tag == "Key":
@@ -416,6 +805,26 @@ class Fishbowl(BaseFishbowl):
             raise
         self.username = username
 
+    def reconnect(self):
+        """
+        Drop the current session (without logging out, as it is assumed to be
+        lost already) and log in again as the last :meth:`connect` did.
+        """
+        self.key = None
+        if self.connected:
+            self.close(skip_errors=True)
+        self.connect(*self._login_args)
+
+    def _retry(self, msg, error, attempt):
+        """
+        Recover the session after a request failed (see
+        :meth:`fishbowl.recovery.SessionRecovery.retry`), returning the
+        attempt number to send it again as or ``None``.
+        """
+        if self.recovery is None or not hasattr(self, "_login_args"):
+            return None
+        return self.recovery.retry(self, error, cache.request_types(msg), attempt)
+
     @require_connected
     def send_request(
         self, request, value=None, response_node_name=None, single=True, silence_errors=False
@@ -436,7 +845,7 @@ class Fishbowl(BaseFishbowl):
             ``False``)
         """
         if isinstance(request, str):
-            request = xmlrequests.SimpleRequest(request, value, key=self.key)
+            request = xmlrequests.simple_request(request, value, key=self.key)
         root = self.send_message(request)
         if response_node_name:
             try:
@@ -457,21 +866,94 @@ class Fishbowl(BaseFishbowl):
         return root
 
     @require_connected
-    def send_query(self, query):
+    def send_query(self, query, columnar=False, schema=None):
         """
         Send a SQL query to be executed on the server, returning a
         ``DictReader`` containing the rows returned as a list of dictionaries.
+
+        :param columnar: Return a :cls:`fishbowl.columns.ColumnarResult` of
+            typed column arrays instead
+        :param schema: A :cls:`fishbowl.objects.FishbowlObject` class
+            declaring the column types of a columnar result
         """
-        response = self.send_request(
-            "ExecuteQueryRq", {"Query": query}, response_node_name="ExecuteQueryRs"
+        if columnar:
+            return columns.from_rows(self.iter_query(query, as_tuples=True), schema=schema)
+        with self.trace("send_query", query=query) as span:
+            response = self.send_request(
+                "ExecuteQueryRq", {"Query": query}, response_node_name="ExecuteQueryRs"
+            )
+            texts = (row.text for row in response.iter("Row"))
+            if self.tracer is None:
+                return parse_query_rows(texts)
+            return self._traced_rows(texts, span)
+
+    def _traced_rows(self, texts, span, as_tuples=False):
+        # Read every row before parsing them, so the stages are timed apart.
+        texts = list(texts)
+        with self.trace("parse_rows") as parse_span:
+            rows = list(parse_query_rows(texts, as_tuples=as_tuples))
+            count = len(rows) - 1 if as_tuples and rows else len(rows)
+            parse_span.set(rows=count)
+        span.set(rows=count)
+        return rows
+
+    @require_connected
+    def batch(self, batch_size=20):
+        """
+        Return a :cls:`RequestBatch` to send several requests in one round
+        trip.
+        """
+        return RequestBatch(self, batch_size=batch_size)
+
+    @require_connected
+    def iter_query(self, query, as_tuples=False):
+        """
+        Send a SQL query to be executed on the server, yielding each row as it
+        is parsed from the response rather than loading the whole response
+        first.
+
+        Nothing is sent until iteration starts, and no other request can be
+        made on this connection until iteration has finished.
+
+        :param as_tuples: Yield tuples (starting with the header tuple) rather
+            than a dictionary for each row
+        """
+        rows = self.iter_request(
+            "ExecuteQueryRq", "Row", {"Query": query}, response_node_name="ExecuteQueryRs"
         )
-        csvfile = StringIO()
-        for row in response.iter("Row"):
-            # csv.DictReader API changed
-            text = f"{row.text}\n"
-            csvfile.write(text)
-        csvfile.seek(0)
-        return UnicodeDictReader(csvfile)
+        texts = (row.text for row in rows)
+        if self.tracer is None:
+            return parse_query_rows(texts, as_tuples=as_tuples)
+        with self.trace("iter_query", query=query) as span:
+            return iter(self._traced_rows(texts, span, as_tuples=as_tuples))
+
+    @require_connected
+    def iter_query_pages(self, query, page_size=1000, key="id"):
+        """
+        Stream the rows of a SQL query, fetching them in pages of
+        ``page_size`` rows rather than pulling the entire result at once.
+
+        The query is rewritten into keyset pages (``key > last_key ORDER BY
+        key LIMIT page_size``), so ``key`` must be a unique integer column of
+        the query's results.
+
+        As with :meth:`iter_query`, no other request can be made on this
+        connection until iteration has finished.
+        """
+        last_key = None
+        while True:
+            count = 0
+            for row in self.iter_query(keyset_query(query, key, last_key, page_size)):
+                count += 1
+                last_key = row[key]
+                yield row
+            if count < page_size:
+                return
+
+    def _iter_rows(self, query, page_size=None):
+        if page_size:
+            return self.iter_query_pages(query, page_size)
+        return self.iter_query(query)
 
     @require_connected
     def send_message(self, msg):
@@ -481,24 +963,166 @@ class Fishbowl(BaseFishbowl):
 
         For higher level usage, see :meth:`send_request`.
         """
-        if isinstance(msg, xmlrequests.Request):
+        attempt = 0
+        while True:
+            try:
+                root = self._send_message(msg)
+                if self.recovery is not None and self._request_type != "LoginRq":
+                    self.recovery.check(root)
+                return root
+            except FishbowlError as e:
+                attempt = self._retry(msg, e, attempt)
+                if attempt is None:
+                    raise
+                msg = xmlrequests.with_key(msg, self.key)
+
+    def _send_message(self, msg):
+        with self.trace("send_message") as span:
+            cache_key = None
+            if self.response_cache is not None:
+                cache_key = self.response_cache.key(msg)
+                if cache_key is not None:
+                    response = self.response_cache.get(cache_key)
+                    if response is not None:
+                        logger.info("Cached response ({})".format(cache_key[0]))
+                        span.set(request_type=cache_key[0], cached=True)
+                        return etree.fromstring(response, self.response_parser)
+
+            sent = self._send(msg)
+            span.set(request_type=self._request_type, sent_bytes=sent)
+            with self.trace("read_response") as read_span:
+                response = self.read_response_buffer(self.stream)
+                read_span.set(bytes=len(response) + 4)
+            span.set(received_bytes=len(response) + 4)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Response received:\n%s", response.decode(self.encoding))
+
+            started = time.perf_counter()
+            with self.trace("parse"):
+                root = etree.fromstring(response, self.response_parser)
+            self.record(metrics.PARSE, time.perf_counter() - started, self._request_type)
+            if cache_key is not None and cache.successful(root):
+                self.response_cache.set(cache_key, response)
+            return root
+
+    def _send(self, msg):
+        types = cache.request_types(msg)
+        if self.response_cache is not None:
+            self.response_cache.sent(types)
+        if isinstance(msg, (xmlrequests.Request, xmlrequests.CompiledRequest)):
             msg = msg.request
 
-        tag = "unknown"
-        try:
-            xml = etree.fromstring(msg)
-            request_tag = xml.find("FbiMsgsRq")
-            if request_tag is not None and len(request_tag):
-                tag = request_tag[0].tag
-        except etree.XMLSyntaxError:
-            pass
-        logger.info("Sending message ({})".format(tag))
-        logger.debug("Sending message:\n" + msg.decode(self.encoding))
-        self.stream.send(self.pack_message(msg))
+        logger.info("Sending message (%s)", types[0] if types else "unknown")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sending message:\n" + msg.decode(self.encoding))
+        data = self.pack_message(msg)
+        self._sending(metrics.request_label(types), len(data))
+        self.stream.send(data)
+        return len(data)
 
-        response = self.read_response(self.stream)
+    @require_connected
+    def iter_message(self, msg, tag, check_tags=()):
+        """
+        Send a message to the API and incrementally parse the response as it
+        arrives, yielding each ``tag`` element once it is complete.
+
+        Each element is cleared (along with any earlier siblings) once the
+        next one is requested, so only use it before moving on. Stopping early
+        still reads the rest of the response from the socket. The response
+        isn't cached (see :mod:`fishbowl.cache`).
 
-        return etree.fromstring(response)
+        :param check_tags: Response node names to check the status of as soon
+            as they start
+        """
+        with self.trace("send_message", streamed=True) as span:
+            sent = self._send(msg)
+            span.set(request_type=self._request_type, sent_bytes=sent)
+            chunks = self.iter_response(self.stream)
+            parser = etree.XMLPullParser(
+                events=("start", "end"), encoding=codecs.lookup(self.encoding).name
+            )
+            parsing = metrics.Stopwatch()
+            received = 4
+            try:
+                for chunk in chunks:
+                    received += len(chunk)
+                    with parsing:
+                        parser.feed(chunk)
+                        events = list(parser.read_events())
+                    for event, element in events:
+                        if event == "start":
+                            if element.tag in check_tags:
+                                check_status(element, allow_none=True)
+                            continue
+                        if element.tag != tag:
+                            continue
+                        yield element
+                        element.clear()
+                        parent = element.getparent()
+                        if parent is not None:
+                            while element.getprevious() is not None:
+                                del parent[0]
+                with parsing:
+                    parser.close()
+                self.record(metrics.PARSE, parsing.elapsed, self._request_type)
+                span.set(received_bytes=received, parse_seconds=parsing.elapsed)
+            finally:
+                # Drain whatever is left of the response.
+                for chunk in chunks:
+                    pass
+
+    @require_connected
+    def iter_request(
+        self, request, tag, value=None, response_node_name=None, silence_errors=False
+    ):
+        """
+        Send a simple request to the API, yielding each ``tag`` element of the
+        response as it is parsed (see :meth:`iter_message`).
+
+        :param request: A :cls:`fishbowl.xmlrequests.Request` instance, or text
+            containing the name of the base XML node to create
+        :param tag: The name of the repeated response node to yield
+        :param value: A string containing the text of the base node, or a
+            dictionary mapping to children nodes and their values (only used if
+            request is just the text node name)
+        :param response_node_name: Check the status of this base response XML
+            node
+        :param silence_errors: Stop yielding rather than raising an error if
+            the response returns an unexpected status code (default ``False``)
+        """
+        if isinstance(request, str):
+            request = xmlrequests.simple_request(request, value, key=self.key)
+        check_tags = ("FbiMsgsRs", response_node_name) if response_node_name else ()
+        attempt = 0
+        while True:
+            yielded = False
+            try:
+                for element in self.iter_message(request, tag, check_tags=check_tags):
+                    yielded = True
+                    yield element
+                return
+            except FishbowlError as e:
+                if not yielded:
+                    attempt = self._retry(request, e, attempt)
+                    if attempt is not None:
+                        request = xmlrequests.with_key(request, self.key)
+                        continue
+                if silence_errors:
+                    return
+                logger.error("Unexpected response status")
+                raise
+
+    @property
+    def response_parser(self):
+        """
+        An XML parser that decodes raw responses using the connection
+        encoding.
+        """
+        parser = getattr(self, "_response_parser", None)
+        if parser is None:
+            parser = etree.XMLParser(encoding=codecs.lookup(self.encoding).name)
+            self._response_parser = parser
+        return parser
 
     @require_connected
     def add_inventory(self, partnum, qty, uomid, cost, loctagnum):
@@ -520,7 +1144,7 @@ class Fishbowl(BaseFishbowl):
         """
         Returns all information relating to a part
         """
-        request = xmlrequests.InventoryQuantity(partnum, key=self.key)
+        request = xmlrequests.simple_request("InvQtyRq", {"PartNum": partnum}, key=self.key)
         return self.send_message(request)
 
     @require_connected
@@ -536,32 +1160,7 @@ class Fishbowl(BaseFishbowl):
         """
         Returns locations of the specified part
         """
-        response = self.get_part_info(partnum)
-        if locationgroup:
-            locations = []
-            for item in response[1][0]:
-                if next(item[1].iterfind("./LocationGroupName")).text == locationgroup:
-                    locations.append(
-                        {
-                            "location": item[1][0].text,
-                            "location_name": item[1][2].text,
-                            "description": item[1][3].text,
-                            "available_quantity": int(item[3].text),
-                            "total_quantity": int(item[2].text),
-                        }
-                    )
-        else:
-            locations = [
-                {
-                    "location": item[1][0].text,
-                    "location_name": item[1][2].text,
-                    "description": item[1][3].text,
-                    "available_quantity": int(item[3].text),
-                    "total_quantity": int(item[2].text),
-                }
-                for item in response[1][0]
-            ]
-        return locations
+        return parse_locations(self.get_part_info(partnum), locationgroup)
 
     @require_connected
     def cycle_inventory(self, partnum, qty, locationid):
@@ -591,10 +1190,7 @@ class Fishbowl(BaseFishbowl):
 
         :returns: A list of :cls:`fishbowl.objects.TaxRate` objects
         """
-        response = self.send_request(
-            "TaxRateGetRq", response_node_name="TaxRateGetRs", single=False
-        )
-        return [objects.TaxRate(node) for node in response.iter("TaxRate")]
+        return [objects.TaxRate(node) for node in self._reference("taxrates")]
 
     @require_connected
     def get_location_groups(self, only_active=True):
@@ -604,14 +1200,22 @@ class Fishbowl(BaseFishbowl):
         :returns: A list of :cls:`fishbowl.objects.LocationGroup` objects
         """
         location_groups = []
-        for row in self.send_query("SELECT * FROM LOCATIONGROUP"):
+        for row in self._reference("location_groups"):
             obj = objects.LocationGroup(row)
             if not only_active or obj["ActiveFlag"]:
                 location_groups.append(obj)
         return location_groups
 
     @require_connected
-    def get_customers(self, lazy=True, silence_lazy_errors=True):
+    @traced
+    def get_customers(
+        self,
+        lazy=True,
+        silence_lazy_errors=True,
+        multiplexer=None,
+        progress=None,
+        prefetch=LazyLoader.prefetch,
+    ):
         """
         Get customers.
 
@@ -619,37 +1223,93 @@ class Fishbowl(BaseFishbowl):
                proload all data in one lump. This will also load in the
                addresses for each customer which doesn't happen in non-lazy
                mode (defaults to True).
+        :param prefetch: When lazy customers are accessed in order, load up
+            to this many of the following customers in the same round trip
+            (see :cls:`LazyLoader`)
+        :param multiplexer: In non-lazy mode, load each customer in full
+            (including addresses) with its own ``CustomerGetRq``, spread
+            across the sessions of this
+            :cls:`fishbowl.multiplex.MultiplexedFishbowl`
+        :param progress: Report each customer loaded by the multiplexer (see
+            :func:`hydrate_requests`)
         :returns: A list of :cls:`fishbowl.objects.Customer` objects
         """
-        if not lazy:
-            response = self.send_request(
-                "CustomerListRq", response_node_name="CustomerListRs", single=False
+        if not lazy and multiplexer is not None:
+            names = self._customer_names()
+            nodes = hydrate_requests(
+                self,
+                [("CustomerGetRq", {"Name": name}, "CustomerGetRs") for name in names],
+                multiplexer=multiplexer,
+                progress=progress,
             )
-            return [objects.Customer(node) for node in response.iter("Customer")]
-        customers = []
+            customers = []
+            for name, node in zip(names, nodes):
+                if node is not None and len(node):
+                    customers.append(objects.Customer(node, name=name))
+            return customers
+        if not lazy:
+            return [
+                objects.Customer(node)
+                for node in self.iter_request(
+                    "CustomerListRq", "Customer", response_node_name="CustomerListRs"
+                )
+            ]
+        loader = LazyLoader(
+            self,
+            "CustomerGetRq",
+            "CustomerGetRs",
+            silence_errors=silence_lazy_errors,
+            prefetch=prefetch,
+        )
+        return [
+            loader.add(objects.Customer, {"Name": name}, name=name)
+            for name in self._customer_names()
+        ]
+
+    def _customer_names(self):
         response = self.send_request(
             "CustomerNameListRq", response_node_name="CustomerNameListRs", single=False
         )
-        for tag in response.iter("Name"):
-            get_customer = partial(
-                self.send_request,
-                "CustomerGetRq",
-                {"Name": tag.text},
-                response_node_name="CustomerGetRs",
-                silence_errors=silence_lazy_errors,
-            )
-            customer = objects.Customer(lazy_data=get_customer, name=tag.text)
-            customers.append(customer)
-        return customers
+        return [tag.text for tag in response.iter("Name")]
 
     @require_connected
     def get_uom_map(self):
-        response = self.send_request("UOMRq", response_node_name="UOMRs", single=False)
         return dict(
-            (uom["UOMID"], uom) for uom in [objects.UOM(node) for node in response.iter("UOM")]
+            (uom["UOMID"], uom) for uom in [objects.UOM(node) for node in self._reference("uoms")]
         )
 
     @require_connected
+    def fetch_reference(self, name, serializable=False):
+        """
+        Fetch a set of reference data (see ``REFERENCE_QUERIES`` and
+        ``REFERENCE_REQUESTS``) from the server.
+
+        :param serializable: Return the XML text of request based items
+            rather than their elements
+        :returns: A list of query rows or XML elements
+        """
+        if name in REFERENCE_QUERIES:
+            return list(self.send_query(REFERENCE_QUERIES[name]))
+        request, response_node_name, tag = REFERENCE_REQUESTS[name]
+        response = self.send_request(request, response_node_name=response_node_name, single=False)
+        if serializable:
+            return [etree.tostring(node, encoding="unicode") for node in response.iter(tag)]
+        return list(response.iter(tag))
+
+    def _reference(self, name):
+        """
+        Return a set of reference data, read through the reference cache if
+        there is one.
+        """
+        if self.reference_cache is None:
+            return self.fetch_reference(name)
+        items = self.reference_cache.get(name, self)
+        if name in REFERENCE_REQUESTS:
+            items = [etree.fromstring(item) for item in items]
+        return items
+
+    @require_connected
+    @traced
     def get_parts(self, populate_uoms=True):
         """
         Get a light list of parts.
@@ -658,61 +1318,88 @@ class Fishbowl(BaseFishbowl):
             (default ``True``)
         :returns: A list of cls:`fishbowl.objects.Part`
         """
-        response = self.send_request(
-            "LightPartListRq", response_node_name="LightPartListRs", single=False
-        )
-        parts = [objects.Part(node) for node in response.iter("LightPart")]
+        parts = [
+            objects.Part(node)
+            for node in self.iter_request(
+                "LightPartListRq", "LightPart", response_node_name="LightPartListRs"
+            )
+        ]
         if populate_uoms:
-            uom_map = self.get_uom_map()
-            for part in parts:
-                uomid = part.get("UOMID")
-                if not uomid:
-                    continue
-                uom = uom_map.get(uomid)
-                if uom:
-                    part.mapped["UOM"] = uom
+            populate_light_part_uoms(parts, self.get_uom_map())
         return parts
 
     @require_connected
-    def basic_query(self, sql, serializer):
-        objs = []
+    def basic_query(self, sql, serializer, columnar=False):
+        """
+        Return an ``(object, row)`` tuple for every row of a SQL query that
+        serializes to a non-empty object.
 
-        for row in self.send_query(sql):
+        :param columnar: Return a :cls:`fishbowl.columns.ColumnarResult`
+            instead, using the serializer's fields as the column types
+        """
+        if columnar:
+            return self.send_query(sql, columnar=True, schema=serializer)
+        return list(self.iter_basic_query(sql, serializer))
+
+    @require_connected
+    def iter_basic_query(self, sql, serializer, page_size=None):
+        """
+        Stream the rows of a SQL query, yielding an ``(object, row)`` tuple for
+        every row that serializes to a non-empty object.
+
+        :param page_size: Fetch the rows in pages of this size (see
+            :meth:`iter_query_pages`)
+        """
+        for row in self._iter_rows(sql, page_size):
             obj = serializer(row)
 
             if not obj:
                 continue
 
-            objs.append((obj, row))
-
-        return objs
+            yield obj, row
 
     @require_connected
-    def get_parts_all(self):
-        parts = []
-
-        for row in self.send_query(PARTS_SQL):
-            row.pop("customFields")
-            row["StandardCost"] = row.pop("stdCost")
+    @traced
+    def get_parts_all(self, page_size=None, compact=False, modified_since=None):
+        return list(
+            self.iter_parts_all(
+                page_size=page_size, compact=compact, modified_since=modified_since
+            )
+        )
 
-            obj = objects.Part(row)
+    @require_connected
+    def iter_parts_all(self, page_size=None, compact=False, modified_since=None):
+        """
+        Stream every part (with UOMs populated).
+
+        :param page_size: Fetch the parts in pages of this size (see
+            :meth:`iter_query_pages`)
+        :param compact: Yield read only :cls:`fishbowl.objects.Record` parts,
+            which use much less memory
+        :param modified_since: Only yield parts modified since this watermark
+            (see :func:`modified_since_query`)
+        """
+        uom_map = self.get_uom_map()
+        sql = PARTS_SQL
+        if modified_since is not None:
+            sql = modified_since_query(sql, modified_since)
+        for row in self._iter_rows(sql, page_size):
+            obj = part_from_row(row, uom_map, compact=compact)
 
             if not obj:
                 continue
 
-            parts.append((obj, row))
-
-        uom_map = self.get_uom_map()
-        for part, row in parts:
-            self.set_uom("uomId", "UOM", row, part, uom_map)
-            self.set_uom("weightUomId", "WeightUOM", row, part, uom_map)
-            self.set_uom("sizeUomId", "SizeUOM", row, part, uom_map)
+            yield obj
 
-        return [o for o, _ in parts]
+    @require_connected
+    def get_serial_numbers(self, page_size=None, compact=False):
+        return list(self.iter_serial_numbers(page_size=page_size, compact=compact))
 
     @require_connected
-    def get_serial_numbers(self):
-        return [o for o, _ in self.basic_query(SERIAL_NUMBER_SQL, objects.Serial)]
+    def iter_serial_numbers(self, page_size=None, compact=False):
+        serializer = objects.Serial.record if compact else objects.Serial
+        for obj, _ in self.iter_basic_query(SERIAL_NUMBER_SQL, serializer, page_size):
+            yield obj
 
     def set_uom(self, id_field, field, row, obj, uom_map):
         size_uomid = row.get(id_field)
@@ -722,7 +1409,10 @@ class Fishbowl(BaseFishbowl):
                 obj.mapped[field] = uom
 
     @require_connected
-    def get_products(self, lazy=True):
+    @traced
+    def get_products(
+        self, lazy=True, multiplexer=None, progress=None, prefetch=LazyLoader.prefetch
+    ):
         """
         Get a list of products, optionally lazy.
 
@@ -733,42 +1423,65 @@ class Fishbowl(BaseFishbowl):
 
         :param lazy: Whether the products should be lazily loaded (default
             ``True``)
+        :param multiplexer: Spread the non-lazy ``ProductGetRq`` requests
+            across the sessions of this
+            :cls:`fishbowl.multiplex.MultiplexedFishbowl`
+        :param progress: Report each non-lazy product as it is loaded (see
+            :func:`hydrate_requests`)
+        :param prefetch: When lazy products are accessed in order, load up to
+            this many of the following products in the same round trip (see
+            :cls:`LazyLoader`)
         :returns: A list of cls:`fishbowl.objects.Product`
         """
-        products = []
-        added = []
+        parts = []
+        added = set()
         for part in self.get_parts(populate_uoms=False):
             part_number = part.get("Num")
             # Skip parts without a number, and duplicates.
             if not part_number or part_number in added:
                 continue
+            added.add(part_number)
+            parts.append(part)
 
-            get_product = partial(
-                self.send_request,
-                "ProductGetRq",
-                {"Number": part_number},
-                response_node_name="ProductGetRs",
+        products = []
+        if not lazy:
+            nodes = hydrate_requests(
+                self,
+                [("ProductGetRq", {"Number": part["Num"]}, "ProductGetRs") for part in parts],
+                multiplexer=multiplexer,
+                progress=progress,
             )
-
-            product_kwargs = {"name": part_number}
-            if lazy:
-                product_kwargs["lazy_data"] = get_product
-            else:
-                product_node = get_product()
-                if not len(product_node):
+            for part, product_node in zip(parts, nodes):
+                if product_node is None or not len(product_node):
                     continue
-                product_kwargs["data"] = product_node
-            product = objects.Product(**product_kwargs)
+                product = objects.Product(product_node, name=part["Num"])
+                product.part = part
+                products.append(product)
+            return products
+
+        loader = LazyLoader(self, "ProductGetRq", "ProductGetRs", prefetch=prefetch)
+        for part in parts:
+            product = loader.add(objects.Product, {"Number": part["Num"]}, name=part["Num"])
             product.part = part
             products.append(product)
-            added.append(part_number)
         return products
 
     @require_connected
-    def get_products_fast(self, populate_uoms=True, custom_bools=None):
+    @traced
+    def get_products_fast(
+        self, populate_uoms=True, custom_bools=None, compact=False, modified_since=None
+    ):
         """
         Quickly get all products.
 
+        Pass ``compact=True`` to get read only :cls:`fishbowl.objects.Record`
+        products (and parts) instead, which use much less memory for large
+        catalogs.
+
+        Pass a ``modified_since`` watermark to only get the products modified
+        since then (see :func:`modified_since_query` and
+        :cls:`fishbowl.sync.Snapshot`).
+
         Here is an example of how to use ``Part`` custom fields::
 
             >>> products = connection.get_products_fast(
@@ -777,52 +1490,24 @@ class Fishbowl(BaseFishbowl):
             False
         """
         products = []
-        if populate_uoms:
-            uom_map = self.get_uom_map()
-
-        # Handle custom fields.
-        custom_fields = {}
-        ci_fields, custom_joins = [], []
-        if custom_bools:
-            for field, name in custom_bools.items():
-                ci_fields.append("CI.INFO AS {}".format(field))
-                custom_joins.append(
-                    """
-LEFT JOIN CUSTOMINTEGER CI ON CI.recordid = PART.ID AND CI.customfieldid = (
- select customfield.id from customfield
- inner join tablereference t on customfield.tableid=t.tableid
- where t.tablerefname='Part' and name='{}')""".format(
-                        name
-                    )
-                )
-                custom_fields[field] = objects.fishbowl_boolean
-        sql = PRODUCTS_SQL.format(
-            ci_fields="".join(", " + ci_field for ci_field in ci_fields),
-            custom_joins=" ".join(custom_joins),
-        )
-
-        for row in self.send_query(sql):
-            # NOTE: the PRODUCTS_SQL query selects every column from the
-            #       PRODUCT table (the P.* at the beginning) and at some
-            #       point Fishbowl has added a 'customFields' column that
-            #       seems to have a JSON blob in it... anyway, that conflicts
-            #       with how we parse out custom fields in actual XML
-            #       responses, so we get rid of it here.
-            if "customFields" in row:
-                del row["customFields"]
-            product = objects.Product(row, name=row.get("num"))
-            if not product:
-                continue
-            if populate_uoms:
-                self.set_uom("uomId", "UOM", row, product, uom_map)
-                self.set_uom("weightUomId", "WeightUOM", row, product, uom_map)
-                self.set_uom("sizeUomId", "SizeUOM", row, product, uom_map)
-
-            product.part = objects.Part(row, custom_fields=custom_fields)
-            products.append(product)
+        uom_map = self.get_uom_map() if populate_uoms else None
+        sql, custom_fields = products_query(custom_bools)
+        if modified_since is not None:
+            sql = modified_since_query(sql, modified_since)
+        rows = self.send_query(sql)
+        materializing = metrics.Stopwatch()
+        with self.trace("materialize") as span:
+            for row in rows:
+                with materializing:
+                    product = product_from_row(row, custom_fields, uom_map, compact=compact)
+                if product:
+                    products.append(product)
+            span.set(objects=len(products))
+        self.record(metrics.MATERIALIZE, materializing.elapsed, "get_products_fast")
         return products
 
     @require_connected
+    @traced
     def get_pricing_rules(self):
         """
         Get a list of pricing rules for products.
@@ -832,71 +1517,75 @@ LEFT JOIN CUSTOMINTEGER CI ON CI.recordid = PART.ID AND CI.customfieldid = (
             rules relevant to all customers.
         """
         pricing_rules = {None: []}
-
-        def process_rules(data, rules):
-            for row in data:
-                customer_type = row.pop("customerincltypeid")
-                customer_id = row.pop("customerinclid")
-                if customer_type == "1":
-                    customer_id = None
-                elif customer_type == "3":
-                    customer_id = int(row.pop("customerid"))
-                else:
-                    customer_id = int(customer_id)
-                customer_pricing = rules.setdefault(customer_id, [])
-                customer_pricing.append(objects.PriceRule(row))
-
-        process_rules(self.send_query(PRICING_RULES_SQL), pricing_rules)
-        process_rules(self.send_query(CUSTOMER_GROUP_PRICING_RULES_SQL), pricing_rules)
-
+        process_pricing_rules(self.send_query(PRICING_RULES_SQL), pricing_rules)
+        process_pricing_rules(self.send_query(CUSTOMER_GROUP_PRICING_RULES_SQL), pricing_rules)
         return pricing_rules
 
     @require_connected
-    def get_customers_fast(self, populate_addresses=True, populate_pricing_rules=False):
+    @traced
+    def get_customers_fast(
+        self,
+        populate_addresses=True,
+        populate_pricing_rules=False,
+        page_size=None,
+        modified_since=None,
+    ):
+        """
+        Quickly get all customers.
+
+        :param page_size: Fetch customers and addresses in pages of this size
+            (see :meth:`iter_query_pages`)
+        :param modified_since: Only get the customers modified since this
+            watermark (see :func:`modified_since_query`). Only the addresses
+            of those customers are fetched.
+        """
         customers = []
         # contact_map = dict(
         #     (contact['ACCOUNTID'], contact['NAME']) for contact in
         #     self.send_query('SELECT * FROM CONTACT'))
-        if populate_addresses:
-            country_map = {}
-            for country in self.send_query("SELECT * FROM COUNTRYCONST"):
-                country["CODE"] = country["abbreviation"]
-                country_map[country["id"]] = objects.Country(country)
-            state_map = dict(
-                (state["id"], objects.State(state))
-                for state in self.send_query("SELECT * FROM STATECONST")
+        address_map = pricing_rules = None
+        customer_rows = None
+        if modified_since is not None:
+            customer_rows = list(
+                self._iter_rows(
+                    modified_since_query("SELECT * FROM CUSTOMER", modified_since), page_size
+                )
             )
-            address_map = {}
-            for addr in self.send_query("SELECT * FROM ADDRESS"):
-                addresses = address_map.setdefault(addr["accountId"], [])
-                address = objects.Address(addr)
-                if address:
-                    country = country_map.get(addr["countryId"])
-                    if country:
-                        address.mapped["Country"] = country
-                    state = state_map.get(addr["stateId"])
-                    if state:
-                        address.mapped["State"] = state
-                    addresses.append(address)
+            if not customer_rows:
+                return customers
+        if populate_addresses:
+            country_map = build_country_map(self._reference("countries"))
+            state_map = build_state_map(self._reference("states"))
+            if customer_rows is None:
+                address_rows = self._iter_rows("SELECT * FROM ADDRESS", page_size)
+            else:
+                address_rows = self._iter_account_addresses(
+                    set(row["accountId"] for row in customer_rows)
+                )
+            address_map = build_address_map(address_rows, country_map, state_map)
         if populate_pricing_rules:
             pricing_rules = self.get_pricing_rules()
-        for row in self.send_query("SELECT * FROM CUSTOMER"):
-            customer = objects.Customer(row)
-            if not customer:
-                continue
-            # contact = contact_map.get(row['ACCOUNTID'])
-            # if contact:
-            #     customer.mapped['Attn'] = contact['NAME']
-            if populate_addresses:
-                customer.mapped["Addresses"] = address_map.get(customer["AccountID"], [])
-            if populate_pricing_rules:
-                rules = []
-                rules.extend(pricing_rules[None])
-                rules.extend(pricing_rules.get(customer["AccountID"], []))
-                customer.mapped["PricingRules"] = rules
-            customers.append(customer)
+        if customer_rows is None:
+            customer_rows = self._iter_rows("SELECT * FROM CUSTOMER", page_size)
+        materializing = metrics.Stopwatch()
+        with self.trace("materialize") as span:
+            for row in customer_rows:
+                with materializing:
+                    customer = customer_from_row(row, address_map, pricing_rules)
+                if customer:
+                    customers.append(customer)
+            span.set(objects=len(customers))
+        self.record(metrics.MATERIALIZE, materializing.elapsed, "get_customers_fast")
         return customers
 
+    def _iter_account_addresses(self, account_ids, chunk_size=500):
+        account_ids = sorted(int(account_id) for account_id in account_ids)
+        for i in range(0, len(account_ids), chunk_size):
+            chunk = ", ".join(str(account_id) for account_id in account_ids[i : i + chunk_size])
+            sql = "SELECT * FROM ADDRESS WHERE accountId IN ({})".format(chunk)
+            for row in self.iter_query(sql):
+                yield row
+
     @require_connected
     def get_so(self, number):
         response = self.send_request("LoadSORq", {"Number": number}, response_node_name="LoadSORs")
@@ -960,9 +1649,12 @@ LEFT JOIN CUSTOMINTEGER CI ON CI.recordid = PART.ID AND CI.customfieldid = (
 
         Refer to the Fishbowl documentation for the specific import you are
         using: https://www.fishbowlinventory.com/wiki/Imports_and_Exports#List_of_imports_and_exports
+
+        For large imports, see :mod:`fishbowl.imports`.
         """
         request = xmlrequests.ImportRequest(import_type, rows, key=self.key)
         response = self.send_message(request)
+        check_status(response.find("FbiMsgsRs"))
         check_status(response.xpath("//ImportRs")[0])
 
     @require_connected
@@ -994,6 +1686,195 @@ LEFT JOIN CUSTOMINTEGER CI ON CI.recordid = PART.ID AND CI.customfieldid = (
         check_status(response.find("FbiMsgsRs"))
         return [x.text for x in response.xpath("//Rows/Row")]
 
+    @require_connected
+    def iter_export(self, export_type, as_tuples=False, schema=None, header_map=None, raw=False):
+        """
+        Run an export, yielding each row as it is parsed from the response
+        rather than loading the whole response first (see
+        :mod:`fishbowl.exports`).
+
+        Rows are dictionaries keyed by the first (header) row.
+
+        :param as_tuples: Yield tuples (starting with the header tuple) rather
+            than dictionaries
+        :param schema: A :cls:`fishbowl.objects.FishbowlObject` class (or
+            fields dictionary) to convert the values of the matching columns
+            with
+        :param header_map: Field names of the schema by column name, for
+            columns not named after their field
+        :param raw: Yield the CSV text of each row (header first), like
+            :meth:`run_export`
+        """
+        request = xmlrequests.ExportRequest(export_type, key=self.key)
+        rows = self.iter_request(request, "Row", response_node_name="ExportRs")
+        texts = (row.text or "" for row in rows)
+        if raw:
+            return texts
+        rows = parse_query_rows(texts, as_tuples=as_tuples)
+        if schema is not None:
+            rows = exports.typed_rows(rows, schema, as_tuples=as_tuples, header_map=header_map)
+        return rows
+
+
+class BatchItem:
+    """
+    The pending response to a request added to a :cls:`RequestBatch`.
+    """
+
+    def __init__(self, request_name, response_node_name, single=True, silence_errors=False):
+        self.request_name = request_name
+        self.response_node_name = response_node_name
+        self.single = single
+        self.silence_errors = silence_errors
+        self.done = False
+        self._response = None
+        self._error = None
+
+    def __repr__(self):
+        return "<BatchItem {}{}>".format(self.request_name, "" if self.done else " (pending)")
+
+    def set_response(self, node):
+        try:
+            if node is None or node.tag != self.response_node_name:
+                raise FishbowlError(
+                    "Expected {} in batch response, got {}".format(
+                        self.response_node_name, "nothing" if node is None else node.tag
+                    )
+                )
+            check_status(node, allow_none=True)
+        except FishbowlError as e:
+            if self.silence_errors:
+                node = etree.Element("empty")
+            else:
+                self.set_error(e)
+                return
+        if self.single:
+            node = node[0] if len(node) else etree.Element("empty")
+        self._response = node
+        self.done = True
+
+    def set_error(self, error):
+        self._error = error
+        self.done = True
+
+    def result(self):
+        """
+        Return the response node of this request (following the same rules as
+        :meth:`Fishbowl.send_request`), raising any error the request had.
+        """
+        if not self.done:
+            raise FishbowlError("Batch has not been sent yet")
+        if self._error is not None:
+            raise self._error
+        return self._response
+
+
+class RequestBatch:
+    """
+    Collect several requests and send them together in a single
+    ``FbiMsgsRq`` envelope, rather than one round trip per request.
+
+    Example usage::
+
+        with connection.batch() as batch:
+            customers = [
+                batch.send_request(
+                    'CustomerGetRq', {'Name': name}, response_node_name='CustomerGetRs')
+                for name in names]
+        customers = [item.result() for item in customers]
+
+    :param batch_size: Automatically send the batch whenever it holds this many
+        requests (``None`` to only send when :meth:`flush` is called or the
+        context exits)
+    """
+
+    def __init__(self, fishbowl, batch_size=20):
+        self.fishbowl = fishbowl
+        self.batch_size = batch_size
+        self._request = None
+        self._items = []
+
+    def __len__(self):
+        return len(self._items)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, request, response_node_name=None, single=True, silence_errors=False):
+        """
+        Add a :cls:`fishbowl.xmlrequests.Request` to the batch.
+
+        :param response_node_name: The response node matching this request
+            (defaults to the request node name, ending in ``Rs`` rather than
+            ``Rq``)
+        :param single: Expect and return the single child of the response node
+            (default ``True``)
+        :param silence_errors: Return an empty XML node rather than raising an
+            error if the response returns an unexpected status code (default
+            ``False``)
+        :returns: A :cls:`BatchItem` holding the response once sent
+        """
+        if self._request is None:
+            self._request = xmlrequests.BatchRequest(key=self.fishbowl.key)
+        request_name = self._request.add_request(request).tag
+        if response_node_name is None:
+            response_node_name = re.sub(r"Rq$", "Rs", request_name)
+        item = BatchItem(request_name, response_node_name, single, silence_errors)
+        self._items.append(item)
+        if self.batch_size and len(self._items) >= self.batch_size:
+            self.flush()
+        return item
+
+    def send_request(
+        self, request, value=None, response_node_name=None, single=True, silence_errors=False
+    ):
+        """
+        Add a simple request to the batch, using the same arguments as
+        :meth:`Fishbowl.send_request`.
+        """
+        if isinstance(request, str):
+            request = xmlrequests.SimpleRequest(request, value, key=self.fishbowl.key)
+        return self.add(
+            request,
+            response_node_name=response_node_name,
+            single=single,
+            silence_errors=silence_errors,
+        )
+
+    def flush(self):
+        """
+        Send any pending requests, setting the response of each item.
+        """
+        request, items = self._request, self._items
+        self._request, self._items = None, []
+        if not items:
+            return
+        try:
+            root = self.fishbowl.send_message(request)
+        except Exception as e:
+            for item in items:
+                item.set_error(e)
+            raise
+        resp = root.find("FbiMsgsRs")
+        try:
+            if resp is None:
+                raise FishbowlError("No FbiMsgsRs in batch response")
+            # "Some requests had errors" is reported on the individual items.
+            if resp.get("statusCode") != statuscodes.SOME_REQUESTS_FAILED:
+                check_status(resp, allow_none=True)
+        except FishbowlError as e:
+            logger.error("Unexpected batch response status")
+            for item in items:
+                item.set_error(e)
+            raise
+        nodes = list(resp)
+        for i, item in enumerate(items):
+            item.set_response(nodes[i] if i < len(nodes) else None)
+
 
 class FishbowlAPI:
     """
@@ -1016,15 +1897,62 @@ class FishbowlAPI:
 
     client = Fishbowl
 
-    def __init__(self, task_name=None, **connection_args):
+    def __init__(
+        self,
+        task_name=None,
+        reference_cache=None,
+        response_cache=None,
+        metrics=None,
+        tracer=None,
+        transport=None,
+        recovery=None,
+        **connection_args,
+    ):
         self.task_name = task_name
+        self.reference_cache = reference_cache
+        self.response_cache = response_cache
+        self.metrics = metrics
+        self.tracer = tracer
+        self.transport = transport
+        self.recovery = recovery
         self.connection_args = connection_args
 
     def __enter__(self):
         self.fb = self.client(task_name=self.task_name)
+        self.use_caches(self.fb)
+        self.fb.session_factory = self.session
         self.fb.connect(**self.connection_args)
         return self.fb
 
+    @contextmanager
+    def session(self):
+        """
+        Context manager for a new connection, used by lazy objects after the
+        connection that created them has been closed.
+        """
+        fb = self.client(task_name=self.task_name)
+        self.use_caches(fb)
+        fb.session_factory = self.session
+        fb.connect(**self.connection_args)
+        try:
+            yield fb
+        finally:
+            fb.close(skip_errors=True)
+
+    def use_caches(self, fb):
+        if self.reference_cache is not None:
+            fb.reference_cache = self.reference_cache
+        if self.response_cache is not None:
+            fb.response_cache = self.response_cache
+        if self.metrics is not None:
+            fb.metrics = self.metrics
+        if self.tracer is not None:
+            fb.tracer = self.tracer
+        if self.transport is not None:
+            fb.transport = self.transport
+        if self.recovery is not None:
+            fb.recovery = self.recovery
+
     def __exit__(self, exc_type, exc_value, traceback):
         """
         Close the connection, but only show any errors while attempting this if
@@ -1040,6 +1968,53 @@ class FishbowlJSONAPI(FishbowlAPI):
     client = JSONFishbowl
 
 
+def hydrate_requests(fishbowl, requests, multiplexer=None, progress=None):
+    """
+    Send a ``(request, value, response_node_name)`` request for each item,
+    returning the responses in order.
+
+    :param fishbowl: The connection to send the requests on, one at a time
+    :param multiplexer: Spread the requests across the sessions of this
+        :cls:`fishbowl.multiplex.MultiplexedFishbowl` instead
+    :param progress: A callable called as ``progress(done, total, value,
+        error)`` after each request, where ``error`` is the exception of a
+        failed request (or ``None``). Failed requests then have a response
+        of ``None`` rather than raising their error.
+    """
+    total = len(requests)
+    if multiplexer is not None:
+        results = multiplexer.map("send_request", *zip(*requests), return_exceptions=True)
+    else:
+
+        def send_each():
+            for request in requests:
+                try:
+                    yield fishbowl.send_request(*request)
+                except (FishbowlConnectionError, FishbowlTimeoutError):
+                    raise
+                except FishbowlError as e:
+                    if not fishbowl.connected:
+                        # Nothing more can be sent, so raise the real error.
+                        raise
+                    yield e
+
+        results = send_each()
+
+    responses = []
+    try:
+        for done, (request, result) in enumerate(zip(requests, results), 1):
+            error = result if isinstance(result, Exception) else None
+            if progress is None:
+                if error is not None:
+                    raise error
+            else:
+                progress(done, total, request[1], error)
+            responses.append(None if error is not None else result)
+    finally:
+        results.close()
+    return responses
+
+
 def check_status(element, expected=statuscodes.SUCCESS, allow_none=False):
     """
     Check the status code from an XML node, raising an exception if it wasn't
@@ -1050,10 +2025,211 @@ def check_status(element, expected=statuscodes.SUCCESS, allow_none=False):
     if message is None:
         message = statuscodes.get_status(code)
     if str(code) != expected and (code is not None or not allow_none):
-        raise FishbowlError(message)
+        raise FishbowlError(message, code=code)
     return message
 
 
+def parse_locations(response, locationgroup=None):
+    """
+    Parse the locations of a part from an ``InvQtyRs`` response.
+    """
+    locations = []
+    for item in response[1][0]:
+        if locationgroup and next(item[1].iterfind("./LocationGroupName")).text != locationgroup:
+            continue
+        locations.append(
+            {
+                "location": item[1][0].text,
+                "location_name": item[1][2].text,
+                "description": item[1][3].text,
+                "available_quantity": int(item[3].text),
+                "total_quantity": int(item[2].text),
+            }
+        )
+    return locations
+
+
+UOM_FIELDS = (("uomId", "UOM"), ("weightUomId", "WeightUOM"), ("sizeUomId", "SizeUOM"))
+
+
+def row_uoms(row, uom_map):
+    """
+    Return the UOM objects for the UOM ids of a part or product query row.
+    """
+    uoms = {}
+    for id_field, field in UOM_FIELDS:
+        uomid = row.get(id_field)
+        if uomid:
+            uom = uom_map.get(int(uomid))
+            if uom:
+                uoms[field] = uom
+    return uoms
+
+
+def populate_uoms(row, obj, uom_map):
+    """
+    Set the UOM objects of a part or product from the UOM ids of its query row.
+    """
+    obj.mapped.update(row_uoms(row, uom_map))
+
+
+def populate_light_part_uoms(parts, uom_map):
+    for part in parts:
+        uomid = part.get("UOMID")
+        if not uomid:
+            continue
+        uom = uom_map.get(uomid)
+        if uom:
+            part.mapped["UOM"] = uom
+
+
+def part_from_row(row, uom_map=None, compact=False):
+    """
+    Build a :cls:`fishbowl.objects.Part` from a ``PARTS_SQL`` row.
+
+    :param compact: Build a read only :cls:`fishbowl.objects.Record` instead
+    """
+    row.pop("customFields")
+    row["StandardCost"] = row.pop("stdCost")
+    if compact:
+        return objects.Part.record(row, extra=uom_map and row_uoms(row, uom_map))
+    part = objects.Part(row)
+    if part and uom_map is not None:
+        populate_uoms(row, part, uom_map)
+    return part
+
+
+def products_query(custom_bools=None):
+    """
+    Build the SQL for a fast product query.
+
+    :returns: A tuple of the SQL and the custom fields to parse for each part
+    """
+    custom_fields = {}
+    ci_fields, custom_joins = [], []
+    if custom_bools:
+        for field, name in custom_bools.items():
+            ci_fields.append("CI.INFO AS {}".format(field))
+            custom_joins.append(
+                """
+LEFT JOIN CUSTOMINTEGER CI ON CI.recordid = PART.ID AND CI.customfieldid = (
+ select customfield.id from customfield
+ inner join tablereference t on customfield.tableid=t.tableid
+ where t.tablerefname='Part' and name='{}')""".format(
+                    name
+                )
+            )
+            custom_fields[field] = objects.fishbowl_boolean
+    sql = PRODUCTS_SQL.format(
+        ci_fields="".join(", " + ci_field for ci_field in ci_fields),
+        custom_joins=" ".join(custom_joins),
+    )
+    return sql, custom_fields
+
+
+def product_from_row(row, custom_fields=None, uom_map=None, compact=False):
+    """
+    Build a :cls:`fishbowl.objects.Product` (and its part) from a
+    ``PRODUCTS_SQL`` row, returning ``None`` for an empty product.
+
+    :param compact: Build read only :cls:`fishbowl.objects.Record` objects
+        instead
+    """
+    # NOTE: the PRODUCTS_SQL query selects every column from the
+    #       PRODUCT table (the P.* at the beginning) and at some
+    #       point Fishbowl has added a 'customFields' column that
+    #       seems to have a JSON blob in it... anyway, that conflicts
+    #       with how we parse out custom fields in actual XML
+    #       responses, so we get rid of it here.
+    if "customFields" in row:
+        del row["customFields"]
+    if compact:
+        product = objects.Product.record(row, extra=uom_map and row_uoms(row, uom_map))
+        if not product:
+            return None
+        product.part = objects.Part.record(row, custom_fields=custom_fields)
+        return product
+    product = objects.Product(row, name=row.get("num"))
+    if not product:
+        return None
+    if uom_map is not None:
+        populate_uoms(row, product, uom_map)
+    product.part = objects.Part(row, custom_fields=custom_fields or {})
+    return product
+
+
+def process_pricing_rules(rows, rules):
+    """
+    Add ``PRICING_RULES_SQL`` (or ``CUSTOMER_GROUP_PRICING_RULES_SQL``) rows
+    to a dictionary of pricing rules keyed by customer id.
+    """
+    for row in rows:
+        customer_type = row.pop("customerincltypeid")
+        customer_id = row.pop("customerinclid")
+        if customer_type == "1":
+            customer_id = None
+        elif customer_type == "3":
+            customer_id = int(row.pop("customerid"))
+        else:
+            customer_id = int(customer_id)
+        customer_pricing = rules.setdefault(customer_id, [])
+        customer_pricing.append(objects.PriceRule(row))
+    return rules
+
+
+def build_country_map(rows):
+    country_map = {}
+    for country in rows:
+        country = dict(country, CODE=country["abbreviation"])
+        country_map[country["id"]] = objects.Country(country)
+    return country_map
+
+
+def build_state_map(rows):
+    return dict((state["id"], objects.State(state)) for state in rows)
+
+
+def build_address_map(rows, country_map, state_map):
+    """
+    Build a dictionary of :cls:`fishbowl.objects.Address` lists keyed by
+    account id from ``ADDRESS`` table rows.
+    """
+    address_map = {}
+    for addr in rows:
+        addresses = address_map.setdefault(addr["accountId"], [])
+        address = objects.Address(addr)
+        if address:
+            country = country_map.get(addr["countryId"])
+            if country:
+                address.mapped["Country"] = country
+            state = state_map.get(addr["stateId"])
+            if state:
+                address.mapped["State"] = state
+            addresses.append(address)
+    return address_map
+
+
+def customer_from_row(row, address_map=None, pricing_rules=None):
+    """
+    Build a :cls:`fishbowl.objects.Customer` from a ``CUSTOMER`` table row,
+    returning ``None`` for an empty customer.
+    """
+    customer = objects.Customer(row)
+    if not customer:
+        return None
+    # contact = contact_map.get(row['ACCOUNTID'])
+    # if contact:
+    #     customer.mapped['Attn'] = contact['NAME']
+    if address_map is not None:
+        customer.mapped["Addresses"] = address_map.get(customer["AccountID"], [])
+    if pricing_rules is not None:
+        rules = []
+        rules.extend(pricing_rules[None])
+        rules.extend(pricing_rules.get(customer["AccountID"], []))
+        customer.mapped["PricingRules"] = rules
+    return customer
+
+
 def format_rows(rows):
     """
     Format rows for use with run_import.
@@ -0,0 +1,265 @@
+"""
+An in-process cache of read only Fishbowl responses.
+
+Services often repeat the same read only request (a customer by name, a
+product by number, a fixed SQL query) many times a minute. Setting a
+:cls:`ResponseCache` as a connection's ``response_cache`` answers repeats
+from memory until they expire.
+
+Example usage::
+
+    from fishbowl.api import FishbowlAPI
+    from fishbowl.cache import ResponseCache
+
+    cache = ResponseCache(ttls={"ProductGetRq": 300})
+    fishbowl_api = FishbowlAPI(response_cache=cache, **connection_args)
+
+Responses are cached by request type and the request's XML (without the
+session ticket), so the same SQL or the same parameters hit the same entry.
+Only request types with a TTL are cached and mutating requests never are.
+Sending a mutating request drops the cached responses it could make stale
+(see ``INVALIDATES``), and only successful responses are cached.
+
+Only responses read whole (through
+:meth:`fishbowl.api.Fishbowl.send_message`) are cached. Streamed reads never
+check or fill the cache, as the response isn't kept: that includes
+:meth:`fishbowl.api.Fishbowl.iter_query`, ``iter_request`` and
+``iter_export``, and so ``send_query(columnar=True)`` and the paged loaders
+(such as ``get_parts_all(page_size=...)``). A mutating request sent through
+them still invalidates the cache.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from lxml import etree
+
+from . import statuscodes, xmlrequests
+
+logger = logging.getLogger(__name__)
+
+# Default seconds to cache responses for, by request type.
+DEFAULT_TTLS = {
+    "CustomerGetRq": 60,
+    "CustomerNameListRq": 60,
+    "ProductGetRq": 60,
+    "LightPartListRq": 60,
+    "InvQtyRq": 10,
+    "GetTotalInventoryRq": 10,
+    "GetPOListRq": 30,
+    "LoadSORq": 30,
+    "ExecuteQueryRq": 30,
+    "UOMRq": 300,
+    "TaxRateGetRq": 300,
+    "ImportHeaderRq": 3600,
+    "ImportListRq": 3600,
+    "ExportListRq": 3600,
+}
+
+# Cached request types made stale by each mutating request type.
+ALL = "*"
+INVALIDATES = {
+    "SOSaveRq": ("LoadSORq", "ExecuteQueryRq"),
+    "AddInventoryRq": ("InvQtyRq", "GetTotalInventoryRq", "ExecuteQueryRq"),
+    "CycleCountRq": ("InvQtyRq", "GetTotalInventoryRq", "ExecuteQueryRq"),
+    "AddMemoRq": ("LoadSORq",),
+    "ImportRq": (ALL,),
+}
+
+# Requests that must never be answered from the cache.
+MUTATING_REQUESTS = frozenset(INVALIDATES) | frozenset(["LoginRq", "LogoutRq", "ExportRq"])
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def requests(self):
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self):
+        if not self.requests:
+            return 0.0
+        return self.hits / self.requests
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hit_rate,
+        }
+
+    def __repr__(self):
+        return "<CacheStats hits={} misses={} evictions={} invalidations={}>".format(
+            self.hits, self.misses, self.evictions, self.invalidations
+        )
+
+
+def request_types(msg):
+    """
+    Return the request type (tag) of each request in a message.
+    """
+    if isinstance(msg, xmlrequests.CompiledRequest):
+        return [msg.request_type]
+    if isinstance(msg, xmlrequests.Request):
+        request_el = msg.el_request
+    else:
+        try:
+            request_el = etree.fromstring(msg).find("FbiMsgsRq")
+        except etree.XMLSyntaxError:
+            return []
+        if request_el is None:
+            return []
+    return [el.tag for el in request_el]
+
+
+def successful(root):
+    """
+    Whether a response and each of its request responses succeeded.
+    """
+    response = root.find("FbiMsgsRs")
+    if response is None or response.get("statusCode") != statuscodes.SUCCESS:
+        return False
+    return all(el.get("statusCode") in (None, statuscodes.SUCCESS) for el in response)
+
+
+class ResponseCache:
+    """
+    A thread safe LRU cache of responses, shareable between connections.
+
+    :param max_entries: The maximum number of cached responses
+    :param max_bytes: The maximum total size of the cached responses
+    :param ttls: Seconds to cache each request type for, merged over
+        ``DEFAULT_TTLS`` (set a type to ``None`` to stop caching it)
+    :param default_ttl: Seconds to cache other read only request types for
+        (by default they aren't cached)
+    :param invalidates: Extra invalidations, merged over ``INVALIDATES``
+    """
+
+    def __init__(
+        self,
+        max_entries=1000,
+        max_bytes=16 * 1024 * 1024,
+        ttls=None,
+        default_ttl=None,
+        invalidates=None,
+        clock=time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        cached_mutations = MUTATING_REQUESTS.intersection(
+            name for name, ttl in self.ttls.items() if ttl
+        )
+        if cached_mutations:
+            raise ValueError(
+                "Mutating requests can't be cached: {}".format(", ".join(sorted(cached_mutations)))
+            )
+        self.default_ttl = default_ttl
+        self.invalidates = dict(INVALIDATES, **(invalidates or {}))
+        self.clock = clock
+        self.stats = CacheStats()
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_ttl(self, request_type):
+        if request_type in MUTATING_REQUESTS:
+            return None
+        return self.ttls.get(request_type, self.default_ttl)
+
+    def key(self, msg):
+        """
+        Return the cache key of a message, or ``None`` if its response can't
+        be cached (it isn't a single, cacheable request).
+        """
+        if isinstance(msg, xmlrequests.CompiledRequest):
+            if not self.get_ttl(msg.request_type):
+                return None
+            return msg.request_type, msg.body
+        if not isinstance(msg, xmlrequests.Request) or len(msg.el_request) != 1:
+            return None
+        el = msg.el_request[0]
+        if not self.get_ttl(el.tag):
+            return None
+        return el.tag, etree.tostring(el)
+
+    def get(self, key):
+        """
+        Return the cached response for a key, or ``None``.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self.clock():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def set(self, key, response):
+        """
+        Cache a response, evicting the least recently used responses to stay
+        within the size limits.
+        """
+        response = bytes(response)
+        if len(response) > self.max_bytes:
+            return
+        expires = self.clock() + self.get_ttl(key[0])
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, response)
+            self.size += len(response)
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.stats.evictions += 1
+
+    def _remove(self, key):
+        self.size -= len(self._entries.pop(key)[1])
+
+    def invalidate(self, request_types=None):
+        """
+        Drop the cached responses of the given request types (or every
+        cached response).
+        """
+        with self._lock:
+            if request_types is None or ALL in request_types:
+                keys = list(self._entries)
+            else:
+                keys = [key for key in self._entries if key[0] in request_types]
+            for key in keys:
+                self._remove(key)
+            self.stats.invalidations += len(keys)
+
+    def sent(self, types):
+        """
+        Invalidate the responses made stale by sending requests of these
+        types.
+        """
+        stale = set()
+        for request_type in types:
+            stale.update(self.invalidates.get(request_type, ()))
+        if stale:
+            logger.debug("Invalidating cached %s responses", ", ".join(sorted(stale)))
+            self.invalidate(stale)
+
+    def clear(self):
+        self.invalidate()
+
+    def __len__(self):
+        return len(self._entries)
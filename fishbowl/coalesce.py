@@ -0,0 +1,166 @@
+"""
+Single-flight coalescing of identical read requests across threads.
+
+When a cache expires, many threads tend to make the same read at the same
+moment, each with its own Fishbowl session. A :cls:`CoalescingFishbowlAPI`
+lets the first thread make the call while the others making the identical
+call wait for it and share its result (or its exception), without acquiring
+a session of their own.
+
+Example usage::
+
+    from fishbowl.coalesce import CoalescingFishbowlAPI
+    from fishbowl.pool import PooledFishbowlAPI
+
+    pooled_api = PooledFishbowlAPI(**connection_args)
+    fishbowl_api = CoalescingFishbowlAPI(lambda: pooled_api)
+
+    def worker():
+        # At most one of these runs at a time, however many threads call it.
+        rules = fishbowl_api.get_pricing_rules()
+
+Results are shared between the threads that waited on the same call, so treat
+them as read only.
+"""
+
+from __future__ import unicode_literals
+
+import collections.abc
+import threading
+
+# The read only Fishbowl methods that can be coalesced. Methods returning
+# lazily loaded objects (which need their session later) aren't included.
+COALESCED_METHODS = frozenset(
+    [
+        "send_query",
+        "basic_query",
+        "get_part_info",
+        "get_total_inventory",
+        "get_locations",
+        "get_po_list",
+        "get_taxrates",
+        "get_location_groups",
+        "get_uom_map",
+        "get_parts",
+        "get_parts_all",
+        "get_serial_numbers",
+        "get_products_fast",
+        "get_pricing_rules",
+        "get_customers_fast",
+        "get_so",
+        "get_available_imports",
+        "get_import_headers",
+        "get_available_exports",
+    ]
+)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Run a function once for concurrent calls with the same key, sharing its
+    result (or exception) with every caller.
+
+    :attr calls: The number of times a function was actually run
+    :attr shared: The number of calls answered by another caller's run
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+def make_key(name, args, kwargs):
+    """
+    Return a hashable key for a method call, or ``None`` if its arguments
+    aren't hashable.
+    """
+    key = (name, args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class CoalescingFishbowlAPI:
+    """
+    Make read only Fishbowl calls (see ``COALESCED_METHODS``), coalescing
+    identical concurrent calls into one.
+
+    :param session_factory: A callable returning a context manager that
+        yields a connected client, such as
+        :meth:`fishbowl.pool.SessionPool.session`
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.flight = SingleFlight()
+
+    def call(self, name, *args, **kwargs):
+        """
+        Call a Fishbowl method in a session, sharing the call with other
+        threads making the identical call at the same time.
+        """
+        if name not in COALESCED_METHODS:
+            raise ValueError("{} can't be coalesced".format(name))
+        key = make_key(name, args, kwargs)
+        if key is None:
+            return self._call(name, args, kwargs)
+        return self.flight.do(key, self._call, name, args, kwargs)
+
+    def _call(self, name, args, kwargs):
+        with self.session_factory() as fishbowl:
+            result = getattr(fishbowl, name)(*args, **kwargs)
+            if isinstance(result, collections.abc.Iterator):
+                # Read lazy results while the session is still open, and so
+                # that every caller can iterate them.
+                result = list(result)
+        return result
+
+    def __getattr__(self, name):
+        if name not in COALESCED_METHODS:
+            raise AttributeError(name)
+
+        def method(*args, **kwargs):
+            return self.call(name, *args, **kwargs)
+
+        method.__name__ = name
+        return method
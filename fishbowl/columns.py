@@ -0,0 +1,232 @@
+"""
+Columnar SQL query results.
+
+Reporting code usually pivots query rows into columns straight away, so
+rather than building a dictionary per row, :func:`from_rows` collects each
+column of a query and converts it into a typed array in one go:
+
+======== ============================== ===============================
+Type     ``array.array``                NumPy (when installed)
+======== ============================== ===============================
+int      ``"q"``                        ``int64``
+float    ``"d"`` (``nan`` if missing)   ``float64``
+datetime ``"q"`` epoch microseconds     ``int64``
+bool     ``"b"``                        ``bool``
+str      ``list``                       ``list``
+======== ============================== ===============================
+
+Missing datetimes are stored as :data:`NAT` (the smallest int64, which is
+also how NumPy represents ``NaT``), so a NumPy datetime column can be viewed
+as dates with ``column.view("datetime64[us]")``. Integer columns with missing
+values become float columns, and ``Decimal`` values are stored as floats.
+
+Column types are inferred from a sample of each column's values, or declared
+with a :cls:`fishbowl.objects.FishbowlObject` class (or a fields dictionary)
+whose fields are matched case insensitively to the query's columns.
+
+Example usage::
+
+    with fishbowl_api as fishbowl:
+        rules = fishbowl.send_query(PRICING_RULES_SQL, columnar=True)
+        average = sum(rules["paamount"]) / rules.num_rows
+"""
+
+from __future__ import unicode_literals
+
+import collections.abc
+import datetime
+import decimal
+from array import array
+from itertools import islice
+
+from .objects import fishbowl_boolean, fishbowl_datetime
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+INT, FLOAT, DATETIME, BOOL, STR = "int", "float", "datetime", "bool", "str"
+
+# The missing datetime value, matching NumPy's NaT.
+NAT = -(2**63)
+
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+# Types tried, in order, when inferring a column's type.
+INFER_ORDER = (INT, FLOAT, DATETIME, BOOL, STR)
+
+# Declared field parsers and the column type they map to.
+PARSER_TYPES = {
+    int: INT,
+    float: FLOAT,
+    decimal.Decimal: FLOAT,
+    fishbowl_datetime: DATETIME,
+    fishbowl_boolean: BOOL,
+    None: STR,
+}
+
+NUMPY_DTYPES = {INT: "int64", FLOAT: "float64", DATETIME: "int64", BOOL: "bool"}
+
+BOOL_VALUES = {"true": True, "t": True, "false": False, "f": False}
+
+
+def _to_datetime(text):
+    return (fishbowl_datetime(text) - EPOCH) // MICROSECOND
+
+
+def _to_bool(text):
+    return BOOL_VALUES[text.lower()]
+
+
+def convert_column(values, column_type):
+    """
+    Convert a column of text values to the given column type, raising
+    ``ValueError`` if any value doesn't fit it.
+    """
+    if column_type == STR:
+        return values
+    try:
+        if column_type == INT:
+            if "" in values:
+                raise ValueError("Missing integer value")
+            return array("q", map(int, values))
+        if column_type == FLOAT:
+            return array("d", [float(value) if value else float("nan") for value in values])
+        if column_type == DATETIME:
+            return array("q", [_to_datetime(value) if value else NAT for value in values])
+        if column_type == BOOL:
+            return array("b", [_to_bool(value) if value else False for value in values])
+    except (KeyError, TypeError, OverflowError) as e:
+        raise ValueError(e)
+    raise ValueError("Unknown column type {!r}".format(column_type))
+
+
+def declared_boolean_column(values):
+    """
+    Convert a column declared as a Fishbowl boolean (which accepts any value).
+    """
+    return array("b", map(fishbowl_boolean, values))
+
+
+def infer_type(values, sample_size=100):
+    """
+    Infer the type of a column of text values from a sample of its non-empty
+    values.
+    """
+    sample = list(islice((value for value in values if value), sample_size))
+    if not sample:
+        return STR
+    for column_type in INFER_ORDER:
+        try:
+            convert_column(sample, column_type)
+        except ValueError:
+            continue
+        return column_type
+    return STR
+
+
+def schema_types(schema):
+    """
+    Return a lowercase column name to column type map for a declared schema,
+    either a :cls:`fishbowl.objects.FishbowlObject` class or a fields
+    dictionary.
+    """
+    fields = schema if isinstance(schema, dict) else getattr(schema, "fields", {})
+    types = {}
+    for name, parser in fields.items():
+        try:
+            column_type = PARSER_TYPES.get(parser)
+        except TypeError:  # Unhashable nested schemas.
+            continue
+        if column_type:
+            types[name.lower()] = column_type
+    return types
+
+
+class ColumnarResult(collections.abc.Mapping):
+    """
+    The columns of a query result, by column name, in query order.
+
+    :attr types: The type of each column (``"int"``, ``"float"``,
+        ``"datetime"``, ``"bool"`` or ``"str"``)
+    :attr num_rows: The number of rows
+    """
+
+    def __init__(self, columns, types, num_rows):
+        self.columns = columns
+        self.types = types
+        self.num_rows = num_rows
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns)
+
+    @property
+    def names(self):
+        return list(self.columns)
+
+    def __repr__(self):
+        return "<ColumnarResult {} rows: {}>".format(
+            self.num_rows,
+            ", ".join("{} {}".format(name, self.types[name]) for name in self.columns),
+        )
+
+
+def from_rows(rows, schema=None, sample_size=100, use_numpy=True):
+    """
+    Build a :cls:`ColumnarResult` from query rows as tuples, starting with the
+    header tuple (see :meth:`fishbowl.api.Fishbowl.iter_query`).
+
+    :param schema: A :cls:`fishbowl.objects.FishbowlObject` class or fields
+        dictionary declaring column types. Other columns are inferred.
+    :param sample_size: The number of values used to infer a column's type
+    :param use_numpy: Use NumPy arrays rather than ``array.array`` when NumPy
+        is installed
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return ColumnarResult({}, {}, 0)
+    width = len(header)
+    values = [[] for _ in header]
+    appends = [column.append for column in values]
+    length = 0
+    for row in rows:
+        if len(row) != width:
+            row = (tuple(row) + ("",) * width)[:width]
+        for append, value in zip(appends, row):
+            append(value)
+        length += 1
+
+    declared = schema_types(schema)
+    columns = {}
+    types = {}
+    for name, column in zip(header, values):
+        column_type = declared.get(name.lower())
+        if column_type == BOOL:
+            converted = declared_boolean_column(column)
+        else:
+            if column_type is None:
+                column_type = infer_type(column, sample_size)
+            # Fall back to the next looser type if the whole column doesn't
+            # fit the declared or sampled one.
+            for column_type in INFER_ORDER[INFER_ORDER.index(column_type) :]:
+                try:
+                    converted = convert_column(column, column_type)
+                except ValueError:
+                    continue
+                break
+        if use_numpy and numpy is not None and column_type in NUMPY_DTYPES:
+            converted = numpy.frombuffer(converted, dtype=converted.typecode).astype(
+                NUMPY_DTYPES[column_type], copy=False
+            )
+        columns[name] = converted
+        types[name] = column_type
+    return ColumnarResult(columns, types, length)
@@ -0,0 +1,175 @@
+"""
+Streaming exports.
+
+:meth:`fishbowl.api.Fishbowl.run_export` returns every row of an export at
+once. :meth:`fishbowl.api.Fishbowl.iter_export` instead parses the response
+as it arrives, yielding each row as a dictionary keyed by the export's header
+(optionally typed by a :cls:`fishbowl.objects.FishbowlObject` schema), and
+:func:`export_to_file` writes an export to a CSV or JSON lines file in
+constant memory.
+
+Example usage::
+
+    from fishbowl import exports, objects
+
+    with fishbowl_api as fishbowl:
+        for row in fishbowl.iter_export(
+            "ExportPart", schema=objects.Part, header_map={"PartNumber": "Num"}
+        ):
+            ...
+
+    with fishbowl_api as fishbowl:
+        exports.export_to_file(fishbowl, "ExportInventoryQuantities", "inventory.jsonl")
+
+As with :meth:`fishbowl.api.Fishbowl.iter_query`, no other request can be
+made on the connection until the rows have all been read.
+"""
+
+from __future__ import unicode_literals
+
+import csv
+import datetime
+import decimal
+import json
+import logging
+import os
+
+from .objects import fishbowl_boolean, fishbowl_datetime
+
+logger = logging.getLogger(__name__)
+
+# The field parsers that typed rows are converted with. Other fields (nested
+# objects) are left as text.
+PARSERS = (int, float, decimal.Decimal, fishbowl_datetime, fishbowl_boolean)
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl"}
+
+
+def column_parsers(header, schema, header_map=None):
+    """
+    Return ``(index, name, parser)`` for each column of a header that has a
+    typed field in the schema.
+
+    :param schema: A :cls:`fishbowl.objects.FishbowlObject` class or a fields
+        dictionary, whose field names are matched case insensitively
+    :param header_map: Field names by column name, for columns not named
+        after their field
+    """
+    fields = schema if isinstance(schema, dict) else schema.fields
+    parsers = {}
+    for name, parser in fields.items():
+        if any(parser is known for known in PARSERS):
+            parsers[name.lower()] = parser
+    header_map = header_map or {}
+    typed = []
+    for index, name in enumerate(header):
+        parser = parsers.get(header_map.get(name, name).lower())
+        if parser is not None:
+            typed.append((index, name, parser))
+    return typed
+
+
+def typed_rows(rows, schema, as_tuples=False, header_map=None):
+    """
+    Convert the values of rows (from :func:`fishbowl.api.parse_query_rows`)
+    with the schema's field parsers. Empty values become ``None``.
+    """
+    rows = iter(rows)
+    if as_tuples:
+        header = next(rows, None)
+        if header is None:
+            return
+        yield header
+        parsers = column_parsers(header, schema, header_map)
+        for row in rows:
+            values = list(row)
+            for index, _, parser in parsers:
+                if index < len(values):
+                    values[index] = parser(values[index]) if values[index] else None
+            yield tuple(values)
+        return
+    parsers = None
+    for row in rows:
+        if parsers is None:
+            parsers = column_parsers(list(row), schema, header_map)
+        for _, name, parser in parsers:
+            value = row.get(name)
+            row[name] = parser(value) if value else None
+        yield row
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def write_csv(rows, file):
+    """
+    Write rows (tuples starting with the header, or lines of CSV text) to a
+    CSV file, returning the number of rows after the header.
+
+    :param file: A path, or a text file opened with ``newline=""``
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "w", newline="", encoding="utf-8") as f:
+            return write_csv(rows, f)
+    writer = csv.writer(file)
+    count = -1
+    for row in rows:
+        if isinstance(row, str):
+            file.write(row)
+            file.write("\r\n")
+        else:
+            writer.writerow(row)
+        count += 1
+    return max(count, 0)
+
+
+def write_jsonl(rows, file):
+    """
+    Write rows (dictionaries) to a JSON lines file, returning the number of
+    rows.
+
+    :param file: A path, or a text file
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "w", encoding="utf-8") as f:
+            return write_jsonl(rows, f)
+    count = 0
+    for row in rows:
+        file.write(json.dumps(row, default=_json_default))
+        file.write("\n")
+        count += 1
+    return count
+
+
+def export_to_file(fishbowl, export_type, file, format=None, schema=None, header_map=None):
+    """
+    Stream an export to a file, returning the number of rows written.
+
+    :param format: ``"csv"`` or ``"jsonl"`` (by default, from the file
+        extension)
+    :param schema: Type the values (see :func:`typed_rows`). CSV exports are
+        otherwise copied row by row without being parsed.
+    """
+    if format is None:
+        extension = os.path.splitext(str(getattr(file, "name", file)))[1].lower()
+        format = FORMATS.get(extension)
+        if format is None:
+            raise ValueError("Can't tell the format of {}".format(file))
+    if format == "csv":
+        if schema is None:
+            rows = fishbowl.iter_export(export_type, raw=True)
+        else:
+            rows = fishbowl.iter_export(
+                export_type, as_tuples=True, schema=schema, header_map=header_map
+            )
+        count = write_csv(rows, file)
+    elif format == "jsonl":
+        rows = fishbowl.iter_export(export_type, schema=schema, header_map=header_map)
+        count = write_jsonl(rows, file)
+    else:
+        raise ValueError("Unknown export format {!r}".format(format))
+    logger.info("Exported %s rows of %s", count, export_type)
+    return count
@@ -0,0 +1,819 @@
+"""
+A local stand-in for a Fishbowl server, for end to end and load testing.
+
+:cls:`FishbowlTestServer` speaks the Fishbowl protocol (4 byte length
+prefixed XML or JSON messages) over a real socket, answering logins, SQL
+queries of generated tables (see :cls:`SyntheticData`), part, customer and
+product requests, and imports and exports. Latency, bandwidth limits and
+faults (see :cls:`Faults`) can be injected to see how clients behave against
+a slow or unreliable server.
+
+Example usage::
+
+    from fishbowl.api import FishbowlAPI
+    from fishbowl.fakeserver import Faults, FishbowlTestServer
+
+    with FishbowlTestServer(parts=10000, latency=0.005) as server:
+        with FishbowlAPI(**server.connection_args) as fishbowl:
+            rows = fishbowl.send_query("SELECT * FROM part")
+
+    flaky = FishbowlTestServer(faults=Faults(drop_rate=0.01)).start()
+
+Or run one from the command line with::
+
+    python -m fishbowl.fakeserver --port 28192 --parts 10000 --latency 0.005
+
+Only enough SQL is understood for the client's own queries of the generated
+tables: the table name, an ``id > n`` condition and a ``LIMIT``.
+"""
+
+from __future__ import unicode_literals
+
+import argparse
+import base64
+import collections
+import csv
+import hashlib
+import io
+import json
+import logging
+import random
+import re
+import socket
+import socketserver
+import struct
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from lxml import etree
+
+from . import statuscodes
+
+logger = logging.getLogger(__name__)
+
+LOGIN_REQUESTS = frozenset(["LoginRq", "LogoutRq"])
+
+UNKNOWN_MESSAGE = "1001"
+DATABASE_ERROR = "1004"
+LOGGED_OUT = "1010"
+INVALID_LOGIN = "1120"
+INVALID_TICKET = "1130"
+INVALID_REQUEST = "1150"
+INVALID_IMPORT = "1500"
+UNKNOWN_IMPORT = "1501"
+UNKNOWN_EXPORT = "1503"
+PRODUCT_NOT_FOUND = "2100"
+CUSTOMER_NOT_FOUND = "3000"
+
+FROM_RE = re.compile(r"\bFROM\s+(\w+)", re.IGNORECASE)
+AFTER_RE = re.compile(r"\b(?:\w+\.)?id\s*>\s*(\d+)", re.IGNORECASE)
+LIMIT_RE = re.compile(r"\bLIMIT\s+(\d+)", re.IGNORECASE)
+
+
+class RequestError(Exception):
+    def __init__(self, code):
+        super().__init__(statuscodes.get_status(code))
+        self.code = code
+
+
+def csv_row(values):
+    out = io.StringIO()
+    csv.writer(out, quoting=csv.QUOTE_ALL, lineterminator="").writerow(values)
+    return out.getvalue()
+
+
+def element(tag, children=(), **attrib):
+    """
+    Build an XML element from ``(tag, text)`` (or ``(tag, children)``)
+    pairs.
+    """
+    el = etree.Element(tag, **attrib)
+    for child_tag, value in children:
+        if isinstance(value, (list, tuple)):
+            el.append(element(child_tag, value))
+        else:
+            etree.SubElement(el, child_tag).text = value
+    return el
+
+
+class SyntheticData:
+    """
+    Generated tables for the stand-in server to serve.
+
+    :param parts: The number of parts (with one product each)
+    :param customers: The number of customers
+    :param seed: Seed for the generated values
+    """
+
+    uoms = [("1", "Each", "ea"), ("2", "Pound", "lbs"), ("3", "Foot", "ft")]
+    imports = {
+        "ImportPart": ("PartNumber", "PartDescription", "UOM", "PartType", "Active"),
+        "ImportCustomers": ("Name", "AddressName", "City", "Zip", "Active"),
+    }
+    exports = {"ExportPart": "part", "ExportCustomers": "customer"}
+
+    def __init__(self, parts=1000, customers=100, seed=0):
+        rng = random.Random(seed)
+        start = datetime(2019, 1, 1)
+
+        def date(i):
+            return (start + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S.0")
+
+        self.tables = {
+            "uom": (
+                ("id", "name", "code", "activeFlag"),
+                [(id, name, code, "1") for id, name, code in self.uoms],
+            )
+        }
+        part_rows, product_rows = [], []
+        for i in range(1, parts + 1):
+            num = "P{:06d}".format(i)
+            uom = str(rng.randint(1, len(self.uoms)))
+            cost = "{:.2f}".format(rng.uniform(1, 100))
+            price = "{:.2f}".format(float(cost) * 1.5)
+            part_rows.append(
+                (str(i), num, "Part {}".format(i), uom, "10", cost, "1", date(i), date(i))
+            )
+            product_rows.append(
+                (str(i), str(i), num, "Product {}".format(i), price, uom, "1", date(i), date(i))
+            )
+        self.tables["part"] = (
+            (
+                "id",
+                "num",
+                "description",
+                "uomId",
+                "typeId",
+                "stdCost",
+                "activeFlag",
+                "dateCreated",
+                "dateLastModified",
+            ),
+            part_rows,
+        )
+        self.tables["product"] = (
+            (
+                "id",
+                "partId",
+                "num",
+                "description",
+                "price",
+                "uomId",
+                "activeFlag",
+                "dateCreated",
+                "dateLastModified",
+            ),
+            product_rows,
+        )
+        self.tables["customer"] = (
+            (
+                "id",
+                "accountId",
+                "name",
+                "number",
+                "statusId",
+                "creditLimit",
+                "activeFlag",
+                "dateCreated",
+                "dateLastModified",
+            ),
+            [
+                (
+                    str(i),
+                    str(i),
+                    "Customer {:06d}".format(i),
+                    "C{:06d}".format(i),
+                    "10",
+                    "{:.2f}".format(rng.choice([500, 1000, 5000])),
+                    "1",
+                    date(i),
+                    date(i),
+                )
+                for i in range(1, customers + 1)
+            ],
+        )
+        self.tables["countryconst"] = (
+            ("id", "name", "abbreviation"),
+            [("2", "UNITED STATES", "US")],
+        )
+        self.tables["stateconst"] = (
+            ("id", "name", "code", "countryConstID"),
+            [("1", "Texas", "TX", "2"), ("2", "Utah", "UT", "2")],
+        )
+        self.tables["address"] = (
+            (
+                "id",
+                "accountId",
+                "name",
+                "address",
+                "city",
+                "zip",
+                "stateId",
+                "countryId",
+                "locationGroupId",
+                "defaultFlag",
+            ),
+            [
+                (
+                    str(i),
+                    str(i),
+                    "Main Office",
+                    "{} Main Street".format(i),
+                    "Springfield",
+                    "{:05d}".format(i),
+                    str(i % 2 + 1),
+                    "2",
+                    "1",
+                    "1",
+                )
+                for i in range(1, customers + 1)
+            ],
+        )
+        # A pricing rule for every tenth product, alternately for every
+        # customer and for a single customer.
+        self.tables["pricingrule"] = (
+            (
+                "id",
+                "isactive",
+                "num",
+                "patypeid",
+                "papercent",
+                "pabaseamounttypeid",
+                "paamount",
+                "customerincltypeid",
+                "customerinclid",
+                "datelastmodified",
+            ),
+            [
+                (
+                    str(i),
+                    "1",
+                    "P{:06d}".format(i * 10),
+                    "1",
+                    "{:.1f}".format(rng.choice([5, 10, 15])),
+                    "1",
+                    "0",
+                    "2" if i % 2 and customers else "1",
+                    str(i % customers + 1) if customers else "0",
+                    date(i),
+                )
+                for i in range(1, parts // 10 + 1)
+            ],
+        )
+        self.customers = dict((row["name"], row) for row in self.records("customer"))
+        self.products = dict((row["num"], row) for row in self.records("product"))
+
+    def records(self, table):
+        """
+        Yield each row of a table as a dictionary.
+        """
+        header, rows = self.tables[table]
+        for row in rows:
+            yield dict(zip(header, row))
+
+    def query(self, sql):
+        """
+        Return the header and rows of a SQL query of one of the tables.
+        """
+        match = FROM_RE.search(sql)
+        if match is None or match.group(1).lower() not in self.tables:
+            raise RequestError(DATABASE_ERROR)
+        header, rows = self.tables[match.group(1).lower()]
+        after = AFTER_RE.search(sql)
+        if after is not None:
+            after = int(after.group(1))
+            rows = [row for row in rows if int(row[0]) > after]
+        limit = LIMIT_RE.search(sql)
+        if limit is not None:
+            rows = rows[: int(limit.group(1))]
+        return header, rows
+
+
+class Faults:
+    """
+    Failures injected into the stand-in server's responses (logins and
+    logouts are never failed).
+
+    :param error_rate: The fraction of messages answered with ``error_code``
+        rather than their response
+    :param drop_rate: The fraction of messages whose connection is closed
+        rather than answered
+    :param timeout_rate: The fraction of messages left unanswered for
+        ``hang`` seconds before the connection is closed
+    :param seed: Seed for choosing the failed messages
+    """
+
+    def __init__(
+        self,
+        error_rate=0.0,
+        drop_rate=0.0,
+        timeout_rate=0.0,
+        error_code=DATABASE_ERROR,
+        hang=30.0,
+        seed=None,
+    ):
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.timeout_rate = timeout_rate
+        self.error_code = error_code
+        self.hang = hang
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def choose(self):
+        """
+        Return the fault for the next message (``"drop"``, ``"timeout"`` or
+        ``"error"``), or ``None``.
+        """
+        with self._lock:
+            value = self._random.random()
+        for fault, rate in (
+            ("drop", self.drop_rate),
+            ("timeout", self.timeout_rate),
+            ("error", self.error_rate),
+        ):
+            if value < rate:
+                return fault
+            value -= rate
+        return None
+
+
+def _recv_exactly(sock, length):
+    buff = bytearray(length)
+    view = memoryview(buff)
+    received = 0
+    while received < length:
+        read = sock.recv_into(view[received:])
+        if not read:
+            return None
+        received += read
+    return bytes(buff)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        session = {}
+        server._opened(self.request)
+        try:
+            while True:
+                header = _recv_exactly(self.request, 4)
+                if header is None:
+                    return
+                body = _recv_exactly(self.request, struct.unpack(">L", header)[0])
+                if body is None:
+                    return
+                response = server.respond(body, session)
+                if response is None:
+                    return
+                server.send(self.request, response)
+        except OSError:
+            return
+        finally:
+            server._closed(self.request, session)
+
+
+class FishbowlTestServer(socketserver.ThreadingTCPServer):
+    """
+    A threaded stand-in Fishbowl server.
+
+    :param port: The port to listen on (by default a free one is chosen, see
+        :attr:`connection_args`)
+    :param data: The :cls:`SyntheticData` to serve (by default generated
+        from ``data_args``, such as ``parts=10000``)
+    :param latency: Seconds to wait before answering each message
+    :param bandwidth: Bytes per second to send responses at (unlimited by
+        default)
+    :param faults: A :cls:`Faults` to inject
+    :param username: The username to accept logins from
+    :param password: The password to accept logins with
+
+    :attr sessions: The keys of the logged in sessions, which last until
+        they log out or disconnect
+    :attr stats: A :cls:`collections.Counter` of the messages and requests
+        received (by request type) and the faults injected
+    :attr imported: The rows imported, by import type
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        data=None,
+        latency=0.0,
+        bandwidth=None,
+        faults=None,
+        username="admin",
+        password="admin",
+        **data_args,
+    ):
+        socketserver.ThreadingTCPServer.__init__(self, (host, port), _Handler)
+        self.data = data if data is not None else SyntheticData(**data_args)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.faults = faults
+        self.username = username
+        self.password = password
+        self.sessions = set()
+        self.stats = collections.Counter()
+        self.imported = collections.defaultdict(list)
+        self.handlers = {
+            "ExecuteQueryRq": self.execute_query,
+            "LightPartListRq": self.light_part_list,
+            "UOMRq": self.uoms,
+            "CustomerNameListRq": self.customer_names,
+            "CustomerGetRq": self.customer,
+            "ProductGetRq": self.product,
+            "ImportListRq": self.import_list,
+            "ImportHeaderRq": self.import_headers,
+            "ImportRq": self.run_import,
+            "ExportListRq": self.export_list,
+            "ExportRq": self.run_export,
+        }
+        self._lock = threading.Lock()
+        self._connections = set()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def connection_args(self):
+        """
+        The arguments to connect to this server with (for
+        :meth:`fishbowl.api.Fishbowl.connect` or
+        :cls:`fishbowl.api.FishbowlAPI`).
+        """
+        host, port = self.server_address[:2]
+        return {
+            "host": host,
+            "port": port,
+            "username": self.username,
+            "password": self.password,
+        }
+
+    def start(self):
+        """
+        Serve in a background thread.
+        """
+        self._thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving and close the open connections.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            connections = list(self._connections)
+        for sock in connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.server_close()
+
+    def expire_sessions(self):
+        """
+        Forget every logged in session, so that their next request is
+        answered with an invalid ticket status.
+        """
+        with self._lock:
+            self.sessions.clear()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _opened(self, sock):
+        with self._lock:
+            self._connections.add(sock)
+            self.stats["connections"] += 1
+
+    def _closed(self, sock, session):
+        with self._lock:
+            self._connections.discard(sock)
+            self.sessions.discard(session.get("key"))
+
+    def send(self, sock, response):
+        """
+        Send a length prefixed response, throttled to the bandwidth limit.
+        """
+        data = struct.pack(">L", len(response)) + response
+        if not self.bandwidth:
+            sock.sendall(data)
+            return
+        # Send in slices of about 10ms worth of bandwidth.
+        chunk_size = max(1, int(self.bandwidth / 100))
+        for start in range(0, len(data), chunk_size):
+            chunk = data[start : start + chunk_size]
+            sock.sendall(chunk)
+            time.sleep(len(chunk) / self.bandwidth)
+
+    def respond(self, body, session=None):
+        """
+        Return the response to a message, or ``None`` to close the connection
+        instead.
+
+        :param session: A dictionary holding the state of the connection the
+            message was received on
+        """
+        if session is None:
+            session = {}
+        is_json = body.lstrip()[:1] == b"{"
+        try:
+            if is_json:
+                key, requests = self._parse_json(body)
+            else:
+                key, requests = self._parse_xml(body)
+        except (ValueError, KeyError, AttributeError, etree.XMLSyntaxError):
+            key, requests = None, None
+        names = [el.tag for el in requests or ()]
+        fault = None
+        if self.faults is not None and not LOGIN_REQUESTS.intersection(names):
+            fault = self.faults.choose()
+        with self._lock:
+            self.stats["messages"] += 1
+            self.stats.update(names)
+            if fault:
+                self.stats[fault] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if fault == "drop":
+            return None
+        if fault == "timeout":
+            self._stopped.wait(self.faults.hang)
+            return None
+        root = self.handle_requests(key, requests, session, fault)
+        if is_json:
+            return json.dumps({"FbiJson": _json_value(root)}).encode("utf-8")
+        return etree.tostring(root)
+
+    def _parse_xml(self, body):
+        root = etree.fromstring(body)
+        return root.findtext("Ticket/Key"), list(root.find("FbiMsgsRq"))
+
+    def _parse_json(self, body):
+        root = json.loads(body.decode("utf-8"))["FbiJson"]
+        key = (root.get("Ticket") or {}).get("Key")
+        return key, [_json_element(name, value) for name, value in root["FbiMsgsRq"].items()]
+
+    def handle_requests(self, key, requests, session, fault=None):
+        """
+        Return the ``FbiXml`` response element to a message's requests.
+        """
+        root = etree.Element("FbiXml")
+        el_key = etree.SubElement(etree.SubElement(root, "Ticket"), "Key")
+        el_response = etree.SubElement(root, "FbiMsgsRs", statusCode=statuscodes.SUCCESS)
+        if not requests:
+            el_response.set("statusCode", INVALID_REQUEST)
+            return root
+        el = requests[0]
+        # The client logs out with a login request carrying the session key
+        # or no password.
+        if el.tag == "LogoutRq" or (
+            el.tag == "LoginRq" and (el.find("Key") is not None or not el.findtext("UserPassword"))
+        ):
+            with self._lock:
+                self.sessions.discard(session.pop("key", None))
+                self.sessions.discard(el.findtext("Key") or key)
+            el_response.set("statusCode", LOGGED_OUT)
+            return root
+        if el.tag == "LoginRq":
+            code = self.login(el)
+            if code == statuscodes.SUCCESS:
+                key = session["key"] = uuid.uuid4().hex
+                with self._lock:
+                    self.sessions.add(key)
+                el_key.text = key
+            el_response.set("statusCode", code)
+            etree.SubElement(el_response, "LoginRs", statusCode=code)
+            return root
+        with self._lock:
+            logged_in = key in self.sessions
+        if not logged_in:
+            el_response.set("statusCode", INVALID_TICKET)
+            return root
+        el_key.text = key
+        failed = 0
+        for el in requests:
+            response_name = re.sub(r"Rq$", "Rs", el.tag)
+            try:
+                if fault == "error":
+                    raise RequestError(self.faults.error_code)
+                handler = self.handlers.get(el.tag)
+                if handler is None:
+                    raise RequestError(UNKNOWN_MESSAGE)
+                children = handler(el)
+            except RequestError as e:
+                failed += 1
+                etree.SubElement(el_response, response_name, statusCode=e.code)
+                continue
+            el_rs = etree.SubElement(el_response, response_name, statusCode=statuscodes.SUCCESS)
+            el_rs.extend(children)
+        if failed and len(requests) > 1:
+            el_response.set("statusCode", statuscodes.SOME_REQUESTS_FAILED)
+        return root
+
+    def login(self, el):
+        password = base64.b64encode(hashlib.md5(self.password.encode("latin-1")).digest()).decode(
+            "ascii"
+        )
+        if el.findtext("UserName") != self.username or el.findtext("UserPassword") != password:
+            return INVALID_LOGIN
+        return statuscodes.SUCCESS
+
+    def execute_query(self, el):
+        header, rows = self.data.query(el.findtext("Query") or "")
+        el_rows = etree.Element("Rows")
+        etree.SubElement(el_rows, "Row").text = csv_row(header)
+        for row in rows:
+            etree.SubElement(el_rows, "Row").text = csv_row(row)
+        return [el_rows]
+
+    def light_part_list(self, el):
+        return [
+            element(
+                "LightPart",
+                [
+                    ("PartID", row["id"]),
+                    ("Num", row["num"]),
+                    ("Description", row["description"]),
+                    ("UOMID", row["uomId"]),
+                    ("ActiveFlag", "true"),
+                ],
+            )
+            for row in self.data.records("part")
+        ]
+
+    def uoms(self, el):
+        return [
+            element(
+                "UOM",
+                [
+                    ("UOMID", row["id"]),
+                    ("Name", row["name"]),
+                    ("Code", row["code"]),
+                    ("Active", "true"),
+                ],
+            )
+            for row in self.data.records("uom")
+        ]
+
+    def customer_names(self, el):
+        return [element("Customers", [("Name", name) for name in self.data.customers])]
+
+    def customer(self, el):
+        row = self.data.customers.get(el.findtext("Name"))
+        if row is None:
+            raise RequestError(CUSTOMER_NOT_FOUND)
+        return [
+            element(
+                "Customer",
+                [
+                    ("CustomerID", row["id"]),
+                    ("AccountID", row["accountId"]),
+                    ("Name", row["name"]),
+                    ("Number", row["number"]),
+                    ("CreditLimit", row["creditLimit"]),
+                    ("ActiveFlag", "true"),
+                ],
+            )
+        ]
+
+    def product(self, el):
+        row = self.data.products.get(el.findtext("Number"))
+        if row is None:
+            raise RequestError(PRODUCT_NOT_FOUND)
+        return [
+            element(
+                "Product",
+                [
+                    ("ID", row["id"]),
+                    ("PartID", row["partId"]),
+                    ("Num", row["num"]),
+                    ("Description", row["description"]),
+                    ("Price", row["price"]),
+                    ("ActiveFlag", "true"),
+                    ("Part", [("PartID", row["partId"]), ("Num", row["num"])]),
+                ],
+            )
+        ]
+
+    def import_list(self, el):
+        return [element("ImportNames", [("ImportName", name) for name in self.data.imports])]
+
+    def import_headers(self, el):
+        header = self.data.imports.get(el.findtext("Type"))
+        if header is None:
+            raise RequestError(UNKNOWN_IMPORT)
+        return [element("Header", [("Row", csv_row(header))])]
+
+    def run_import(self, el):
+        import_type = el.findtext("Type")
+        header = self.data.imports.get(import_type)
+        if header is None:
+            raise RequestError(UNKNOWN_IMPORT)
+        rows = list(csv.reader(row.text or "" for row in el.iterfind("Rows/Row")))
+        if rows and tuple(rows[0]) == header:
+            rows = rows[1:]
+        # Like Fishbowl, a bad row fails the whole import.
+        if any(len(row) != len(header) for row in rows):
+            raise RequestError(INVALID_IMPORT)
+        with self._lock:
+            self.imported[import_type].extend(rows)
+        return []
+
+    def export_list(self, el):
+        return [element("Exports", [("ExportName", name) for name in self.data.exports])]
+
+    def run_export(self, el):
+        table = self.data.exports.get(el.findtext("Type"))
+        if table is None:
+            raise RequestError(UNKNOWN_EXPORT)
+        header, rows = self.data.tables[table]
+        return [element("Rows", [("Row", csv_row(row)) for row in [header] + rows])]
+
+
+def _json_element(name, value):
+    el = etree.Element(name)
+    if isinstance(value, dict):
+        for child_name, child_value in value.items():
+            if isinstance(child_value, list):
+                el.extend(_json_element(child_name, item) for item in child_value)
+            else:
+                el.append(_json_element(child_name, child_value))
+    elif value is not None:
+        el.text = str(value)
+    return el
+
+
+def _json_value(el):
+    if not len(el) and not el.attrib:
+        return el.text
+    value = dict(el.attrib)
+    for child in el:
+        child_value = _json_value(child)
+        if child.tag not in value:
+            value[child.tag] = child_value
+        elif isinstance(value[child.tag], list):
+            value[child.tag].append(child_value)
+        else:
+            value[child.tag] = [value[child.tag], child_value]
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a stand-in Fishbowl server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=28192)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--parts", type=int, default=1000)
+    parser.add_argument("--customers", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per message")
+    parser.add_argument("--bandwidth", type=int, help="bytes per second")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    faults = None
+    if args.error_rate or args.drop_rate or args.timeout_rate:
+        faults = Faults(
+            error_rate=args.error_rate, drop_rate=args.drop_rate, timeout_rate=args.timeout_rate
+        )
+    server = FishbowlTestServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        faults=faults,
+        username=args.username,
+        password=args.password,
+        parts=args.parts,
+        customers=args.customers,
+    )
+    logger.info("Serving on %s:%s", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+Bulk imports split into chunks and sent over several sessions.
+
+:meth:`fishbowl.api.Fishbowl.run_import` sends every row in a single
+``ImportRq``, which times out for large files and fails as a whole for one
+bad row. A :cls:`BulkImport` streams the rows into chunks (bounded by row
+count and size, each repeating the header row), imports them over
+``concurrency`` sessions at once, and bisects any chunk that fails down to
+the rows at fault, so that every other row is still imported.
+
+Example usage::
+
+    from fishbowl.imports import BulkImport, read_csv
+    from fishbowl.pool import PooledFishbowlAPI
+
+    fishbowl_api = PooledFishbowlAPI(max_size=4, **connection_args)
+    bulk_import = BulkImport(fishbowl_api.session, "ImportPart", concurrency=4)
+    report = bulk_import.run(read_csv("parts.csv"))
+    print(report.summary())
+
+Rows can be sequences of values or lines already formatted as CSV (see
+:func:`fishbowl.api.format_rows`). Unless a ``header`` is given, the first row
+is the header. Failed rows are reported by their number among the data rows,
+starting from 1.
+
+A chunk is only bisected when the server rejects it. A chunk whose session
+is lost (a timeout, a closed connection or a status such as an expired
+ticket) is reported as failed without being retried, as the server may have
+imported it anyway, and the worker logs in again for its next chunk.
+"""
+
+from __future__ import unicode_literals
+
+import csv
+import logging
+import queue
+import threading
+import time
+from io import StringIO
+
+from .api import FishbowlError
+
+logger = logging.getLogger(__name__)
+
+
+class _CSVLine:
+    """
+    Format rows as CSV lines, quoted like :func:`fishbowl.api.format_rows`.
+    """
+
+    def __init__(self):
+        self.buffer = StringIO()
+        self.writer = csv.writer(self.buffer, quoting=csv.QUOTE_ALL, lineterminator="")
+
+    def __call__(self, row):
+        if isinstance(row, str):
+            return row
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.writer.writerow(row)
+        return self.buffer.getvalue()
+
+
+def read_csv(path, encoding="utf-8"):
+    """
+    Yield the rows (header first) of a CSV file.
+    """
+    with open(path, newline="", encoding=encoding) as f:
+        for row in csv.reader(f):
+            if row:
+                yield row
+
+
+class ImportChunk:
+    """
+    Rows to import together.
+
+    :param start: The number of the first row
+    :param rows: The rows, formatted as CSV lines
+    """
+
+    def __init__(self, start, rows):
+        self.start = start
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __repr__(self):
+        return "<ImportChunk rows {}-{}>".format(self.start, self.start + len(self.rows) - 1)
+
+
+class ImportFailure:
+    """
+    Rows that weren't imported, and why.
+    """
+
+    def __init__(self, start, rows, message):
+        self.start = start
+        self.rows = rows
+        self.message = message
+
+    def __repr__(self):
+        if len(self.rows) == 1:
+            return "<ImportFailure row {}: {}>".format(self.start, self.message)
+        return "<ImportFailure rows {}-{}: {}>".format(
+            self.start, self.start + len(self.rows) - 1, self.message
+        )
+
+    def as_dict(self):
+        return {"start": self.start, "rows": self.rows, "message": self.message}
+
+
+class ImportReport:
+    """
+    The outcome of a :cls:`BulkImport`.
+    """
+
+    def __init__(self, import_type):
+        self.import_type = import_type
+        self.rows = 0
+        self.imported = 0
+        self.chunks = 0
+        self.requests = 0
+        self.failures = []
+        self.aborted = False
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def failed(self):
+        return sum(len(failure.rows) for failure in self.failures)
+
+    @property
+    def ok(self):
+        return not self.failures and not self.aborted
+
+    def add_success(self, rows):
+        with self._lock:
+            self.imported += rows
+
+    def add_failure(self, start, rows, message):
+        with self._lock:
+            self.failures.append(ImportFailure(start, rows, str(message)))
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def as_dict(self):
+        return {
+            "import_type": self.import_type,
+            "rows": self.rows,
+            "imported": self.imported,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "requests": self.requests,
+            "aborted": self.aborted,
+            "elapsed": self.elapsed,
+            "failures": [
+                failure.as_dict() for failure in sorted(self.failures, key=lambda f: f.start)
+            ],
+        }
+
+    def summary(self):
+        """
+        Return a description of the import and each of its failures.
+        """
+        lines = [
+            "{}: {} of {} rows imported in {} chunks ({} requests, {:.1f}s){}".format(
+                self.import_type,
+                self.imported,
+                self.rows,
+                self.chunks,
+                self.requests,
+                self.elapsed,
+                ", aborted" if self.aborted else "",
+            )
+        ]
+        for failure in sorted(self.failures, key=lambda f: f.start):
+            if len(failure.rows) == 1:
+                lines.append("  row {}: {}".format(failure.start, failure.message))
+            else:
+                lines.append(
+                    "  rows {}-{}: {}".format(
+                        failure.start, failure.start + len(failure.rows) - 1, failure.message
+                    )
+                )
+        return "\n".join(lines)
+
+
+class _SessionLost(Exception):
+    pass
+
+
+def _session_lost(error):
+    # Timeouts, closed connections and statuses such as an expired ticket.
+    return isinstance(error, FishbowlError) and error.retryable
+
+
+class BulkImport:
+    """
+    Import rows in chunks over several sessions.
+
+    :param session_factory: A callable returning a context manager that
+        yields a logged in connection, such as
+        :meth:`fishbowl.pool.PooledFishbowlAPI.session` (or
+        :meth:`fishbowl.api.FishbowlAPI.session`). Each worker keeps its
+        session for as long as it lasts.
+    :param import_type: The import to run, such as ``"ImportPart"``
+    :param header: The header row, or ``None`` to take the first row
+    :param chunk_rows: The most rows in a chunk
+    :param chunk_bytes: The most bytes of CSV in a chunk (a longer row is
+        sent alone)
+    :param concurrency: The number of chunks imported at once, each over its
+        own session
+    :param bisect: Split failing chunks to find the rows at fault (otherwise
+        the whole chunk is reported as failed)
+    :param max_failures: Stop once this many rows have failed, so an import
+        that fails every row (such as with the wrong header) isn't bisected
+        row by row (``None`` to never stop)
+    :param progress: A callable passed the :cls:`ImportReport` after each
+        chunk
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        import_type,
+        header=None,
+        chunk_rows=1000,
+        chunk_bytes=1024 * 1024,
+        concurrency=2,
+        bisect=True,
+        max_failures=100,
+        progress=None,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.session_factory = session_factory
+        self.import_type = import_type
+        self.header = header
+        self.chunk_rows = chunk_rows
+        self.chunk_bytes = chunk_bytes
+        self.concurrency = concurrency
+        self.bisect = bisect
+        self.max_failures = max_failures
+        self.progress = progress
+
+    def chunks(self, rows):
+        """
+        Yield :cls:`ImportChunk` instances of the (formatted) rows.
+        """
+        line = _CSVLine()
+        chunk, size, start = [], 0, 1
+        for number, row in enumerate(rows, 1):
+            row = line(row)
+            if chunk and (len(chunk) >= self.chunk_rows or size + len(row) > self.chunk_bytes):
+                yield ImportChunk(start, chunk)
+                chunk, size, start = [], 0, number
+            chunk.append(row)
+            size += len(row) + 1
+        if chunk:
+            yield ImportChunk(start, chunk)
+
+    def run(self, rows):
+        """
+        Import the rows, returning an :cls:`ImportReport`.
+        """
+        started = time.perf_counter()
+        report = ImportReport(self.import_type)
+        rows = iter(rows)
+        header = self.header
+        if header is None:
+            header = next(rows, None)
+        if header is not None:
+            header = _CSVLine()(header)
+
+        pending = queue.Queue(maxsize=self.concurrency * 2)
+        workers = [
+            threading.Thread(
+                target=self._work,
+                args=(pending, header, report),
+                name="fishbowl-import-{}".format(i),
+                daemon=True,
+            )
+            for i in range(self.concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for chunk in self.chunks(rows):
+                if self._too_many_failures(report):
+                    report.aborted = True
+                    break
+                report.rows += len(chunk)
+                report.chunks += 1
+                pending.put(chunk)
+        finally:
+            for _ in workers:
+                pending.put(None)
+            for worker in workers:
+                worker.join()
+            report.elapsed = time.perf_counter() - started
+        if report.aborted:
+            logger.error("Import aborted after %s failed rows", report.failed)
+        return report
+
+    def _too_many_failures(self, report):
+        return self.max_failures is not None and report.failed >= self.max_failures
+
+    def _work(self, pending, header, report):
+        chunk = pending.get()
+        while chunk is not None:
+            try:
+                with self.session_factory() as fb:
+                    while chunk is not None:
+                        self._import(fb, header, chunk.start, chunk.rows, report)
+                        self._report_progress(report)
+                        chunk = pending.get()
+            except _SessionLost:
+                # Carry on with the next chunk on a new session.
+                chunk = pending.get()
+            except Exception as e:
+                if chunk is None:
+                    return
+                logger.exception("Failed to import %r", chunk)
+                report.add_failure(chunk.start, chunk.rows, e)
+                chunk = pending.get()
+
+    def _report_progress(self, report):
+        if self.progress is None:
+            return
+        try:
+            self.progress(report)
+        except Exception:
+            logger.exception("Failed to report the import progress")
+
+    def _import(self, fb, header, start, rows, report):
+        """
+        Import rows, bisecting them if they fail.
+
+        :raises _SessionLost: once the failed rows have been reported, if the
+            session can't be used any more
+        """
+        report.count_request()
+        try:
+            fb.run_import(self.import_type, ([header] if header is not None else []) + rows)
+        except Exception as e:
+            if _session_lost(e):
+                report.add_failure(start, rows, e)
+                # Close the session (without logging out of the lost ticket)
+                # so that a pool doesn't hand it out again.
+                fb.key = None
+                fb.close(skip_errors=True)
+                raise _SessionLost() from e
+            if len(rows) == 1 or not self.bisect or self._too_many_failures(report):
+                logger.warning("Failed to import %s row(s) from row %s: %s", len(rows), start, e)
+                report.add_failure(start, rows, e)
+                return
+            logger.info("Bisecting %s rows from row %s: %s", len(rows), start, e)
+            middle = len(rows) // 2
+            halves = [(start, rows[:middle]), (start + middle, rows[middle:])]
+            for i, (half_start, half_rows) in enumerate(halves):
+                try:
+                    self._import(fb, header, half_start, half_rows, report)
+                except _SessionLost:
+                    for rest_start, rest_rows in halves[i + 1 :]:
+                        report.add_failure(rest_start, rest_rows, "Not imported (session lost)")
+                    raise
+            return
+        report.add_success(len(rows))
+
+
+def bulk_import(session_factory, import_type, rows, **kwargs):
+    """
+    Import rows in chunks (see :cls:`BulkImport` for the arguments),
+    returning an :cls:`ImportReport`.
+    """
+    return BulkImport(session_factory, import_type, **kwargs).run(rows)
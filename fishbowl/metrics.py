@@ -0,0 +1,316 @@
+"""
+Per request timing and size metrics.
+
+Setting a connection's ``metrics`` to a sink records, for each request type:
+
+- ``connect_seconds``: opening the socket
+- ``login_seconds``: the login round trip
+- ``sent_bytes`` and ``received_bytes``: message sizes (with the length
+  prefix)
+- ``first_byte_seconds``: from sending a request to the start of its response
+- ``round_trip_seconds``: from sending a request to the end of its response
+- ``parse_seconds``: parsing the XML (or JSON) response
+- ``materialize_seconds``: building objects from the rows of the ``*_fast``
+  loaders (recorded against the loader's name)
+- ``recovery_seconds``: logging in again after a session was lost (see
+  :mod:`fishbowl.recovery`), recorded against the request being retried
+
+The time to first byte is mostly the server, the rest of the round trip the
+network, and parsing and materializing the client.
+
+Example usage::
+
+    from fishbowl import metrics
+    from fishbowl.api import FishbowlAPI
+
+    histograms = metrics.HistogramSink()
+    fishbowl_api = FishbowlAPI(metrics=histograms, **connection_args)
+    with fishbowl_api as connection:
+        products = connection.get_products_fast()
+
+    histograms.histogram("round_trip_seconds", "ExecuteQueryRq").percentile(99)
+    text = metrics.prometheus_text(histograms)
+
+A sink is any object with a ``record(name, value, request_type)`` method.
+Use :cls:`Metrics` to record to several sinks at once, and
+:cls:`CallbackSink` to pass each measurement to a function.
+"""
+
+from __future__ import unicode_literals
+
+import bisect
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CONNECT = "connect_seconds"
+LOGIN = "login_seconds"
+SENT_BYTES = "sent_bytes"
+RECEIVED_BYTES = "received_bytes"
+FIRST_BYTE = "first_byte_seconds"
+ROUND_TRIP = "round_trip_seconds"
+PARSE = "parse_seconds"
+MATERIALIZE = "materialize_seconds"
+RECOVERY = "recovery_seconds"
+
+DESCRIPTIONS = {
+    CONNECT: "Time to open the socket.",
+    LOGIN: "Time to log in.",
+    SENT_BYTES: "Size of the messages sent.",
+    RECEIVED_BYTES: "Size of the responses received.",
+    FIRST_BYTE: "Time from sending a request to the start of its response.",
+    ROUND_TRIP: "Time from sending a request to the end of its response.",
+    PARSE: "Time to parse a response.",
+    MATERIALIZE: "Time to build objects from query rows.",
+    RECOVERY: "Time to log in again after a session was lost.",
+}
+
+TIME_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+BYTE_BUCKETS = tuple(256 * 4**i for i in range(10))
+
+# The request type of a message with several requests.
+BATCH = "Batch"
+
+
+def request_label(types):
+    """
+    Return the request type to record a message's metrics against.
+    """
+    if not types:
+        return "unknown"
+    if len(types) > 1:
+        return BATCH
+    return types[0]
+
+
+class Stopwatch:
+    """
+    Add up the time spent in ``with`` blocks.
+    """
+
+    def __init__(self):
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.elapsed += time.perf_counter() - self._start
+
+
+class Histogram:
+    """
+    Counts of observed values in buckets with the given upper bounds (and an
+    unbounded last bucket).
+    """
+
+    def __init__(self, buckets=TIME_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        if other.buckets != self.buckets:
+            raise ValueError("Can't merge histograms with different buckets")
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.sum += other.sum
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self):
+        if not self.count:
+            return 0.0
+        return self.sum / self.count
+
+    def percentile(self, percent):
+        """
+        Estimate a percentile, interpolating within its bucket.
+        """
+        if not self.count:
+            return 0.0
+        rank = percent / 100.0 * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.mean,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+    def __repr__(self):
+        return "<Histogram count={} mean={:.6g} p99={:.6g}>".format(
+            self.count, self.mean, self.percentile(99)
+        )
+
+
+class HistogramSink:
+    """
+    A thread safe sink keeping an in-memory :cls:`Histogram` of each metric
+    for each request type.
+
+    :param buckets: Bucket bounds by metric name, overriding the defaults
+        (``BYTE_BUCKETS`` for ``_bytes`` metrics, otherwise ``TIME_BUCKETS``)
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = buckets or {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def get_buckets(self, name):
+        if name in self.buckets:
+            return self.buckets[name]
+        if name.endswith("_bytes"):
+            return BYTE_BUCKETS
+        return TIME_BUCKETS
+
+    def record(self, name, value, request_type):
+        with self._lock:
+            histogram = self._histograms.get((name, request_type))
+            if histogram is None:
+                histogram = Histogram(self.get_buckets(name))
+                self._histograms[name, request_type] = histogram
+            histogram.observe(value)
+
+    def histogram(self, name, request_type=None):
+        """
+        Return a copy of a metric's histogram for a request type (or merged
+        across every request type).
+        """
+        merged = Histogram(self.get_buckets(name))
+        with self._lock:
+            for (metric, metric_type), histogram in self._histograms.items():
+                if metric == name and request_type in (None, metric_type):
+                    merged.merge(histogram)
+        return merged
+
+    def items(self):
+        """
+        Return a sorted list of ``((name, request_type), histogram)`` pairs.
+        """
+        with self._lock:
+            return sorted(self._histograms.items(), key=lambda item: item[0])
+
+    def as_dict(self):
+        metrics = {}
+        for (name, request_type), histogram in self.items():
+            metrics.setdefault(name, {})[request_type] = histogram.as_dict()
+        return metrics
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+class CallbackSink:
+    """
+    A sink calling ``callback(name, value, request_type)`` for each
+    measurement.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def record(self, name, value, request_type):
+        self.callback(name, value, request_type)
+
+
+class Metrics:
+    """
+    A sink recording to each of several sinks. A failing sink is logged
+    rather than failing the request.
+    """
+
+    def __init__(self, *sinks):
+        self.sinks = list(sinks)
+
+    def record(self, name, value, request_type):
+        for sink in self.sinks:
+            try:
+                sink.record(name, value, request_type)
+            except Exception:
+                logger.exception("Failed to record the %s metric", name)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value))
+
+
+def prometheus_text(sink, namespace="fishbowl"):
+    """
+    Return the histograms of a :cls:`HistogramSink` in the Prometheus text
+    exposition format, labelled by ``request_type``.
+    """
+    lines = []
+    last_name = None
+    for (name, request_type), histogram in sink.items():
+        metric = "{}_{}".format(namespace, name) if namespace else name
+        if name != last_name:
+            lines.append("# HELP {} {}".format(metric, DESCRIPTIONS.get(name, name)))
+            lines.append("# TYPE {} histogram".format(metric))
+            last_name = name
+        label = 'request_type="{}"'.format(_escape(request_type or ""))
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(
+                '{}_bucket{{{},le="{}"}} {}'.format(metric, label, _number(bound), cumulative)
+            )
+        lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(metric, label, histogram.count))
+        lines.append("{}_sum{{{}}} {}".format(metric, label, _number(histogram.sum)))
+        lines.append("{}_count{{{}}} {}".format(metric, label, histogram.count))
+    return "\n".join(lines) + "\n" if lines else ""
@@ -0,0 +1,176 @@
+"""
+A thread safe Fishbowl client that multiplexes calls onto several sessions.
+
+A :cls:`fishbowl.api.Fishbowl` has a single socket and no locking, so
+interleaved requests from several threads corrupt the message framing. A
+:cls:`MultiplexedFishbowl` can be shared by any number of threads: each call
+is dispatched onto a free session from a :cls:`fishbowl.pool.SessionPool`,
+and a :cls:`concurrent.futures.Future` of its result is returned.
+
+Example usage::
+
+    from fishbowl.multiplex import MultiplexedFishbowl
+
+    fishbowl = MultiplexedFishbowl(
+        username='admin', password='pw', host='10.0.0.1', port=28192,
+        max_sessions=4)
+
+    # From any thread:
+    future = fishbowl.send_query("SELECT * FROM PART")
+    rows = future.result()
+
+    # Fan out independent requests over every session.
+    parts = list(fishbowl.map("get_part_info", part_numbers))
+
+    # When shutting down:
+    fishbowl.close()
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import collections.abc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from .api import Fishbowl
+from .pool import SessionPool
+
+
+class MultiplexedFishbowl:
+    """
+    Dispatch Fishbowl calls from any thread onto a pool of sessions.
+
+    :param max_sessions: The number of sessions (and so concurrent calls).
+        Keep this below the server's login limit.
+    :param pool: Use an existing :cls:`fishbowl.pool.SessionPool` rather than
+        creating one (``max_sessions`` then only limits concurrent calls)
+    :param reference_cache: A :cls:`fishbowl.refcache.ReferenceCache` for
+        every session
+    :param response_cache: A :cls:`fishbowl.cache.ResponseCache` for every
+        session
+    :param pool_args: Other arguments for the :cls:`fishbowl.pool.SessionPool`
+        (the connection arguments, ``max_idle``, ``timeout``...)
+    """
+
+    def __init__(
+        self,
+        client=Fishbowl,
+        max_sessions=4,
+        pool=None,
+        reference_cache=None,
+        response_cache=None,
+        **pool_args,
+    ):
+        if pool is None:
+            pool = SessionPool(client=client, max_size=max_sessions, **pool_args)
+        self.pool = pool
+        self.max_sessions = max_sessions
+        self.reference_cache = reference_cache
+        self.response_cache = response_cache
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_sessions, thread_name_prefix="fishbowl-multiplex"
+        )
+
+    @contextmanager
+    def session(self):
+        """
+        Context manager that checks out a session, also used by lazy objects
+        after the session that created them was returned.
+        """
+        with self.pool.session() as fb:
+            if self.reference_cache is not None:
+                fb.reference_cache = self.reference_cache
+            if self.response_cache is not None:
+                fb.response_cache = self.response_cache
+            fb.session_factory = self.session
+            yield fb
+
+    def _run(self, method, args, kwargs):
+        with self.session() as fb:
+            if isinstance(method, str):
+                result = getattr(fb, method)(*args, **kwargs)
+            else:
+                result = method(fb, *args, **kwargs)
+            if isinstance(result, collections.abc.Iterator):
+                # Read streamed results while the session is still checked out.
+                result = list(result)
+        return result
+
+    def submit(self, method, *args, **kwargs):
+        """
+        Call a method on the next free session.
+
+        :param method: The name of a :cls:`fishbowl.api.Fishbowl` method, or
+            a callable that is passed the session followed by the arguments
+        :returns: A :cls:`concurrent.futures.Future` of the result
+        """
+        return self.executor.submit(self._run, method, args, kwargs)
+
+    def send_request(self, *args, **kwargs):
+        """
+        Send a request (see :meth:`fishbowl.api.Fishbowl.send_request`),
+        returning a future.
+        """
+        return self.submit("send_request", *args, **kwargs)
+
+    def send_query(self, *args, **kwargs):
+        """
+        Send a SQL query (see :meth:`fishbowl.api.Fishbowl.send_query`),
+        returning a future of the list of rows.
+        """
+        return self.submit("send_query", *args, **kwargs)
+
+    def map(self, method, *iterables, timeout=None, window=None, return_exceptions=False):
+        """
+        Call a method once for each set of arguments taken from the
+        iterables, spread across the sessions, like :meth:`Executor.map`.
+
+        :param window: The most calls submitted ahead of the result being
+            read (default twice ``max_sessions``), so long iterables aren't
+            all queued at once
+        :param return_exceptions: Yield the exception of a failed call as its
+            result rather than raising it
+        :returns: An iterator of the results, in order
+        """
+        if window is None:
+            window = self.max_sessions * 2
+        calls = zip(*iterables)
+        pending = collections.deque()
+
+        def results():
+            try:
+                for args in calls:
+                    pending.append(self.submit(method, *args))
+                    if len(pending) >= window:
+                        yield self._result(pending.popleft(), timeout, return_exceptions)
+                while pending:
+                    yield self._result(pending.popleft(), timeout, return_exceptions)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+        return results()
+
+    @staticmethod
+    def _result(future, timeout, return_exceptions):
+        try:
+            return future.result(timeout)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return e
+
+    def close(self, wait=True):
+        """
+        Stop accepting calls and log out of the sessions once the pending
+        calls are finished.
+        """
+        self.executor.shutdown(wait=wait)
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,10 +1,8 @@
 from __future__ import unicode_literals
 
 import collections
-import copy
+import collections.abc
 import decimal
-import inspect
-import sys
 from collections import OrderedDict
 from datetime import datetime
 
@@ -32,13 +30,12 @@ def fishbowl_boolean(text):
 fishbowl_boolean.type = bool
 
 
+# Classes defined in this module, by name. Filled in as they are created.
+_registry = {}
+
+
 def all_fishbowl_objects():
-    return dict(
-        inspect.getmembers(
-            sys.modules[__name__],
-            lambda member: (inspect.isclass(member) and member.__module__ == __name__),
-        )
-    )
+    return dict(_registry)
 
 
 def strip_text(el):
@@ -47,10 +44,251 @@ def strip_text(el):
     return ""
 
 
-class FishbowlObject(collections.Mapping):
+# Ways a field's value is parsed (see FieldPlan).
+_RAW, _CALL, _NESTED, _LIST = range(4)
+
+
+class FieldPlan:
+    """
+    A field schema compiled into a list of steps, so that parsing an object
+    doesn't need to inspect the schema again.
+
+    Each step is a ``(field_name, kind, argument)`` tuple. The data keys that
+    match each field (case insensitively) are worked out once per distinct set
+    of data keys, which for query rows means once per query.
+    """
+
+    max_key_sets = 32
+
+    def __init__(self, fields, id_field=None, object_class=None):
+        self.fields = fields
+        self.id_field = id_field
+        self.object_class = object_class
+        items = list(fields.items())
+        if id_field and "ID" not in fields:
+            items.append(("ID", int))
+        self.steps = []
+        for field_name, parser in items:
+            if isinstance(parser, dict):
+                step = (field_name, _NESTED, FieldPlan(parser, id_field))
+            elif isinstance(parser, list):
+                # An empty list means any of this module's object classes.
+                classes = dict((cls.__name__, cls) for cls in parser) if parser else _registry
+                step = (field_name, _LIST, classes)
+            elif parser:
+                step = (field_name, _CALL, parser)
+            else:
+                step = (field_name, _RAW, None)
+            self.steps.append(step)
+        self._key_sets = {}
+
+    def match(self, data):
+        """
+        Return the steps that apply to the data, each paired with the data key
+        holding the field's value.
+        """
+        keys = tuple(data)
+        matched = self._key_sets.get(keys)
+        if matched is None:
+            # Load the data in without case sensitivity.
+            data_map = dict((k.lower(), k) for k in keys)
+            matched = []
+            for field_name, kind, argument in self.steps:
+                key = data_map.get(field_name.lower())
+                if key is not None:
+                    matched.append((field_name, key, kind, argument))
+            if len(self._key_sets) < self.max_key_sets:
+                self._key_sets[keys] = matched
+        return matched
+
+    def parse(self, data):
+        """
+        Parse a dictionary of data into an ordered dictionary of fields.
+        """
+        output = collections.OrderedDict()
+        for field_name, key, kind, argument in self.match(data):
+            value = data[key]
+            if value is None:
+                continue
+            if kind == _CALL:
+                try:
+                    value = argument(value)
+                except Exception:
+                    continue
+            elif kind == _NESTED:
+                if not value:
+                    continue
+                if isinstance(value, list):
+                    value = value[0]
+                value = argument.parse(value)
+            elif kind == _LIST:
+                new_value = []
+                if not isinstance(value, list):
+                    value = [value]
+                for value_item in value:
+                    if value_item in ["{}"]:  # TODO: Figure out why this happened?
+                        continue
+                    for tag, child in value_item.items():
+                        child_parser = argument.get(tag)
+                        if not child_parser:
+                            continue
+                        new_value.append(child_parser(child))
+                value = new_value
+            output[field_name] = value
+        if self.id_field and self.id_field not in output:
+            value = output.pop("ID", None)
+            if value:
+                output[self.id_field] = value
+        return output
+
+    @property
+    def record_class(self):
+        """
+        The :cls:`Record` class for compact objects parsed with this plan.
+        """
+        record_class = getattr(self, "_record_class", None)
+        if record_class is None:
+            names = [field_name for field_name, _, _ in self.steps]
+            if self.id_field and self.id_field not in names:
+                names.append(self.id_field)
+            object_class = self.object_class
+            record_class = type(
+                str("{}Record".format(object_class.__name__ if object_class else "")),
+                (Record,),
+                {
+                    "__slots__": getattr(object_class, "record_attrs", ()),
+                    "object_class": object_class,
+                    "names": tuple(names),
+                    "index": dict((name, i) for i, name in enumerate(names)),
+                },
+            )
+            self._record_class = record_class
+        return record_class
+
+
+_MISSING = object()
+
+
+class Record(collections.abc.Mapping):
+    """
+    A compact, read only alternative to a :cls:`FishbowlObject`.
+
+    Values are stored in a tuple, laid out by a field index shared by every
+    record of the same class, and records have no instance ``__dict__``. Use
+    :meth:`FishbowlObject.record` to create them.
+    """
+
+    __slots__ = ("_values",)
+    object_class = None
+    names = ()
+    index = {}
+
+    def __init__(self, values):
+        self._values = values
+
+    @classmethod
+    def from_mapped(cls, mapped):
+        values = [_MISSING] * len(cls.names)
+        index = cls.index
+        for key, value in mapped.items():
+            try:
+                values[index[key]] = value
+            except KeyError:
+                raise KeyError("No field named {}".format(key))
+        return cls(tuple(values))
+
+    def __repr__(self):
+        return "<{} {}>".format(self.__class__.__name__, dict(self))
+
+    def __getitem__(self, key):
+        try:
+            value = self._values[self.index[key]]
+        except KeyError:
+            raise KeyError(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        i = self.index.get(key)
+        return i is not None and self._values[i] is not _MISSING
+
+    def __iter__(self):
+        for name, value in zip(self.names, self._values):
+            if value is not _MISSING:
+                yield name
+
+    def __len__(self):
+        return len(self._values) - self._values.count(_MISSING)
+
+    def squash(self):
+        return dict(
+            (name, squash_obj(value))
+            for name, value in zip(self.names, self._values)
+            if value is not _MISSING
+        )
+
+
+def squash_obj(obj):
+    if isinstance(obj, dict):
+        return dict((key, squash_obj(value)) for key, value in obj.items())
+    if isinstance(obj, list):
+        return [squash_obj(value) for value in obj]
+    if isinstance(obj, (FishbowlObject, Record)):
+        return obj.squash()
+    return obj
+
+
+class FishbowlObject(collections.abc.Mapping):
     id_field = None
     name_attr = None
     encoding = "utf-8"
+    # Extra attributes (beyond the fields) that records of this class can
+    # hold, see record().
+    record_attrs = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._plans = {}
+        if cls.__module__ == __name__:
+            _registry[cls.__name__] = cls
+
+    @classmethod
+    def field_plan(cls, custom_fields=None):
+        """
+        Return the compiled :cls:`FieldPlan` for this class' fields, merged
+        with any custom fields.
+        """
+        key = tuple(custom_fields.items()) if custom_fields else ()
+        try:
+            plan = cls._plans.get(key)
+        except TypeError:
+            # Unhashable custom field parsers can't be cached.
+            key = plan = None
+        if plan is None:
+            fields = cls.fields
+            if custom_fields:
+                fields = OrderedDict(fields)
+                fields.update(custom_fields)
+            plan = FieldPlan(fields, cls.id_field, cls)
+            if key is not None:
+                cls._plans[key] = plan
+        return plan
+
+    @classmethod
+    def record(cls, data, custom_fields=None, extra=None):
+        """
+        Parse a dictionary of data (such as a query row) into a compact, read
+        only :cls:`Record` rather than a full object.
+
+        :param extra: A dictionary of additional field values (for example
+            the UOM objects) to include in the record
+        """
+        plan = cls.field_plan(custom_fields)
+        mapped = plan.parse(data)
+        if extra:
+            mapped.update(extra)
+        return plan.record_class.from_mapped(mapped)
 
     def __init__(self, data=None, lazy_data=None, name=None, custom_fields=None):
         if not (data is None) ^ (lazy_data is None):
@@ -76,6 +314,14 @@ class FishbowlObject(collections.Mapping):
 
     __nonzero__ = __bool__
 
+    @property
+    def loaded(self):
+        """
+        Whether the object's data has been parsed (always true for objects
+        that aren't lazy).
+        """
+        return hasattr(self, "_mapped")
+
     @property
     def mapped(self):
         if not hasattr(self, "_mapped"):
@@ -90,60 +336,12 @@ class FishbowlObject(collections.Mapping):
         if data is None:
             return {}
         if fields is None:
-            fields = self.fields
-            if self.custom_fields:
-                fields = copy.deepcopy(fields)
-                fields.update(self.custom_fields)
+            plan = self.field_plan(self.custom_fields)
+        else:
+            plan = FieldPlan(fields, self.id_field)
         if not isinstance(data, dict):
             data = self.get_xml_data(data)
-        output = collections.OrderedDict()
-        items = list(fields.items())
-        if self.id_field and "ID" not in fields:
-            items.append(("ID", int))
-        # Load the data in without case sensitivity.
-        data_map = dict((k.lower(), k) for k in data)
-        for field_name, parser in items:
-            key = data_map.get(field_name.lower())
-            value = data.get(key)
-            if value is None:
-                continue
-            if isinstance(parser, dict):
-                if not value:
-                    continue
-                if isinstance(value, list):
-                    value = value[0]
-                value = self.parse_fields(value, parser)
-            elif isinstance(parser, list):
-                new_value = []
-                if parser:
-                    classes = dict((cls.__name__, cls) for cls in parser)
-                else:
-                    classes = all_fishbowl_objects()
-                if not isinstance(value, list):
-                    value = [value]
-                for value_item in value:
-                    if value_item in ["{}"]:  # TODO: Figure out why this happened?
-                        continue
-                    for tag, child in value_item.items():
-                        child_parser = classes.get(tag)
-                        if not child_parser:
-                            continue
-                        new_value.append(child_parser(child))
-                value = new_value
-            elif isinstance(parser, FishbowlObject):
-                value = parser(data)
-            else:
-                if parser:
-                    try:
-                        value = parser(value)
-                    except Exception:
-                        continue
-            output[field_name] = value
-        if self.id_field and self.id_field not in output:
-            value = output.pop("ID", None)
-            if value:
-                output[self.id_field] = value
-        return output
+        return plan.parse(data)
 
     def get_xml_data(self, base_el):
         data = collections.OrderedDict()
@@ -188,13 +386,10 @@ class FishbowlObject(collections.Mapping):
         return self.squash_obj(self.mapped)
 
     def squash_obj(self, obj):
-        if isinstance(obj, dict):
-            return dict((key, self.squash_obj(value)) for key, value in obj.items())
-        if isinstance(obj, list):
-            return [self.squash_obj(value) for value in obj]
-        if isinstance(obj, FishbowlObject):
-            return obj.squash()
-        return obj
+        return squash_obj(obj)
+
+
+_registry["FishbowlObject"] = FishbowlObject
 
 
 class CustomListItem(FishbowlObject):
@@ -368,6 +563,7 @@ class Part(FishbowlObject):
 
 
 class Product(FishbowlObject):
+    record_attrs = ("part",)
     fields = OrderedDict(
         [
             ("ID", int),
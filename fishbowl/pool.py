@@ -0,0 +1,431 @@
+"""
+Pooled, reusable logged in Fishbowl sessions.
+
+Logging in to Fishbowl means a new socket, a ``LoginRq`` round trip and
+finally a ``LogoutRq`` when the connection is closed. For short requests this
+overhead often outweighs the request itself, so a :cls:`SessionPool` keeps a
+bounded number of authenticated sessions around and hands them out again.
+
+Example usage::
+
+    from fishbowl.pool import PooledFishbowlAPI
+    fishbowl_api = PooledFishbowlAPI(
+        username='admin', password='pw', host='10.0.0.1', port=28192,
+        max_size=4)
+
+    def my_func():
+        with fishbowl_api as connection:
+            products = connection.get_products()
+
+    # When shutting down, log out of every idle session.
+    fishbowl_api.pool.close()
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from .api import Fishbowl, FishbowlAPI, FishbowlError, JSONFishbowl
+
+logger = logging.getLogger(__name__)
+
+
+class FishbowlPoolTimeout(FishbowlError):
+    pass
+
+
+class PoolStats:
+    """
+    Counters describing how a :cls:`SessionPool` has been used.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.discards = 0
+        self.waits = 0
+        self.timeouts = 0
+
+    @property
+    def requests(self):
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self):
+        if not self.requests:
+            return 0.0
+        return self.hits / self.requests
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "discards": self.discards,
+            "waits": self.waits,
+            "timeouts": self.timeouts,
+            "hit_rate": self.hit_rate,
+        }
+
+
+def stream_alive(stream):
+    """
+    Check (without blocking) that a socket stream is still usable.
+
+    A usable stream has nothing waiting to be read: a closed peer shows up as
+    an empty read and unsolicited data means the framing can't be trusted.
+    """
+    try:
+        timeout = stream.gettimeout()
+    except OSError:
+        return False
+    try:
+        stream.setblocking(False)
+        stream.recv(1, socket.MSG_PEEK)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    finally:
+        try:
+            stream.settimeout(timeout)
+        except OSError:
+            pass
+    return False
+
+
+def _lost(error):
+    return isinstance(error, OSError) or getattr(error, "retryable", False)
+
+
+class _Session:
+    def __init__(self, fb):
+        self.fb = fb
+        self.created = self.released = time.monotonic()
+
+
+class SessionPool:
+    """
+    A thread safe pool of logged in :cls:`fishbowl.api.Fishbowl` instances.
+
+    :param client: The class used to create new sessions (default
+        :cls:`fishbowl.api.Fishbowl`)
+    :param max_size: The maximum number of sessions that will ever be logged
+        in at once. Keep this below the server's login limit (status 1162).
+    :param max_idle: Seconds an idle session is kept before being logged out
+        (``None`` to keep idle sessions indefinitely)
+    :param max_lifetime: Seconds after logging in that a session is retired,
+        regardless of use (default ``None``, no limit)
+    :param timeout: Seconds to wait for a session when the pool is at its
+        maximum size, ``None`` to wait indefinitely
+    :param validate: Check that an idle session's socket is still usable before
+        handing it out (default ``True``)
+    :param metrics: A :mod:`fishbowl.metrics` sink for new sessions, so that
+        their logins are recorded too
+    :param transport: A transport (see :mod:`fishbowl.replay`) that new
+        sessions open their stream with
+    :param connection_args: Arguments passed to the client's ``connect``
+    """
+
+    def __init__(
+        self,
+        client=Fishbowl,
+        task_name=None,
+        max_size=4,
+        max_idle=300,
+        max_lifetime=None,
+        timeout=None,
+        validate=True,
+        metrics=None,
+        transport=None,
+        **connection_args,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.client = client
+        self.task_name = task_name
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.validate = validate
+        self.metrics = metrics
+        self.transport = transport
+        self.connection_args = connection_args
+        self.stats = PoolStats()
+        self._idle = []
+        self._in_use = {}
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    @property
+    def in_use(self):
+        return len(self._in_use)
+
+    def _expired(self, session, now):
+        if self.max_idle is not None and now - session.released > self.max_idle:
+            return True
+        if self.max_lifetime is not None and now - session.created > self.max_lifetime:
+            return True
+        return False
+
+    def _usable(self, session):
+        fb = session.fb
+        if not fb.connected or not getattr(fb, "key", None):
+            return False
+        if self.validate:
+            return stream_alive(fb.stream)
+        return True
+
+    def _pop_idle(self, now, stale):
+        """
+        Return the most recently used valid idle session (or ``None``),
+        moving any stale sessions found along the way to ``stale``.
+
+        Must be called while holding the condition lock.
+        """
+        while self._idle:
+            session = self._idle.pop()
+            if self._expired(session, now):
+                self.stats.evictions += 1
+            elif not self._usable(session):
+                self.stats.discards += 1
+            else:
+                return session
+            self._size -= 1
+            stale.append(session)
+        return None
+
+    def acquire(self):
+        """
+        Check out a logged in session, creating one if there is room in the
+        pool.
+
+        :raises FishbowlPoolTimeout: if the pool is full and no session was
+            released within ``timeout`` seconds
+        """
+        stale = []
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        try:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise FishbowlError("Session pool is closed")
+                    session = self._pop_idle(time.monotonic(), stale)
+                    if session:
+                        self.stats.hits += 1
+                        self._in_use[id(session.fb)] = session
+                        session.fb.session_factory = self.session
+                        return session.fb
+                    if self._size < self.max_size:
+                        # Reserve the slot, then log in outside of the lock.
+                        self._size += 1
+                        self.stats.misses += 1
+                        break
+                    self.stats.waits += 1
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self.stats.timeouts += 1
+                        raise FishbowlPoolTimeout(
+                            "Timed out waiting for a Fishbowl session "
+                            "({} in use)".format(self.in_use)
+                        )
+                    self._cond.wait(remaining)
+        finally:
+            self._close_sessions(stale)
+
+        try:
+            fb = self.client(task_name=self.task_name)
+            if self.metrics is not None:
+                fb.metrics = self.metrics
+            if self.transport is not None:
+                fb.transport = self.transport
+            fb.connect(**self.connection_args)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._in_use[id(fb)] = _Session(fb)
+        # Lazy objects created while the session is checked out borrow a
+        # session from here once it has been released (see LazyLoader).
+        fb.session_factory = self.session
+        return fb
+
+    def release(self, fb, discard=False):
+        """
+        Return a session to the pool.
+
+        :param discard: Log the session out rather than keeping it for reuse,
+            for example if an error left it in an unknown state
+        """
+        with self._cond:
+            session = self._in_use.pop(id(fb), None)
+            if session is None:
+                raise ValueError("Session was not acquired from this pool")
+            fb.session_factory = None
+            if discard or self._closed or not fb.connected:
+                self.stats.discards += 1
+                self._size -= 1
+                stale = [session]
+            else:
+                session.released = time.monotonic()
+                self._idle.append(session)
+                stale = []
+            self._cond.notify()
+        self._close_sessions(stale)
+
+    @contextmanager
+    def session(self):
+        """
+        Context manager that checks out a session and returns it afterwards.
+
+        The session is discarded if the block raised a connection error or an
+        error saying the session was lost (such as an expired ticket).
+        """
+        fb = self.acquire()
+        try:
+            yield fb
+        except (OSError, FishbowlError) as e:
+            self.release(fb, discard=_lost(e))
+            raise
+        except BaseException:
+            self.release(fb)
+            raise
+        else:
+            self.release(fb)
+
+    def prune(self):
+        """
+        Log out of any idle sessions that have expired or gone bad.
+        """
+        stale = []
+        with self._cond:
+            now = time.monotonic()
+            keep = []
+            for session in self._idle:
+                if self._expired(session, now):
+                    self.stats.evictions += 1
+                    stale.append(session)
+                else:
+                    keep.append(session)
+            self._size -= len(stale)
+            self._idle = keep
+            if stale:
+                self._cond.notify_all()
+        self._close_sessions(stale)
+        return len(stale)
+
+    def close(self):
+        """
+        Log out of every idle session and stop handing out new ones.
+
+        Sessions currently checked out are logged out when they are released.
+        """
+        with self._cond:
+            self._closed = True
+            stale, self._idle = self._idle, []
+            self._size -= len(stale)
+            self._cond.notify_all()
+        self._close_sessions(stale)
+
+    def _close_sessions(self, sessions):
+        for session in sessions:
+            if session.fb.connected:
+                session.fb.close(skip_errors=True)
+
+
+class PooledFishbowlAPI(FishbowlAPI):
+    """
+    A :cls:`fishbowl.api.FishbowlAPI` that reuses logged in sessions from a
+    :cls:`SessionPool` rather than logging in for every ``with`` block.
+
+    Unlike :cls:`fishbowl.api.FishbowlAPI`, a single instance can be shared
+    between threads.
+    """
+
+    def __init__(
+        self,
+        task_name=None,
+        max_size=4,
+        max_idle=300,
+        max_lifetime=None,
+        timeout=None,
+        reference_cache=None,
+        response_cache=None,
+        metrics=None,
+        tracer=None,
+        transport=None,
+        recovery=None,
+        **connection_args,
+    ):
+        super().__init__(
+            task_name=task_name,
+            reference_cache=reference_cache,
+            response_cache=response_cache,
+            metrics=metrics,
+            tracer=tracer,
+            transport=transport,
+            recovery=recovery,
+            **connection_args,
+        )
+        self.pool = SessionPool(
+            client=self.client,
+            task_name=task_name,
+            max_size=max_size,
+            max_idle=max_idle,
+            max_lifetime=max_lifetime,
+            timeout=timeout,
+            metrics=metrics,
+            transport=transport,
+            **connection_args,
+        )
+        self._local = threading.local()
+
+    @property
+    def stats(self):
+        return self.pool.stats
+
+    def __enter__(self):
+        fb = self.pool.acquire()
+        self.use_caches(fb)
+        fb.session_factory = self.session
+        self._local.__dict__.setdefault("sessions", []).append(fb)
+        return fb
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Return the session to the pool, discarding it if the context raised a
+        connection error or the session was lost.
+        """
+        fb = self._local.sessions.pop()
+        self.pool.release(fb, discard=exc_value is not None and _lost(exc_value))
+
+    @contextmanager
+    def session(self):
+        """
+        Context manager that checks out a pooled session, used by lazy
+        objects after the session that created them was returned.
+        """
+        with self.pool.session() as fb:
+            self.use_caches(fb)
+            fb.session_factory = self.session
+            yield fb
+
+
+class PooledFishbowlJSONAPI(PooledFishbowlAPI):
+    client = JSONFishbowl
@@ -0,0 +1,233 @@
+"""
+Transparent recovery of lost sessions.
+
+Long running connections lose their session: the ticket expires (status
+1130 or 1131), an administrator logs it off (1010), the server restarts
+(1002 or 1009) or the socket times out or is closed. Setting a
+:cls:`SessionRecovery` as a connection's ``recovery`` logs in again when that
+happens and sends the request again, as long as the request is idempotent
+(see ``IDEMPOTENT_REQUESTS``), for up to ``attempts`` more times.
+
+Example usage::
+
+    from fishbowl import metrics
+    from fishbowl.api import FishbowlAPI
+    from fishbowl.recovery import SessionRecovery
+
+    recovery = SessionRecovery(attempts=3, backoff=1.0)
+    fishbowl_api = FishbowlAPI(
+        recovery=recovery, metrics=metrics.HistogramSink(), **connection_args
+    )
+    with fishbowl_api as connection:
+        for row in connection.iter_query("SELECT * FROM part"):
+            ...
+
+    recovery.stats.as_dict()
+
+Mutating requests are never sent again, as they may have been applied before
+the session was lost. The session is still logged in again, so the
+connection stays usable, but the error is raised. A streamed response (such
+as from :meth:`fishbowl.api.Fishbowl.iter_query`) is only sent again if no
+rows had been yielded yet.
+
+Each recovery is recorded to the connection's ``metrics`` as
+``recovery_seconds`` (see :mod:`fishbowl.metrics`), and counted in
+:attr:`SessionRecovery.stats`. Only :cls:`fishbowl.api.Fishbowl` connections
+recover.
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import logging
+import threading
+import time
+
+from . import metrics, statuscodes
+from .api import FishbowlError
+
+logger = logging.getLogger(__name__)
+
+# Read only requests, which are safe to send again.
+IDEMPOTENT_REQUESTS = frozenset(
+    [
+        "ExecuteQueryRq",
+        "CustomerGetRq",
+        "CustomerListRq",
+        "CustomerNameListRq",
+        "ProductGetRq",
+        "LightPartListRq",
+        "InvQtyRq",
+        "GetTotalInventoryRq",
+        "GetPOListRq",
+        "LoadSORq",
+        "UOMRq",
+        "TaxRateGetRq",
+        "ImportHeaderRq",
+        "ImportListRq",
+        "ExportListRq",
+        "ExportRq",
+    ]
+)
+
+# Requests that are never recovered (logging in is what recovery does).
+LOGIN_REQUESTS = frozenset(["LoginRq", "LogoutRq"])
+
+
+def error_cause(error):
+    """
+    Return what an error is counted as in :attr:`RecoveryStats.causes`: its
+    status code, or the name of its class.
+    """
+    code = getattr(error, "code", None)
+    if code is not None:
+        return "{}".format(code)
+    return type(error).__name__
+
+
+class RecoveryStats:
+    """
+    Counts of the lost sessions seen by a :cls:`SessionRecovery`.
+
+    :attr recoveries: Sessions logged in again
+    :attr retries: Requests sent again after logging in
+    :attr failed_logins: Attempts to log in again that failed
+    :attr not_retried: Mutating requests that failed without being sent again
+    :attr gave_up: Requests still failing after every attempt
+    :attr causes: Counts of the errors sessions were lost to, by status code
+        (or error class)
+    """
+
+    def __init__(self):
+        self.recoveries = 0
+        self.retries = 0
+        self.failed_logins = 0
+        self.not_retried = 0
+        self.gave_up = 0
+        self.causes = collections.Counter()
+        self._lock = threading.Lock()
+
+    def add(self, name, cause=None):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            if cause is not None:
+                self.causes[cause] += 1
+
+    def as_dict(self):
+        return {
+            "recoveries": self.recoveries,
+            "retries": self.retries,
+            "failed_logins": self.failed_logins,
+            "not_retried": self.not_retried,
+            "gave_up": self.gave_up,
+            "causes": dict(self.causes),
+        }
+
+    def __repr__(self):
+        return "<RecoveryStats recoveries={} retries={} not_retried={} gave_up={}>".format(
+            self.recoveries, self.retries, self.not_retried, self.gave_up
+        )
+
+
+class SessionRecovery:
+    """
+    A thread safe policy for recovering lost sessions, which can be shared by
+    any number of connections.
+
+    :param attempts: The most times a request is sent again
+    :param backoff: Seconds to wait before the first attempt, doubling for
+        each attempt after it
+    :param max_backoff: The longest wait between attempts
+    :param idempotent: The request types that are safe to send again
+    """
+
+    def __init__(self, attempts=3, backoff=0.5, max_backoff=10.0, idempotent=IDEMPOTENT_REQUESTS):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.idempotent = frozenset(idempotent)
+        self.stats = RecoveryStats()
+
+    def delay(self, attempt):
+        """
+        Return the seconds to wait before an attempt (counting from 1).
+        """
+        return min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+
+    def can_retry(self, request_types):
+        return bool(request_types) and all(name in self.idempotent for name in request_types)
+
+    def check(self, root):
+        """
+        Raise a :cls:`fishbowl.api.FishbowlError` if a response says the
+        session was lost.
+        """
+        element = root.find("FbiMsgsRs")
+        code = element.get("statusCode") if element is not None else None
+        if code in statuscodes.SESSION_LOST:
+            message = element.get("statusMessage") or statuscodes.get_status(code)
+            raise FishbowlError(message, code=code)
+
+    def retry(self, fb, error, request_types, attempt):
+        """
+        Recover the session of a failed request.
+
+        :param fb: The :cls:`fishbowl.api.Fishbowl` connection the request
+            failed on
+        :param attempt: The number of times the request has been sent again
+            so far
+        :returns: The attempt number to send the request again as, once the
+            connection has logged in again, or ``None`` if the error should
+            be raised
+        """
+        if not getattr(error, "retryable", False):
+            return None
+        if LOGIN_REQUESTS.intersection(request_types):
+            return None
+        label = metrics.request_label(request_types)
+        cause = error_cause(error)
+        if not self.can_retry(request_types):
+            logger.warning("Session lost (%s) during %s, which is not retried", cause, label)
+            self.stats.add("not_retried", cause)
+            try:
+                self._reconnect(fb, label)
+            except Exception:
+                logger.exception("Failed to log in again")
+            return None
+        while True:
+            attempt += 1
+            if attempt > self.attempts:
+                logger.error("Session lost (%s) during %s, giving up", cause, label)
+                self.stats.add("gave_up", cause)
+                return None
+            logger.warning(
+                "Session lost (%s) during %s, retrying (attempt %s of %s)",
+                cause,
+                label,
+                attempt,
+                self.attempts,
+            )
+            time.sleep(self.delay(attempt))
+            if self._reconnect(fb, label):
+                self.stats.add("retries", cause)
+                return attempt
+
+    def _reconnect(self, fb, label):
+        """
+        Log the connection in again, returning whether it could be.
+
+        :raises FishbowlError: if logging in failed with a fatal status (such
+            as an invalid password)
+        """
+        started = time.perf_counter()
+        try:
+            fb.reconnect()
+        except Exception as e:
+            self.stats.add("failed_logins")
+            if not getattr(e, "retryable", False):
+                raise
+            logger.warning("Failed to log in again: %s", e)
+            return False
+        fb.record(metrics.RECOVERY, time.perf_counter() - started, label)
+        self.stats.add("recoveries")
+        return True
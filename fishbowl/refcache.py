@@ -0,0 +1,199 @@
+"""
+A persistent SQLite cache of Fishbowl reference data.
+
+UOMs, countries, states, tax rates and location groups almost never change,
+yet the bulk loaders fetch them on every call. A :cls:`ReferenceCache` keeps
+them in a SQLite database (shared between processes, so short lived jobs can
+skip those round trips entirely) and connections read through it once it is
+set as their ``reference_cache``.
+
+Example usage::
+
+    from fishbowl.api import FishbowlAPI
+    from fishbowl.refcache import ReferenceCache
+
+    cache = ReferenceCache("/var/cache/fishbowl.sqlite3", ttl=3600)
+    fishbowl_api = FishbowlAPI(reference_cache=cache, **connection_args)
+
+    with fishbowl_api as connection:
+        products = connection.get_products_fast()  # No UOMRq if cached.
+
+Expired entries are fetched again through the calling connection. Given a
+``session_factory`` (a callable returning a context manager that yields a
+connected client, such as :meth:`fishbowl.pool.SessionPool.session`),
+expired entries are instead returned as they are while being refreshed in the
+background, and :meth:`ReferenceCache.warm` can fill the cache up front, so
+callers don't wait on a fetch.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from .api import REFERENCE_QUERIES, REFERENCE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_NAMES = tuple(REFERENCE_QUERIES) + tuple(REFERENCE_REQUESTS)
+
+
+class ReferenceCache:
+    """
+    Cache reference data in a SQLite database.
+
+    :param path: The database file (``":memory:"`` for a per process cache)
+    :param ttl: Seconds before a cached set of data is refreshed
+    :param ttls: A dictionary of per reference set ttls, overriding ``ttl``
+    :param session_factory: Used to refresh data in the background (see
+        the module documentation)
+    """
+
+    def __init__(self, path=":memory:", ttl=3600, ttls=None, session_factory=None):
+        self.path = path
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._memory = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS reference_data "
+                "(name TEXT PRIMARY KEY, fetched_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+
+    def get_ttl(self, name):
+        return self.ttls.get(name, self.ttl)
+
+    def _fresh(self, entry, name):
+        return entry is not None and time.time() - entry[0] < self.get_ttl(name)
+
+    def _load(self, name):
+        """
+        Return the ``(fetched_at, data)`` entry for a reference set, or
+        ``None`` if it isn't cached.
+        """
+        entry = self._memory.get(name)
+        if self._fresh(entry, name):
+            return entry
+        # Another process may have refreshed the database copy.
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fetched_at, data FROM reference_data WHERE name = ?", (name,)
+            ).fetchone()
+        if row is not None and (entry is None or row[0] > entry[0]):
+            entry = (row[0], json.loads(row[1]))
+            self._memory[name] = entry
+        return entry
+
+    def _store(self, name, data):
+        entry = (time.time(), data)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO reference_data (name, fetched_at, data) VALUES (?, ?, ?)",
+                (name, entry[0], json.dumps(data)),
+            )
+        self._memory[name] = entry
+
+    def get(self, name, fishbowl=None):
+        """
+        Return a cached set of reference data, fetching it with the
+        connection if it isn't cached or has expired.
+
+        With a ``session_factory``, expired data is returned while it is
+        refreshed in the background, and ``fishbowl`` may be omitted.
+        """
+        if name not in REFERENCE_NAMES:
+            raise KeyError(name)
+        entry = self._load(name)
+        if entry is not None:
+            if self._fresh(entry, name):
+                return entry[1]
+            if self.session_factory is not None:
+                self.refresh_in_background([name])
+                return entry[1]
+        if fishbowl is None:
+            if self.session_factory is None:
+                raise ValueError(
+                    "A connection or session_factory is needed to fetch {}".format(name)
+                )
+            with self.session_factory() as fishbowl:
+                return self.refresh(name, fishbowl)
+        return self.refresh(name, fishbowl)
+
+    def refresh(self, name, fishbowl):
+        """
+        Fetch a set of reference data with the connection and cache it.
+        """
+        logger.debug("Refreshing %s reference data", name)
+        data = fishbowl.fetch_reference(name, serializable=True)
+        self._store(name, data)
+        return data
+
+    def refresh_in_background(self, names=None):
+        """
+        Refresh reference sets (every set by default) in a background thread,
+        using a connection from the ``session_factory``.
+
+        Sets that are already being refreshed are skipped.
+
+        :returns: The started thread, or ``None`` if there was nothing to do
+        """
+        if self.session_factory is None:
+            raise ValueError("A session_factory is needed to refresh in the background")
+        with self._lock:
+            names = [name for name in names or REFERENCE_NAMES if name not in self._refreshing]
+            self._refreshing.update(names)
+        if not names:
+            return None
+        thread = threading.Thread(
+            target=self._background_refresh, args=(names,), name="fishbowl-refcache"
+        )
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _background_refresh(self, names):
+        try:
+            with self.session_factory() as fishbowl:
+                for name in names:
+                    self.refresh(name, fishbowl)
+        except Exception:
+            logger.exception("Failed to refresh %s reference data", ", ".join(names))
+        finally:
+            with self._lock:
+                self._refreshing.difference_update(names)
+
+    def warm(self, wait=False):
+        """
+        Refresh every reference set that is missing or expired in the
+        background, so later reads don't need to fetch.
+
+        :param wait: Wait for the refresh to finish
+        """
+        names = [name for name in REFERENCE_NAMES if not self._fresh(self._load(name), name)]
+        thread = self.refresh_in_background(names) if names else None
+        if wait and thread is not None:
+            thread.join()
+        return thread
+
+    def invalidate(self, name=None):
+        """
+        Drop one (or every) cached set of reference data.
+        """
+        with self._lock, self._db:
+            if name is None:
+                self._db.execute("DELETE FROM reference_data")
+                self._memory.clear()
+            else:
+                self._db.execute("DELETE FROM reference_data WHERE name = ?", (name,))
+                self._memory.pop(name, None)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
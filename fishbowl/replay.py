@@ -0,0 +1,374 @@
+"""
+Record the traffic of real connections and replay it offline.
+
+Setting a connection's ``transport`` to a :cls:`Recorder` captures each
+framed request and response passing over its socket, with login keys and
+passwords scrubbed, along with how long the response took to arrive. A
+:cls:`Replayer` serves those responses back without a server, either as
+fast as possible or paced like the original (optionally scaled), so parsing
+and materializing real payloads can be benchmarked repeatably.
+
+Example usage::
+
+    from fishbowl.api import FishbowlAPI
+    from fishbowl.replay import Recorder, Replayer
+
+    recorder = Recorder()
+    with FishbowlAPI(transport=recorder, **connection_args) as connection:
+        products = connection.get_products_fast()
+    recorder.save("products.traffic.gz")
+
+    replayer = Replayer.load("products.traffic.gz", time_scale=0.5)
+    with FishbowlAPI(transport=replayer, **connection_args) as connection:
+        products = connection.get_products_fast()
+
+Requests are matched to recorded responses by their (scrubbed) text, so a
+replay has to make the same requests as the recording. Repeated requests are
+answered with each of their recorded responses in turn, starting again once
+they run out. The connection arguments of a replay only need to be valid,
+not correct.
+
+Archives are gzipped JSON lines, one per exchange. Each message is stored as
+text decoded as latin-1, so any bytes survive the round trip.
+"""
+
+from __future__ import unicode_literals
+
+import gzip
+import itertools
+import json
+import re
+import socket
+import struct
+import threading
+import time
+
+from . import cache, metrics
+from .api import FishbowlError
+
+FORMAT = "fishbowl-traffic"
+VERSION = 1
+
+SCRUBBED = b"scrubbed"
+_XML_SECRET = re.compile(rb"<(Key|UserPassword)>[^<]+</\1>")
+_JSON_SECRET = re.compile(rb'"(Key|UserPassword)"(\s*:\s*)"[^"]+"')
+
+
+class ReplayError(FishbowlError):
+    pass
+
+
+def scrub(body):
+    """
+    Replace the login keys and passwords in a message body.
+    """
+    body = _XML_SECRET.sub(rb"<\1>" + SCRUBBED + rb"</\1>", body)
+    return _JSON_SECRET.sub(rb'"\1"\2"' + SCRUBBED + rb'"', body)
+
+
+def pack(body):
+    return struct.pack(">L", len(body)) + body
+
+
+class _Frames:
+    """
+    Split a byte stream into the bodies of its length prefixed messages.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        bodies = []
+        while len(self.buffer) >= 4:
+            length = struct.unpack_from(">L", self.buffer)[0]
+            if len(self.buffer) < length + 4:
+                break
+            bodies.append(bytes(self.buffer[4 : length + 4]))
+            del self.buffer[: length + 4]
+        return bodies
+
+
+class Exchange:
+    """
+    A recorded request and its response.
+
+    :param first_byte: Seconds from sending the request to the start of the
+        response
+    :param duration: Seconds from sending the request to the end of the
+        response
+    """
+
+    def __init__(self, request, response, first_byte=0.0, duration=0.0, connection=None):
+        self.request = request
+        self.response = response
+        self.first_byte = first_byte
+        self.duration = duration
+        self.connection = connection
+
+    @property
+    def request_type(self):
+        return metrics.request_label(cache.request_types(self.request))
+
+    def __repr__(self):
+        return "<Exchange {} ({} bytes)>".format(self.request_type, len(self.response))
+
+    def as_dict(self):
+        return {
+            "connection": self.connection,
+            "request_type": self.request_type,
+            "request": self.request.decode("latin-1"),
+            "response": self.response.decode("latin-1"),
+            "first_byte": self.first_byte,
+            "duration": self.duration,
+        }
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(
+            record["request"].encode("latin-1"),
+            record["response"].encode("latin-1"),
+            first_byte=record["first_byte"],
+            duration=record["duration"],
+            connection=record.get("connection"),
+        )
+
+
+def save_archive(exchanges, path):
+    """
+    Write exchanges to a gzipped JSON lines archive.
+    """
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(json.dumps({"format": FORMAT, "version": VERSION}) + "\n")
+        for exchange in exchanges:
+            f.write(json.dumps(exchange.as_dict()) + "\n")
+
+
+def load_archive(path):
+    """
+    Read the exchanges of an archive written by :func:`save_archive`.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline() or "{}")
+        if header.get("format") != FORMAT or header.get("version") != VERSION:
+            raise ValueError("{} is not a version {} traffic archive".format(path, VERSION))
+        return [Exchange.from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+class Recorder:
+    """
+    A transport recording the traffic of connections over real sockets. One
+    recorder can be shared by several connections (and threads).
+    """
+
+    def __init__(self):
+        self.exchanges = []
+        self._connections = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def open(self, fb, timeout=5, retry=3):
+        return RecordingStream(fb.open_socket(timeout, retry), self, next(self._connections))
+
+    def add(self, exchange):
+        with self._lock:
+            self.exchanges.append(exchange)
+
+    def save(self, path):
+        with self._lock:
+            exchanges = list(self.exchanges)
+        save_archive(exchanges, path)
+
+
+class RecordingStream:
+    """
+    A socket wrapper passing each complete request and response to a
+    :cls:`Recorder`.
+    """
+
+    def __init__(self, stream, recorder, connection):
+        self.stream = stream
+        self.recorder = recorder
+        self.connection = connection
+        self._requests = _Frames()
+        self._responses = _Frames()
+        self._pending = []
+        self._first_byte = None
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def send(self, data, flags=0):
+        sent = self.stream.send(data, flags)
+        for body in self._requests.feed(data[:sent]):
+            self._pending.append((scrub(body), time.perf_counter()))
+        return sent
+
+    def sendall(self, data, flags=0):
+        self.stream.sendall(data, flags)
+        for body in self._requests.feed(data):
+            self._pending.append((scrub(body), time.perf_counter()))
+
+    def recv(self, bufsize, flags=0):
+        data = self.stream.recv(bufsize, flags)
+        if not flags & socket.MSG_PEEK:
+            self._received(data)
+        return data
+
+    def recv_into(self, buffer, nbytes=0, flags=0):
+        read = self.stream.recv_into(buffer, nbytes, flags)
+        if not flags & socket.MSG_PEEK:
+            self._received(bytes(buffer[:read]))
+        return read
+
+    def _received(self, data):
+        if not data or not self._pending:
+            return
+        now = time.perf_counter()
+        if self._first_byte is None:
+            self._first_byte = now
+        for body in self._responses.feed(data):
+            request, sent_at = self._pending.pop(0)
+            self.recorder.add(
+                Exchange(
+                    request,
+                    scrub(body),
+                    first_byte=self._first_byte - sent_at,
+                    duration=now - sent_at,
+                    connection=self.connection,
+                )
+            )
+            self._first_byte = now if self._responses.buffer else None
+
+
+class Replayer:
+    """
+    A transport answering requests with recorded responses.
+
+    :param exchanges: The recorded :cls:`Exchange` instances
+    :param time_scale: Pace responses like the recording, with their timings
+        multiplied by this (so ``1`` is the original speed and ``0.5`` twice
+        as fast), or ``None`` to answer as fast as possible
+    """
+
+    def __init__(self, exchanges, time_scale=None):
+        self.time_scale = time_scale
+        self._responses = {}
+        for exchange in exchanges:
+            self._responses.setdefault(scrub(exchange.request), []).append(exchange)
+        self._replayed = dict((request, 0) for request in self._responses)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, time_scale=None):
+        return cls(load_archive(path), time_scale=time_scale)
+
+    def open(self, fb, timeout=5, retry=3):
+        return ReplayStream(self, timeout=timeout)
+
+    def respond(self, request):
+        """
+        Return the next recorded exchange for a request.
+        """
+        request = scrub(request)
+        with self._lock:
+            exchanges = self._responses.get(request)
+            if not exchanges:
+                types = cache.request_types(request)
+                raise ReplayError(
+                    "No recorded response to {}".format(metrics.request_label(types))
+                )
+            count = self._replayed[request]
+            self._replayed[request] = count + 1
+        return exchanges[count % len(exchanges)]
+
+
+class ReplayStream:
+    """
+    A stand-in socket serving a :cls:`Replayer`'s responses.
+    """
+
+    def __init__(self, replayer, timeout=None):
+        self.replayer = replayer
+        self.timeout = timeout
+        self.closed = False
+        self._requests = _Frames()
+        self._pending = []
+        self._position = 0
+
+    def settimeout(self, timeout):
+        self._check_open()
+        self.timeout = timeout
+
+    def gettimeout(self):
+        self._check_open()
+        return self.timeout
+
+    def setblocking(self, flag):
+        self.settimeout(None if flag else 0.0)
+
+    def close(self):
+        self.closed = True
+
+    def _check_open(self):
+        if self.closed:
+            raise OSError("Replayed stream is closed")
+
+    def send(self, data, flags=0):
+        self._check_open()
+        for body in self._requests.feed(data):
+            exchange = self.replayer.respond(body)
+            self._pending.append((pack(exchange.response), exchange, time.perf_counter()))
+        return len(data)
+
+    def sendall(self, data, flags=0):
+        self.send(data, flags)
+
+    def recv(self, bufsize, flags=0):
+        buffer = bytearray(bufsize)
+        read = self.recv_into(buffer, bufsize, flags)
+        return bytes(buffer[:read])
+
+    def recv_into(self, buffer, nbytes=0, flags=0):
+        self._check_open()
+        if not self._pending:
+            if self.timeout == 0.0:
+                raise BlockingIOError("Nothing to replay")
+            raise socket.timeout("No response to replay")
+        frame, exchange, sent_at = self._pending[0]
+        wanted = min(nbytes or len(buffer), len(frame) - self._position)
+        if flags & socket.MSG_PEEK:
+            buffer[:wanted] = frame[self._position : self._position + wanted]
+            return wanted
+        if self.replayer.time_scale is not None:
+            wanted = min(wanted, self._wait(frame, exchange, sent_at))
+        buffer[:wanted] = frame[self._position : self._position + wanted]
+        self._position += wanted
+        if self._position == len(frame):
+            self._pending.pop(0)
+            self._position = 0
+        return wanted
+
+    def _wait(self, frame, exchange, sent_at):
+        """
+        Wait for the next byte to be due, returning how many are due.
+
+        The length prefix is due at the recorded first byte, and the rest
+        spread evenly until the end of the response.
+        """
+        scale = self.replayer.time_scale
+        first_byte = exchange.first_byte * scale
+        rest = max(exchange.duration * scale - first_byte, 0.0)
+        body_length = max(len(frame) - 4, 1)
+        if self._position < 4:
+            due_at = first_byte
+        else:
+            due_at = first_byte + rest * (self._position - 3) / body_length
+        delay = sent_at + due_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        elapsed = time.perf_counter() - sent_at
+        if elapsed >= first_byte + rest:
+            return len(frame) - self._position
+        due = 4 + int(body_length * (elapsed - first_byte) / rest) if rest else len(frame)
+        return max(due - self._position, 1)
@@ -1,6 +1,13 @@
 from __future__ import unicode_literals
 
 SUCCESS = "1000"
+SOME_REQUESTS_FAILED = "1003"
+
+# Statuses meaning the session is gone and must be logged in again, after
+# which the request can be sent again.
+SESSION_LOST = frozenset(["1002", "1009", "1010", "1130", "1131"])
+# Statuses worth trying again after a while (every other status is fatal).
+RETRYABLE = SESSION_LOST | frozenset(["1162"])
 
 CODES = {
     "1000": "Success!",
@@ -206,3 +213,11 @@ CODES = {
 
 def get_status(code):
     return CODES.get("{}".format(code), "Unknown status ({})".format(code))
+
+
+def is_retryable(code):
+    """
+    Whether a request that failed with this status could succeed if tried
+    again.
+    """
+    return code is not None and "{}".format(code) in RETRYABLE
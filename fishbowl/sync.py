@@ -0,0 +1,118 @@
+"""
+Incremental snapshots of Fishbowl reference data.
+
+Rather than downloading every product, part or customer on each refresh, a
+:cls:`Snapshot` remembers the latest ``DateLastModified`` it has seen (its
+watermark) and only fetches the rows modified since then, merging them into
+its objects.
+
+Example usage::
+
+    from fishbowl.sync import Snapshot
+
+    products = Snapshot("products", compact=True)
+
+    with fishbowl_api as fishbowl:
+        products.sync(fishbowl)  # The first sync loads everything.
+    ...
+    with fishbowl_api as fishbowl:
+        changed = products.sync(fishbowl)  # Only what changed since.
+
+Deleted rows can't be seen through their modification date, so call
+:meth:`Snapshot.reset` and sync again now and then to drop them (Fishbowl
+usually deactivates rather than deletes, which is seen as a change).
+"""
+
+from __future__ import unicode_literals
+
+import collections.abc
+import logging
+
+from .api import latest_modified
+
+logger = logging.getLogger(__name__)
+
+# The loader method and the id field of each kind of snapshot.
+LOADERS = {
+    "products": ("get_products_fast", "ID"),
+    "parts": ("get_parts_all", "PartID"),
+    "customers": ("get_customers_fast", "CustomerID"),
+}
+
+
+def fetch_changes(fishbowl, kind, since=None, **kwargs):
+    """
+    Fetch the objects of a kind (``"products"``, ``"parts"`` or
+    ``"customers"``) modified since a watermark, or all of them if ``since``
+    is ``None``.
+
+    Extra keyword arguments are passed to the loader method.
+
+    :returns: A tuple of the changed objects and the new watermark
+    """
+    method_name, _ = LOADERS[kind]
+    changed = getattr(fishbowl, method_name)(modified_since=since, **kwargs)
+    return changed, latest_modified(changed, since)
+
+
+class Snapshot(collections.abc.Mapping):
+    """
+    A local copy of the products, parts or customers, by id, kept up to date
+    with :meth:`sync`.
+
+    Extra keyword arguments are passed to the loader method on each sync
+    (for example ``compact=True`` or ``populate_addresses=False``).
+    """
+
+    def __init__(self, kind, watermark=None, **loader_kwargs):
+        if kind not in LOADERS:
+            raise ValueError("Unknown snapshot kind {!r}".format(kind))
+        self.kind = kind
+        self.id_field = LOADERS[kind][1]
+        self.watermark = watermark
+        self.loader_kwargs = loader_kwargs
+        self.objects = {}
+
+    def __getitem__(self, key):
+        return self.objects[key]
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __len__(self):
+        return len(self.objects)
+
+    def sync(self, fishbowl):
+        """
+        Fetch the objects modified since the last sync and merge them in.
+
+        :returns: The list of changed objects
+        """
+        changed, watermark = fetch_changes(
+            fishbowl, self.kind, self.watermark, **self.loader_kwargs
+        )
+        self.merge(changed)
+        logger.debug(
+            "Synced %d %s modified since %s (now %s)",
+            len(changed),
+            self.kind,
+            self.watermark,
+            watermark,
+        )
+        self.watermark = watermark
+        return changed
+
+    def merge(self, changed):
+        """
+        Merge changed objects into the snapshot, replacing any older copies.
+        """
+        for obj in changed:
+            self.objects[obj[self.id_field]] = obj
+
+    def reset(self):
+        """
+        Forget every object and the watermark, so the next sync loads
+        everything again.
+        """
+        self.objects = {}
+        self.watermark = None
@@ -0,0 +1,73 @@
+from __future__ import unicode_literals
+
+from decimal import Decimal
+from unittest import TestCase
+
+from fishbowl import objects
+
+
+class FieldPlanTest(TestCase):
+    def test_plan_cached(self):
+        self.assertIs(objects.Part.field_plan(), objects.Part.field_plan())
+        self.assertIsNot(objects.Part.field_plan(), objects.Product.field_plan())
+
+    def test_custom_fields(self):
+        custom_fields = {"ApiField": objects.fishbowl_boolean}
+        plan = objects.Part.field_plan(custom_fields)
+        self.assertIs(plan, objects.Part.field_plan(dict(custom_fields)))
+        self.assertIsNot(plan, objects.Part.field_plan())
+        part = objects.Part({"num": "A", "apifield": "1"}, custom_fields=custom_fields)
+        self.assertEqual(part.squash(), {"Num": "A", "ApiField": True})
+        # The class fields were left untouched.
+        self.assertNotIn("ApiField", objects.Part.fields)
+
+    def test_case_insensitive_rows(self):
+        rows = [{"ID": "1", "stdcost": "2", "NUM": "A"}, {"ID": "2", "stdcost": "x", "NUM": "B"}]
+        parts = [objects.Part(row) for row in rows]
+        self.assertEqual(parts[0].squash(), {"PartID": 1, "Num": "A"})
+        self.assertEqual(parts[1].squash(), {"PartID": 2, "Num": "B"})
+        product = objects.Product({"Price": "1.50", "num": "A"})
+        self.assertEqual(product["Price"], Decimal("1.50"))
+
+    def test_registry(self):
+        registry = objects.all_fishbowl_objects()
+        self.assertIs(registry["Customer"], objects.Customer)
+        self.assertIs(registry["FishbowlObject"], objects.FishbowlObject)
+
+        class External(objects.FishbowlObject):
+            fields = {}
+
+        self.assertNotIn("External", objects.all_fishbowl_objects())
+
+
+class RecordTest(TestCase):
+    def test_mapping(self):
+        record = objects.Part.record({"ID": "3", "num": "A", "StandardCost": "2"})
+        self.assertEqual(record["PartID"], 3)
+        self.assertEqual(record["Num"], "A")
+        self.assertEqual(record.get("Description"), None)
+        self.assertNotIn("Description", record)
+        self.assertEqual(dict(record), {"PartID": 3, "Num": "A", "StandardCost": Decimal("2")})
+        self.assertEqual(len(record), 3)
+        self.assertFalse(hasattr(record, "__dict__"))
+        with self.assertRaises(KeyError):
+            record["Description"]
+
+    def test_matches_object(self):
+        row = {"id": "1", "num": "A", "price": "1.50", "activeFlag": "true"}
+        self.assertEqual(
+            objects.Product.record(dict(row)).squash(), objects.Product(dict(row)).squash()
+        )
+
+    def test_extra_and_slots(self):
+        uom = objects.UOM({"UOMID": "1", "Name": "Each", "Code": "ea"})
+        product = objects.Product.record({"num": "A"}, extra={"UOM": uom})
+        self.assertIs(product["UOM"], uom)
+        product.part = objects.Part.record({"num": "A"})
+        self.assertEqual(product.squash(), {"Num": "A", "UOM": uom.squash()})
+        self.assertEqual(product.part["Num"], "A")
+        with self.assertRaises(AttributeError):
+            product.name = "A"
+
+    def test_empty(self):
+        self.assertFalse(objects.Part.record({}))
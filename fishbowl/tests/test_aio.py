@@ -0,0 +1,193 @@
+from __future__ import unicode_literals
+
+import asyncio
+import functools
+import struct
+from unittest import TestCase
+
+from lxml import etree
+
+from fishbowl import aio, api, metrics, statuscodes
+
+LOGIN_SUCCESS = """
+<FbiXml>
+<Ticket><Key>ABC</Key></Ticket>
+<FbiMsgsRs statusCode="{0}"><LoginRs statusCode="{0}"/></FbiMsgsRs>
+</FbiXml>
+""".format(statuscodes.SUCCESS).encode("ascii")
+
+LOGOUT_XML = b"""
+<FbiXml>
+<Ticket><Key>ABC</Key></Ticket>
+<FbiMsgsRs statusCode="1010"/>
+</FbiXml>
+"""
+
+QUERY_XML = """
+<FbiXml>
+<FbiMsgsRs statusCode="{0}">
+<ExecuteQueryRs statusCode="{0}">
+<Rows>
+<Row>"ID","Name"</Row>
+<Row>"1","Widget"</Row>
+<Row>"2","Gadget, large"</Row>
+</Rows>
+</ExecuteQueryRs>
+</FbiMsgsRs>
+</FbiXml>
+""".format(statuscodes.SUCCESS).encode("ascii")
+
+
+class FakeServer:
+    """
+    Answer each framed request with the next canned response.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def handle(self, reader, writer):
+        try:
+            while self.responses:
+                length = struct.unpack(">L", await reader.readexactly(4))[0]
+                self.requests.append(etree.fromstring(await reader.readexactly(length)))
+                response = self.responses.pop(0)
+                if response is None:
+                    # Simulate a server that stops responding.
+                    await asyncio.sleep(10)
+                writer.write(struct.pack(">L", len(response)) + response)
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+def async_test(func):
+    """
+    Run a coroutine test method in a new event loop, followed by its
+    ``async_cleanups`` (``IsolatedAsyncioTestCase`` needs Python 3.8).
+    """
+
+    @functools.wraps(func)
+    def wrapper(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.async_cleanups = []
+        try:
+            loop.run_until_complete(func(self))
+        finally:
+            for cleanup in reversed(self.async_cleanups):
+                loop.run_until_complete(cleanup())
+            # Cancel whatever the fake server is still doing.
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    return wrapper
+
+
+class AsyncFishbowlTest(TestCase):
+    async def serve(self, *responses, **kwargs):
+        self.server = FakeServer((LOGIN_SUCCESS,) + responses + (LOGOUT_XML,))
+        port = await self.server.start()
+        self.async_cleanups.append(self.server.stop)
+        return aio.AsyncFishbowlAPI(
+            username="test",
+            password="password",
+            host="127.0.0.1",
+            port=port,
+            timeout=0.2,
+            **kwargs,
+        )
+
+    @async_test
+    async def test_connect(self):
+        fishbowl_api = await self.serve()
+        async with fishbowl_api as fb:
+            self.assertTrue(fb.connected)
+            self.assertEqual(fb.key, "ABC")
+        self.assertFalse(fb.connected)
+        logout = self.server.requests[-1]
+        self.assertIsNotNone(logout.find("FbiMsgsRq/LoginRq"))
+
+    @async_test
+    async def test_send_query(self):
+        fishbowl_api = await self.serve(QUERY_XML)
+        async with fishbowl_api as fb:
+            rows = list(await fb.send_query("SELECT * FROM PART"))
+        self.assertEqual(
+            rows, [{"ID": "1", "Name": "Widget"}, {"ID": "2", "Name": "Gadget, large"}]
+        )
+        query = self.server.requests[1]
+        self.assertEqual(query.find("FbiMsgsRq/ExecuteQueryRq/Query").text, "SELECT * FROM PART")
+        self.assertEqual(query.find("Ticket/Key").text, "ABC")
+
+    @async_test
+    async def test_metrics(self):
+        sink = metrics.HistogramSink()
+        fishbowl_api = await self.serve(QUERY_XML, metrics=sink)
+        async with fishbowl_api as fb:
+            await fb.send_query("SELECT * FROM PART")
+        for name in (metrics.CONNECT, metrics.LOGIN):
+            self.assertEqual(sink.histogram(name, "LoginRq").count, 1)
+        for name in (metrics.SENT_BYTES, metrics.FIRST_BYTE, metrics.ROUND_TRIP, metrics.PARSE):
+            self.assertEqual(sink.histogram(name, "ExecuteQueryRq").count, 1)
+        self.assertEqual(
+            sink.histogram(metrics.RECEIVED_BYTES, "ExecuteQueryRq").sum, len(QUERY_XML) + 4
+        )
+
+    @async_test
+    async def test_get_total_inventory(self):
+        response = b"""
+<FbiXml>
+<FbiMsgsRs statusCode="1000">
+<GetTotalInventoryRs statusCode="1000"><Total>12</Total></GetTotalInventoryRs>
+</FbiMsgsRs>
+</FbiXml>
+"""
+        fishbowl_api = await self.serve(response)
+        async with fishbowl_api as fb:
+            root = await fb.get_total_inventory("B201", "Main")
+        self.assertEqual(root.findtext("FbiMsgsRs/GetTotalInventoryRs/Total"), "12")
+        request = self.server.requests[1].find("FbiMsgsRq/GetTotalInventoryRq")
+        self.assertEqual(request.findtext("PartNumber"), "B201")
+        self.assertEqual(request.findtext("LocationGroup"), "Main")
+
+    @async_test
+    async def test_timeout(self):
+        fishbowl_api = await self.serve(None)
+        fb = await fishbowl_api.__aenter__()
+        with self.assertRaises(api.FishbowlTimeoutError):
+            await fb.send_query("SELECT 1")
+        self.assertFalse(fb.connected)
+
+    @async_test
+    async def test_cancelled(self):
+        fishbowl_api = await self.serve(None, QUERY_XML)
+        fb = await fishbowl_api.__aenter__()
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(fb.send_query("SELECT * FROM PART"), 0.05)
+        # The response could still arrive, so the session was dropped rather
+        # than reading it as the answer to the next request.
+        self.assertFalse(fb.connected)
+        with self.assertRaises(OSError):
+            await fb.send_query("SELECT * FROM CUSTOMER")
+
+    @async_test
+    async def test_not_connected(self):
+        with self.assertRaises(OSError):
+            await aio.AsyncFishbowl().send_query("SELECT 1")
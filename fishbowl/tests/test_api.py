@@ -76,6 +76,34 @@ def disable_logger(name):
         logger.disabled = old_value
 
 
+class FakeReads:
+    """
+    Replacements for ``socket.recv`` and ``socket.recv_into`` that return the
+    provided chunks of data (split further if a smaller read is requested).
+    """
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def recv(self, bufsize):
+        if not self.chunks:
+            return b""
+        chunk = self.chunks.pop(0)
+        if len(chunk) > bufsize:
+            self.chunks.insert(0, chunk[bufsize:])
+            chunk = chunk[:bufsize]
+        return chunk
+
+    def recv_into(self, buffer, nbytes=0):
+        chunk = self.recv(nbytes or len(buffer))
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+    def attach(self, stream):
+        stream.recv.side_effect = self.recv
+        stream.recv_into.side_effect = self.recv_into
+
+
 class APIStreamTest(TestCase):
     @mock.patch("fishbowl.api.socket")
     def test_make_stream(self, mock_socket):
@@ -186,7 +214,7 @@ class APITest(TestCase):
         else:
             response.append(length)
         response.append(response_xml)
-        self.fake_stream.recv.side_effect = response
+        FakeReads(response).attach(self.fake_stream)
 
     def test_send_message(self):
         self.connect()
@@ -233,3 +261,375 @@ class APITest(TestCase):
         self.connect()
         self.set_response_xml(CYCLE_INVENTORY_XML)
         self.api.cycle_inventory(partnum="abc", qty=2, locationid=1)
+
+    def test_send_message_large_response(self):
+        self.connect()
+        response_xml = b"<FbiXml>" + b"<Row>\xe9</Row>" * 50000 + b"</FbiXml>"
+        self.set_response_xml(response_xml)
+        response = self.api.send_message(b"<test></test>")
+        self.assertEqual(len(response), 50000)
+        self.assertEqual(response[0].text, "\xe9")
+        # Reads grow from the initial chunk size.
+        sizes = [call[0][1] for call in self.fake_stream.recv_into.call_args_list[1:]]
+        self.assertEqual(sizes[0], self.api.chunk_size)
+        self.assertEqual(sizes[1], self.api.chunk_size * 2)
+        self.assertLessEqual(max(sizes), self.api.max_chunk_size)
+
+    def test_read_response_connection_closed(self):
+        self.connect()
+        FakeReads([struct.pack(">L", 100), b"<a"]).attach(self.fake_stream)
+        with disable_logger("fishbowl.api"):
+            self.assertRaises(api.FishbowlConnectionError, self.api.send_message, b"<test/>")
+        self.assertFalse(self.api.connected)
+
+
+class APISocketBufferTest(TestCase):
+    @mock.patch("fishbowl.api.socket")
+    def test_buffer_sizes(self, mock_socket):
+        fb = api.Fishbowl()
+        fb.recv_buffer_size = 4 * 1024 * 1024
+        fb.make_stream()
+        fake_socket = mock_socket.socket()
+        fake_socket.setsockopt.assert_called_with(
+            mock_socket.SOL_SOCKET, mock_socket.SO_RCVBUF, 4 * 1024 * 1024
+        )
+
+
+LIGHT_PART_LIST_XML = """
+<FbiXml>
+<Ticket><Key>ABC</Key></Ticket>
+<FbiMsgsRs statusCode="{0}">
+<LightPartListRs statusCode="{0}">
+<LightPartList>
+{1}
+</LightPartList>
+</LightPartListRs>
+</FbiMsgsRs>
+</FbiXml>
+""".format(
+    statuscodes.SUCCESS,
+    "".join(
+        "<LightPart><PartID>{0}</PartID><Num>P{0}</Num><UOMID>1</UOMID></LightPart>".format(i)
+        for i in range(200)
+    ),
+).encode(
+    "ascii"
+)
+
+
+class APIStreamingTest(TestCase):
+    def setUp(self):
+        APITest.setUp(self)
+
+    def connect(self):
+        APITest.connect(self)
+
+    def set_response_chunks(self, *responses, chunk=100):
+        data = b""
+        for response in responses:
+            data += struct.pack(">L", len(response)) + response
+        FakeReads([data[i : i + chunk] for i in range(0, len(data), chunk)]).attach(
+            self.fake_stream
+        )
+
+    def test_iter_request(self):
+        self.connect()
+        self.set_response_chunks(LIGHT_PART_LIST_XML)
+        seen = []
+        for element in self.api.iter_request(
+            "LightPartListRq", "LightPart", response_node_name="LightPartListRs"
+        ):
+            seen.append(element.findtext("Num"))
+            # Earlier elements have been freed.
+            self.assertLess(len(element.getparent()), 5)
+        self.assertEqual(seen, ["P{}".format(i) for i in range(200)])
+
+    def test_iter_request_stop_early(self):
+        self.connect()
+        next_response = b"<FbiXml><Next/></FbiXml>"
+        self.set_response_chunks(LIGHT_PART_LIST_XML, next_response)
+        for element in self.api.iter_request("LightPartListRq", "LightPart"):
+            break
+        # The rest of the first response was drained.
+        self.assertEqual(etree.tostring(self.api.send_message(b"<test/>")), next_response)
+
+    def test_iter_request_bad_status(self):
+        self.connect()
+        response = LIGHT_PART_LIST_XML.replace(
+            b'<LightPartListRs statusCode="1000">', b'<LightPartListRs statusCode="2000">'
+        )
+        next_response = b"<FbiXml><Next/></FbiXml>"
+        self.set_response_chunks(response, response, next_response)
+        with disable_logger("fishbowl.api"):
+            self.assertRaises(
+                api.FishbowlError,
+                list,
+                self.api.iter_request(
+                    "LightPartListRq", "LightPart", response_node_name="LightPartListRs"
+                ),
+            )
+            self.assertEqual(
+                list(
+                    self.api.iter_request(
+                        "LightPartListRq",
+                        "LightPart",
+                        response_node_name="LightPartListRs",
+                        silence_errors=True,
+                    )
+                ),
+                [],
+            )
+        # The silenced response was drained.
+        self.assertEqual(etree.tostring(self.api.send_message(b"<test/>")), next_response)
+
+    def test_get_parts(self):
+        self.connect()
+        self.set_response_chunks(LIGHT_PART_LIST_XML)
+        parts = self.api.get_parts(populate_uoms=False)
+        self.assertEqual(len(parts), 200)
+        self.assertEqual(parts[-1]["Num"], "P199")
+        self.assertEqual(parts[-1]["PartID"], 199)
+
+    def test_iter_query(self):
+        self.connect()
+        response = """
+<FbiXml>
+<FbiMsgsRs statusCode="1000">
+<ExecuteQueryRs statusCode="1000">
+<Rows>
+<Row>"id","num","description"</Row>
+<Row>"1","P1","Multi
+line"</Row>
+<Row>"2","P2","Comma, separated"</Row>
+</Rows>
+</ExecuteQueryRs>
+</FbiMsgsRs>
+</FbiXml>
+""".encode(
+            "ascii"
+        )
+        self.set_response_chunks(response, response, response)
+        self.assertEqual(
+            list(self.api.iter_query("SELECT * FROM PART")),
+            [
+                {"id": "1", "num": "P1", "description": "Multi\nline"},
+                {"id": "2", "num": "P2", "description": "Comma, separated"},
+            ],
+        )
+        self.assertEqual(
+            list(self.api.iter_query("SELECT * FROM PART", as_tuples=True)),
+            [
+                ("id", "num", "description"),
+                ("1", "P1", "Multi\nline"),
+                ("2", "P2", "Comma, separated"),
+            ],
+        )
+        self.assertEqual(list(self.api.send_query("SELECT * FROM PART"))[1]["num"], "P2")
+
+
+class ParseQueryRowsTest(TestCase):
+    def test_empty(self):
+        self.assertEqual(list(api.parse_query_rows([])), [])
+
+    def test_ragged(self):
+        rows = ['"a","b"', '"1"', '"1","2","3"', "", None]
+        self.assertEqual(
+            list(api.parse_query_rows(rows)),
+            [{"a": "1", "b": None}, {"a": "1", "b": "2", None: ["3"]}],
+        )
+
+
+BATCH_XML = """
+<FbiXml>
+<Ticket><Key>ABC</Key></Ticket>
+<FbiMsgsRs statusCode="1003">
+<CustomerGetRs statusCode="1000"><Customer><Name>A</Name></Customer></CustomerGetRs>
+<CustomerGetRs statusCode="3000"/>
+<AddMemoRs statusCode="1000"/>
+</FbiMsgsRs>
+</FbiXml>
+"""
+
+
+class APIBatchTest(TestCase):
+    def setUp(self):
+        APITest.setUp(self)
+        APITest.connect(self)
+
+    def test_batch(self):
+        from fishbowl import xmlrequests
+
+        with mock.patch.object(self.api, "send_message") as mock_message:
+            mock_message.return_value = etree.fromstring(BATCH_XML)
+            with self.api.batch() as batch:
+                found = batch.send_request(
+                    "CustomerGetRq", {"Name": "A"}, response_node_name="CustomerGetRs"
+                )
+                missing = batch.send_request("CustomerGetRq", {"Name": "B"})
+                memo = batch.add(xmlrequests.AddMemo("Customer", "A", "Hi", key="ABC"))
+                self.assertFalse(found.done)
+        self.assertEqual(mock_message.call_count, 1)
+        request = mock_message.call_args[0][0]
+        self.assertEqual(
+            [el.tag for el in request.el_request], ["CustomerGetRq", "CustomerGetRq", "AddMemoRq"]
+        )
+        self.assertEqual(found.result().findtext("Name"), "A")
+        self.assertRaises(api.FishbowlError, missing.result)
+        self.assertEqual(memo.result().tag, "empty")
+
+    def test_batch_size(self):
+        with mock.patch.object(self.api, "send_message") as mock_message:
+            mock_message.return_value = etree.fromstring(BATCH_XML)
+            batch = self.api.batch(batch_size=2)
+            batch.send_request("CustomerGetRq", {"Name": "A"})
+            self.assertFalse(mock_message.called)
+            item = batch.send_request("CustomerGetRq", {"Name": "B"})
+            self.assertEqual(mock_message.call_count, 1)
+            self.assertEqual(len(batch), 0)
+        self.assertRaises(api.FishbowlError, item.result)
+
+    def test_batch_failed(self):
+        with mock.patch.object(self.api, "send_message") as mock_message:
+            mock_message.return_value = etree.fromstring(
+                '<FbiXml><FbiMsgsRs statusCode="1130"/></FbiXml>'
+            )
+            batch = self.api.batch()
+            item = batch.send_request("CustomerGetRq", {"Name": "A"})
+            with disable_logger("fishbowl.api"):
+                self.assertRaises(api.FishbowlError, batch.flush)
+        self.assertRaises(api.FishbowlError, item.result)
+
+
+class KeysetQueryTest(TestCase):
+    def test_first_page(self):
+        self.assertEqual(
+            api.keyset_query("SELECT * FROM Part;", limit=2),
+            "SELECT * FROM (SELECT * FROM Part) q ORDER BY q.id LIMIT 2",
+        )
+
+    def test_next_page(self):
+        self.assertEqual(
+            api.keyset_query("SELECT * FROM Part", key="partId", after="10", limit=2),
+            "SELECT * FROM (SELECT * FROM Part) q WHERE q.partId > 10 ORDER BY q.partId LIMIT 2",
+        )
+
+    def test_iter_query_pages(self):
+        fb = api.Fishbowl()
+        fb._connected = True
+        pages = [[{"id": "1"}, {"id": "2"}], [{"id": "5"}, {"id": "7"}], [{"id": "9"}]]
+        fb.iter_query = mock.Mock(side_effect=pages)
+        rows = list(fb.iter_query_pages("SELECT * FROM Part", page_size=2))
+        self.assertEqual([row["id"] for row in rows], ["1", "2", "5", "7", "9"])
+        queries = [call[0][0] for call in fb.iter_query.call_args_list]
+        self.assertEqual(
+            queries,
+            [
+                api.keyset_query("SELECT * FROM Part", limit=2),
+                api.keyset_query("SELECT * FROM Part", after=2, limit=2),
+                api.keyset_query("SELECT * FROM Part", after=7, limit=2),
+            ],
+        )
+
+
+class CompactLoaderTest(TestCase):
+    def setUp(self):
+        self.fb = api.Fishbowl()
+        self.fb._connected = True
+        self.uom = api.objects.UOM({"UOMID": "1", "Name": "Each", "Code": "ea"})
+        self.fb.get_uom_map = mock.Mock(return_value={1: self.uom})
+
+    def test_parts_all(self):
+        rows = [
+            {"id": "1", "num": "P1", "uomId": "1", "customFields": "", "stdCost": "2.5"},
+            {"id": "2", "num": "P2", "uomId": "", "customFields": "", "stdCost": ""},
+        ]
+        self.fb._iter_rows = mock.Mock(side_effect=lambda *args: [dict(row) for row in rows])
+        parts = self.fb.get_parts_all(compact=True)
+        self.assertIsInstance(parts[0], api.objects.Record)
+        self.assertIs(parts[0]["UOM"], self.uom)
+        self.assertNotIn("UOM", parts[1])
+        self.assertEqual(
+            [part.squash() for part in parts],
+            [part.squash() for part in self.fb.get_parts_all()],
+        )
+
+    def test_products_fast(self):
+        rows = [{"id": "1", "num": "P1", "price": "1.5", "uomId": "1", "customFields": ""}]
+        self.fb.send_query = mock.Mock(side_effect=lambda sql: [dict(row) for row in rows])
+        product = self.fb.get_products_fast(compact=True)[0]
+        self.assertIsInstance(product, api.objects.Record)
+        self.assertEqual(product["Num"], "P1")
+        self.assertIs(product["UOM"], self.uom)
+        self.assertEqual(product.part["Num"], "P1")
+        self.assertEqual(product.squash(), self.fb.get_products_fast()[0].squash())
+
+
+def customer_responses(message):
+    """
+    Answer each ``CustomerGetRq`` in a message with the named customer.
+    """
+    names = [el.findtext("Name") for el in message.el_request]
+    rs = "".join(
+        '<CustomerGetRs statusCode="1000"><Customer><Name>{}</Name>'
+        "</Customer></CustomerGetRs>".format(name)
+        for name in names
+    )
+    return etree.fromstring(
+        '<FbiXml><FbiMsgsRs statusCode="1000">{}</FbiMsgsRs></FbiXml>'.format(rs)
+    )
+
+
+class LazyLoaderTest(TestCase):
+    def setUp(self):
+        self.fb = api.Fishbowl()
+        self.fb._connected = True
+        self.fb.key = "ABC"
+        self.fb._customer_names = mock.Mock(return_value=["C{}".format(i) for i in range(10)])
+        self.fb.send_message = mock.Mock(side_effect=customer_responses)
+
+    def sent(self):
+        return [
+            [el.findtext("Name") for el in call[0][0].el_request]
+            for call in self.fb.send_message.call_args_list
+        ]
+
+    def test_prefetch(self):
+        customers = self.fb.get_customers(prefetch=3)
+        self.assertFalse(customers[0].loaded)
+        self.assertEqual([c["Name"] for c in customers[:6]], ["C{}".format(i) for i in range(6)])
+        self.assertTrue(customers[0].loaded)
+        # The first access gives nothing to go on, the next in order
+        # prefetches the following customers.
+        self.assertEqual(self.sent(), [["C0"], ["C1", "C2", "C3", "C4"], ["C5", "C6", "C7", "C8"]])
+
+    def test_random_access(self):
+        customers = self.fb.get_customers()
+        self.assertEqual(customers[7]["Name"], "C7")
+        self.assertEqual(customers[2]["Name"], "C2")
+        self.assertEqual(self.sent(), [["C7"], ["C2"]])
+
+    def test_skips_loaded(self):
+        customers = self.fb.get_customers(prefetch=3)
+        customers[2]["Name"]
+        customers[0]["Name"]
+        customers[1]["Name"]
+        self.assertEqual(self.sent(), [["C2"], ["C0"], ["C1", "C3", "C4", "C5"]])
+
+    def test_borrows_session(self):
+        other = api.Fishbowl()
+        other._connected = True
+        other.key = "DEF"
+        other.send_message = mock.Mock(side_effect=customer_responses)
+
+        @contextmanager
+        def session_factory():
+            yield other
+
+        self.fb.session_factory = session_factory
+        customers = self.fb.get_customers()
+        self.assertEqual(customers[0]["Name"], "C0")
+        # The connection is handed back, so its loaders borrow a session.
+        self.fb._connected = False
+        self.assertEqual(customers[5]["Name"], "C5")
+        self.assertEqual(self.fb.send_message.call_count, 1)
+        self.assertEqual(other.send_message.call_count, 1)
@@ -0,0 +1,147 @@
+from __future__ import unicode_literals
+
+import struct
+from unittest import TestCase
+
+from fishbowl import api, cache, xmlrequests
+from fishbowl.tests.test_api import FakeReads
+
+try:
+    from unittest import mock
+except ImportError:  # < Python 3.3
+    import mock
+
+PRODUCT_XML = b"""
+<FbiXml><FbiMsgsRs statusCode="1000"><ProductGetRs statusCode="1000">
+<Product><Num>B201</Num></Product>
+</ProductGetRs></FbiMsgsRs></FbiXml>
+"""
+
+FAILED_XML = b"""
+<FbiXml><FbiMsgsRs statusCode="1000"><ProductGetRs statusCode="1162"/></FbiMsgsRs></FbiXml>
+"""
+
+SAVED_XML = b"""
+<FbiXml><FbiMsgsRs statusCode="1000"><SOSaveRs statusCode="1000"/></FbiMsgsRs></FbiXml>
+"""
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def request(name, value=None):
+    return xmlrequests.SimpleRequest(name, value, key="ABC")
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = cache.ResponseCache(clock=self.clock)
+
+    def test_key(self):
+        key = self.cache.key(request("ProductGetRq", {"Number": "B201"}))
+        self.assertEqual(key[0], "ProductGetRq")
+        # The session ticket isn't part of the key.
+        other = xmlrequests.SimpleRequest("ProductGetRq", {"Number": "B201"}, key="DEF")
+        self.assertEqual(self.cache.key(other), key)
+        self.assertNotEqual(self.cache.key(request("ProductGetRq", {"Number": "B202"})), key)
+        self.assertIsNone(self.cache.key(request("SOSaveRq")))
+        self.assertIsNone(self.cache.key(request("UnknownRq")))
+        # Requests rendered from templates share the key.
+        compiled = xmlrequests.simple_request("ProductGetRq", {"Number": "B201"}, key="DEF")
+        self.assertIsInstance(compiled, xmlrequests.CompiledRequest)
+        self.assertEqual(self.cache.key(compiled), key)
+        self.assertIsNone(self.cache.key(b"<FbiXml/>"))
+        batch = xmlrequests.BatchRequest([request("UOMRq"), request("UOMRq")], key="ABC")
+        self.assertIsNone(self.cache.key(batch))
+
+    def test_mutations_not_cacheable(self):
+        with self.assertRaises(ValueError):
+            cache.ResponseCache(ttls={"SOSaveRq": 10})
+        self.assertIsNone(cache.ResponseCache(default_ttl=10).key(request("AddInventoryRq")))
+
+    def test_ttl(self):
+        key = self.cache.key(request("InvQtyRq"))
+        self.cache.set(key, b"response")
+        self.clock.now = 9
+        self.assertEqual(self.cache.get(key), b"response")
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual((self.cache.stats.hits, self.cache.stats.misses), (1, 1))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru(self):
+        small = cache.ResponseCache(max_entries=2, max_bytes=10)
+        keys = [small.key(request("ProductGetRq", {"Number": str(i)})) for i in range(3)]
+        small.set(keys[0], b"0")
+        small.set(keys[1], b"1")
+        small.get(keys[0])
+        small.set(keys[2], b"2")
+        self.assertEqual(small.get(keys[1]), None)
+        self.assertEqual(small.get(keys[0]), b"0")
+        self.assertEqual(small.stats.evictions, 1)
+        # Too large to cache at all.
+        small.set(keys[1], b"x" * 11)
+        self.assertIsNone(small.get(keys[1]))
+        # The least recently used response is evicted to stay within the size
+        # limit.
+        small.set(keys[1], b"x" * 9)
+        self.assertEqual(small.size, 10)
+        self.assertIsNone(small.get(keys[2]))
+        self.assertEqual(small.get(keys[0]), b"0")
+
+    def test_invalidate(self):
+        so = self.cache.key(request("LoadSORq", {"Number": "1"}))
+        product = self.cache.key(request("ProductGetRq", {"Number": "1"}))
+        self.cache.set(so, b"so")
+        self.cache.set(product, b"product")
+        self.cache.sent(["SOSaveRq"])
+        self.assertIsNone(self.cache.get(so))
+        self.assertEqual(self.cache.get(product), b"product")
+        self.cache.sent(["ImportRq"])
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.stats.invalidations, 2)
+
+
+class CachedFishbowlTest(TestCase):
+    def setUp(self):
+        self.fb = api.Fishbowl()
+        self.fb._connected = True
+        self.fb.key = "ABC"
+        self.fb.stream = mock.Mock()
+        self.fb.response_cache = cache.ResponseCache()
+
+    def respond(self, *responses):
+        FakeReads([struct.pack(">L", len(response)) + response for response in responses]).attach(
+            self.fb.stream
+        )
+
+    def get_product(self):
+        return self.fb.send_request("ProductGetRq", {"Number": "B201"}, "ProductGetRs")
+
+    def test_cached(self):
+        self.respond(PRODUCT_XML)
+        self.assertEqual(self.get_product().findtext("Num"), "B201")
+        self.assertEqual(self.get_product().findtext("Num"), "B201")
+        self.assertEqual(self.fb.stream.send.call_count, 1)
+        self.assertEqual(self.fb.response_cache.stats.hits, 1)
+
+    def test_errors_not_cached(self):
+        self.respond(FAILED_XML, PRODUCT_XML)
+        with self.assertRaises(api.FishbowlError):
+            self.get_product()
+        self.assertEqual(self.get_product().findtext("Num"), "B201")
+        self.assertEqual(self.fb.stream.send.call_count, 2)
+
+    def test_mutation_invalidates(self):
+        self.fb.response_cache.set(self.fb.response_cache.key(request("LoadSORq")), b"x")
+        self.respond(SAVED_XML, SAVED_XML)
+        self.fb.send_request("SOSaveRq", response_node_name="SOSaveRs")
+        self.fb.send_request("SOSaveRq", response_node_name="SOSaveRs")
+        self.assertEqual(self.fb.stream.send.call_count, 2)
+        self.assertEqual(len(self.fb.response_cache), 0)
@@ -0,0 +1,97 @@
+from __future__ import unicode_literals
+
+import threading
+import time
+from contextlib import contextmanager
+from unittest import TestCase
+
+from fishbowl import coalesce
+
+
+class FakeFishbowl:
+    def __init__(self, release):
+        self.release = release
+        self.calls = []
+
+    def get_uom_map(self):
+        self.calls.append("get_uom_map")
+        self.release.wait(5)
+        return {1: "Each"}
+
+    def send_query(self, query):
+        self.calls.append(query)
+        if query == "BAD":
+            self.release.wait(5)
+            raise ValueError("Bad query")
+        return iter([{"id": "1"}])
+
+
+def wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            raise AssertionError("Timed out")
+        time.sleep(0.001)
+
+
+class CoalescingTest(TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.fb = FakeFishbowl(self.release)
+        self.sessions = 0
+
+        @contextmanager
+        def session_factory():
+            self.sessions += 1
+            yield self.fb
+
+        self.api = coalesce.CoalescingFishbowlAPI(session_factory)
+
+    def run_threads(self, func, count=5):
+        results = []
+
+        def target():
+            try:
+                results.append(func())
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: self.api.flight.shared == count - 1)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_shared_result(self):
+        results = self.run_threads(self.api.get_uom_map)
+        self.assertEqual(results, [{1: "Each"}] * 5)
+        self.assertEqual(self.fb.calls, ["get_uom_map"])
+        self.assertEqual(self.sessions, 1)
+        self.assertEqual(self.api.flight.calls, 1)
+        self.assertEqual(self.api.flight.in_flight(), 0)
+
+    def test_shared_exception(self):
+        results = self.run_threads(lambda: self.api.send_query("BAD"))
+        self.assertEqual(len(results), 5)
+        for result in results:
+            self.assertIsInstance(result, ValueError)
+        self.assertEqual(self.fb.calls, ["BAD"])
+
+    def test_sequential_calls_not_shared(self):
+        self.assertEqual(self.api.send_query("SELECT 1"), [{"id": "1"}])
+        self.assertEqual(self.api.send_query("SELECT 1"), [{"id": "1"}])
+        self.assertEqual(self.api.send_query("SELECT 2"), [{"id": "1"}])
+        self.assertEqual(self.fb.calls, ["SELECT 1", "SELECT 1", "SELECT 2"])
+
+    def test_unhashable_arguments(self):
+        self.assertIsNone(coalesce.make_key("send_query", ({},), {}))
+        self.assertEqual(self.api.call("send_query", "SELECT 1"), [{"id": "1"}])
+
+    def test_not_coalesced(self):
+        with self.assertRaises(AttributeError):
+            self.api.add_inventory
+        with self.assertRaises(ValueError):
+            self.api.call("save_so", None)
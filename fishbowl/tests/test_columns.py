@@ -0,0 +1,94 @@
+from __future__ import unicode_literals
+
+import math
+from array import array
+from datetime import datetime
+from unittest import TestCase, skipUnless
+
+from fishbowl import api, columns, objects
+
+try:
+    from unittest import mock
+except ImportError:  # < Python 3.3
+    import mock
+
+ROWS = [
+    ("id", "isactive", "num", "paamount", "datelastmodified"),
+    ("1", "true", "P1", "1.50", "2019-06-01 10:00:00.0"),
+    ("2", "false", "P2", "", ""),
+    ("3", "true", "P3", "2", "2019-06-02 10:00:00.5"),
+]
+
+
+class FromRowsTest(TestCase):
+    def test_inferred(self):
+        result = columns.from_rows(ROWS, use_numpy=False)
+        self.assertEqual(result.num_rows, 3)
+        self.assertEqual(result.names, ["id", "isactive", "num", "paamount", "datelastmodified"])
+        self.assertEqual(
+            result.types,
+            {
+                "id": "int",
+                "isactive": "bool",
+                "num": "str",
+                "paamount": "float",
+                "datelastmodified": "datetime",
+            },
+        )
+        self.assertEqual(result["id"], array("q", [1, 2, 3]))
+        self.assertEqual(list(result["isactive"]), [1, 0, 1])
+        self.assertEqual(result["num"], ["P1", "P2", "P3"])
+        self.assertEqual(result["paamount"][0], 1.5)
+        self.assertTrue(math.isnan(result["paamount"][1]))
+        epoch = (datetime(2019, 6, 1, 10) - columns.EPOCH).total_seconds() * 1000000
+        self.assertEqual(result["datelastmodified"][0], epoch)
+        self.assertEqual(result["datelastmodified"][1], columns.NAT)
+
+    def test_declared_schema(self):
+        result = columns.from_rows(
+            [("ID", "Flag", "Code"), ("1", "1", "10"), ("2", "0", "")],
+            schema={"id": int, "flag": objects.fishbowl_boolean, "code": None},
+            use_numpy=False,
+        )
+        self.assertEqual(result.types, {"ID": "int", "Flag": "bool", "Code": "str"})
+        self.assertEqual(list(result["Flag"]), [1, 0])
+        self.assertEqual(result["Code"], ["10", ""])
+
+    def test_object_schema(self):
+        result = columns.from_rows(ROWS, schema=objects.PriceRule, use_numpy=False)
+        self.assertEqual(result.types["paamount"], "float")
+        self.assertEqual(result.types["isactive"], "bool")
+
+    def test_fallback(self):
+        # The sample only sees integers, but the rest of the column doesn't fit.
+        rows = [("value",)] + [("1",)] * 3 + [("x",)]
+        result = columns.from_rows(rows, sample_size=2, use_numpy=False)
+        self.assertEqual(result.types["value"], "str")
+        # An integer declared column with a missing value becomes a float one.
+        result = columns.from_rows([("id",), ("1",), ("",)], schema={"id": int}, use_numpy=False)
+        self.assertEqual(result.types["id"], "float")
+
+    def test_empty(self):
+        self.assertEqual(columns.from_rows([]).num_rows, 0)
+        result = columns.from_rows([("id",)])
+        self.assertEqual(result.types, {"id": "str"})
+
+    @skipUnless(columns.numpy, "NumPy is not installed")
+    def test_numpy(self):
+        result = columns.from_rows(ROWS)
+        self.assertEqual(str(result["id"].dtype), "int64")
+        self.assertEqual(str(result["isactive"].dtype), "bool")
+        self.assertEqual(result["paamount"][2], 2.0)
+        dates = result["datelastmodified"].view("datetime64[us]")
+        self.assertEqual(str(dates[2]), "2019-06-02T10:00:00.500000")
+
+
+class ColumnarQueryTest(TestCase):
+    def test_send_query(self):
+        fb = api.Fishbowl()
+        fb._connected = True
+        fb.iter_query = mock.Mock(return_value=iter(ROWS))
+        result = fb.basic_query("SELECT", objects.PriceRule, columnar=True)
+        fb.iter_query.assert_called_once_with("SELECT", as_tuples=True)
+        self.assertEqual(result.num_rows, 3)
+        self.assertEqual(result.types["id"], "int")
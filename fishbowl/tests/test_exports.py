@@ -0,0 +1,98 @@
+from __future__ import unicode_literals
+
+import csv
+import datetime
+import decimal
+import io
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+from unittest import TestCase
+
+from fishbowl import api, exports, fakeserver, objects
+
+
+class TypedRowsTest(TestCase):
+    def test_dicts(self):
+        rows = [{"PartNumber": "B1", "StandardCost": "1.50", "ActiveFlag": "false", "Qty": ""}]
+        typed = list(
+            exports.typed_rows(
+                rows, objects.Part, header_map={"PartNumber": "Num", "Qty": "PartID"}
+            )
+        )
+        self.assertEqual(
+            typed,
+            [
+                {
+                    "PartNumber": "B1",
+                    "StandardCost": decimal.Decimal("1.50"),
+                    "ActiveFlag": False,
+                    "Qty": None,
+                }
+            ],
+        )
+
+    def test_tuples(self):
+        rows = [("id", "when"), ("1", "2020-01-02 03:04:05.0"), ("2",)]
+        typed = list(
+            exports.typed_rows(rows, {"ID": int, "When": objects.fishbowl_datetime}, True)
+        )
+        self.assertEqual(
+            typed, [("id", "when"), (1, datetime.datetime(2020, 1, 2, 3, 4, 5)), (2,)]
+        )
+
+
+class StreamingExportTest(TestCase):
+    def setUp(self):
+        server = fakeserver.FishbowlTestServer(parts=50, customers=5).start()
+        self.addCleanup(server.stop)
+        self.fishbowl_api = api.FishbowlAPI(**server.connection_args)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_iter_export(self):
+        with self.fishbowl_api as fb:
+            expected = fb.run_export("ExportPart")
+            self.assertEqual(list(fb.iter_export("ExportPart", raw=True)), expected)
+            rows = list(fb.iter_export("ExportPart"))
+            self.assertEqual(rows, list(csv.DictReader(expected)))
+            typed = list(
+                fb.iter_export("ExportPart", schema=objects.Part, header_map={"id": "PartID"})
+            )
+            self.assertEqual(typed[0]["id"], 1)
+            self.assertIs(typed[0]["activeFlag"], True)
+            self.assertEqual(typed[0]["num"], "P000001")
+            with self.assertRaises(api.FishbowlError):
+                list(fb.iter_export("ExportNothing"))
+            # The connection is still usable.
+            self.assertEqual(len(fb.run_export("ExportCustomers")), 6)
+
+    def test_export_to_file(self):
+        csv_path = os.path.join(self.directory, "parts.csv")
+        jsonl_path = pathlib.Path(self.directory, "customers.jsonl")
+        with self.fishbowl_api as fb:
+            expected = fb.run_export("ExportPart")
+            self.assertEqual(exports.export_to_file(fb, "ExportPart", csv_path), 50)
+            count = exports.export_to_file(
+                fb, "ExportCustomers", jsonl_path, schema=objects.Customer
+            )
+            self.assertEqual(count, 5)
+            with self.assertRaises(ValueError):
+                exports.export_to_file(fb, "ExportPart", os.path.join(self.directory, "x.xml"))
+        with open(csv_path, newline="") as f:
+            self.assertEqual(f.read().split("\r\n"), expected + [""])
+        with open(jsonl_path) as f:
+            customers = [json.loads(line) for line in f]
+        self.assertEqual(customers[0]["name"], "Customer 000001")
+        self.assertEqual(customers[0]["dateCreated"], "2019-01-01T00:01:00")
+
+    def test_typed_csv(self):
+        out = io.StringIO(newline="")
+        with self.fishbowl_api as fb:
+            rows = fb.iter_export("ExportPart", as_tuples=True, schema=objects.Part)
+            self.assertEqual(exports.write_csv(rows, out), 50)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["id", "num", "description"])
+        self.assertIn("2019-01-01 00:01:00", lines[1])
@@ -0,0 +1,95 @@
+from __future__ import unicode_literals
+
+from unittest import TestCase
+
+from fishbowl import api, fakeserver
+
+
+class TestServerTest(TestCase):
+    def start(self, **kwargs):
+        kwargs.setdefault("parts", 50)
+        kwargs.setdefault("customers", 5)
+        server = fakeserver.FishbowlTestServer(**kwargs).start()
+        self.addCleanup(server.stop)
+        return server
+
+    def connect(self, server, client=api.Fishbowl, **kwargs):
+        fb = client()
+        fb.connect(**dict(server.connection_args, **kwargs))
+        self.addCleanup(fb.close, skip_errors=True)
+        return fb
+
+    def test_query(self):
+        server = self.start()
+        fb = self.connect(server)
+        rows = list(fb.send_query("SELECT * FROM part"))
+        self.assertEqual(len(rows), 50)
+        self.assertEqual(rows[0]["num"], "P000001")
+        self.assertEqual(len(list(fb.iter_query_pages("SELECT * FROM part", page_size=20))), 50)
+        self.assertEqual(server.stats["ExecuteQueryRq"], 4)
+        with self.assertRaises(api.FishbowlError):
+            fb.send_query("SELECT * FROM nothing")
+
+    def test_requests(self):
+        server = self.start()
+        with api.FishbowlAPI(**server.connection_args) as fb:
+            parts = fb.get_parts()
+            self.assertEqual(len(parts), 50)
+            self.assertEqual(parts[0]["UOM"]["UOMID"], parts[0]["UOMID"])
+            customers = fb.get_customers()
+            self.assertEqual(
+                [c["Number"] for c in customers], ["C{:06d}".format(i) for i in range(1, 6)]
+            )
+            product = fb.send_request("ProductGetRq", {"Number": "P000002"}, "ProductGetRs")
+            self.assertEqual(product.findtext("Part/Num"), "P000002")
+            with self.assertRaises(api.FishbowlError):
+                fb.send_request("CustomerGetRq", {"Name": "Nobody"}, "CustomerGetRs")
+        # The customers were prefetched in one batch after the first.
+        self.assertEqual(server.stats["CustomerGetRq"], 6)
+        self.assertEqual(server.stats["messages"], 9)
+        self.assertFalse(server.sessions)
+
+    def test_imports_exports(self):
+        server = self.start()
+        fb = self.connect(server)
+        self.assertIn("ImportPart", fb.get_available_imports())
+        header = fb.get_import_headers("ImportPart")
+        fb.run_import("ImportPart", [header, '"P1","Part","ea","Inventory","true"'])
+        self.assertEqual(
+            server.imported["ImportPart"], [["P1", "Part", "ea", "Inventory", "true"]]
+        )
+        with self.assertRaises(api.FishbowlError):
+            fb.run_import("ImportPart", ['"P2","Part"'])
+        self.assertEqual(fb.get_available_exports(), ["ExportPart", "ExportCustomers"])
+        self.assertEqual(len(fb.run_export("ExportCustomers")), 6)
+
+    def test_login(self):
+        server = self.start()
+        with self.assertRaises(api.FishbowlError):
+            self.connect(server, password="wrong")
+        fb = self.connect(server, client=api.JSONFishbowl)
+        self.assertIn(fb.key, server.sessions)
+
+    def test_faults(self):
+        server = self.start(faults=fakeserver.Faults(error_rate=1))
+        fb = self.connect(server)
+        with self.assertRaises(api.FishbowlError):
+            fb.send_query("SELECT * FROM part")
+        self.assertTrue(fb.connected)
+
+        server = self.start(faults=fakeserver.Faults(drop_rate=1))
+        fb = self.connect(server)
+        with self.assertRaises(api.FishbowlConnectionError):
+            fb.send_query("SELECT * FROM part")
+        self.assertFalse(fb.connected)
+
+        server = self.start(faults=fakeserver.Faults(timeout_rate=1, hang=5))
+        fb = self.connect(server, timeout=0.1)
+        with self.assertRaises(api.FishbowlTimeoutError):
+            fb.send_query("SELECT * FROM part")
+        self.assertEqual(server.stats["timeout"], 1)
+
+    def test_bandwidth(self):
+        server = self.start(bandwidth=50000, latency=0.01)
+        fb = self.connect(server)
+        self.assertEqual(len(list(fb.send_query("SELECT * FROM customer"))), 5)
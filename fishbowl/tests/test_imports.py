@@ -0,0 +1,144 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from fishbowl import api, fakeserver, imports, pool
+
+HEADER = ("PartNumber", "PartDescription", "UOM", "PartType", "Active")
+
+
+def part_rows(count, bad=()):
+    for i in range(1, count + 1):
+        if i in bad:
+            yield ("B{}".format(i), "Missing columns")
+        else:
+            yield ("B{}".format(i), "Part {}".format(i), "ea", "Inventory", "true")
+
+
+class ChunkTest(TestCase):
+    def test_chunks(self):
+        bulk_import = imports.BulkImport(None, "ImportPart", chunk_rows=3, chunk_bytes=100)
+        rows = [("A", "1"), '"B","2"', ("C", "x" * 120), ("D", "4"), ("E", "5")]
+        chunks = list(bulk_import.chunks(rows))
+        self.assertEqual([(chunk.start, len(chunk)) for chunk in chunks], [(1, 2), (3, 1), (4, 2)])
+        self.assertEqual(chunks[0].rows, ['"A","1"', '"B","2"'])
+        self.assertEqual(chunks[0].rows, api.format_rows(rows[:1]) + [rows[1]])
+
+    def test_read_csv(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "parts.csv")
+        with open(path, "w", newline="") as f:
+            f.write('PartNumber,PartDescription\r\nB1,"Part, one"\r\n\r\n')
+        self.assertEqual(
+            list(imports.read_csv(path)), [["PartNumber", "PartDescription"], ["B1", "Part, one"]]
+        )
+
+
+class BulkImportTest(TestCase):
+    def start(self, **kwargs):
+        server = fakeserver.FishbowlTestServer(parts=5, **kwargs).start()
+        self.addCleanup(server.stop)
+        return server, api.FishbowlAPI(**server.connection_args).session
+
+    def test_bisect(self):
+        server, session = self.start()
+        progress = []
+        report = imports.bulk_import(
+            session,
+            "ImportPart",
+            [HEADER] + list(part_rows(45, bad=(7, 30))),
+            chunk_rows=10,
+            concurrency=3,
+            progress=lambda report: progress.append(report.imported),
+        )
+        self.assertFalse(report.ok)
+        self.assertEqual((report.rows, report.imported, report.failed), (45, 43, 2))
+        self.assertEqual(report.chunks, 5)
+        failures = sorted(report.failures, key=lambda failure: failure.start)
+        self.assertEqual(
+            [(f.start, f.rows) for f in failures],
+            [(7, ['"B7","Missing columns"']), (30, ['"B30","Missing columns"'])],
+        )
+        self.assertEqual(len(server.imported["ImportPart"]), 43)
+        # A request per chunk, and two more each time a failing chunk is
+        # halved (three times to find row 7, four to find row 30).
+        self.assertEqual(report.requests, 5 + 2 * (3 + 4))
+        self.assertEqual(len(progress), 5)
+        self.assertIn("row 30: ", report.summary())
+
+    def test_all_good(self):
+        server, session = self.start()
+        report = imports.BulkImport(session, "ImportPart", header=HEADER, chunk_rows=7).run(
+            part_rows(20)
+        )
+        self.assertTrue(report.ok)
+        self.assertEqual((report.imported, report.chunks, report.requests), (20, 3, 3))
+        self.assertEqual(
+            sorted(server.imported["ImportPart"]),
+            sorted(list(row) for row in part_rows(20)),
+        )
+
+    def test_max_failures(self):
+        server, session = self.start()
+        report = imports.bulk_import(
+            session,
+            "ImportNothing",
+            part_rows(1000),
+            header=HEADER,
+            chunk_rows=100,
+            concurrency=1,
+            max_failures=10,
+        )
+        self.assertTrue(report.aborted)
+        self.assertEqual(report.imported, 0)
+        # Bisecting stopped after 10 rows, and then chunks already queued
+        # failed whole.
+        single_rows = [failure for failure in report.failures if len(failure.rows) == 1]
+        self.assertEqual(len(single_rows), 10)
+        self.assertLess(report.rows, 1000)
+        self.assertLessEqual(report.requests, 40)
+
+    def test_session_lost(self):
+        server, session = self.start(faults=fakeserver.Faults(drop_rate=1))
+        report = imports.bulk_import(
+            session, "ImportPart", part_rows(30), header=HEADER, chunk_rows=10, max_failures=None
+        )
+        self.assertEqual((report.imported, report.failed), (0, 30))
+        # Lost chunks aren't bisected.
+        self.assertEqual(report.requests, 3)
+        self.assertFalse(server.sessions)
+
+    def test_ticket_expired(self):
+        server, session = self.start()
+        self.check_ticket_expired(server, session)
+
+    def test_ticket_expired_pooled(self):
+        server, _ = self.start()
+        fishbowl_api = pool.PooledFishbowlAPI(max_size=1, **server.connection_args)
+        self.addCleanup(fishbowl_api.pool.close)
+        self.check_ticket_expired(server, fishbowl_api.session)
+        # The lost session wasn't returned to the pool.
+        self.assertEqual(fishbowl_api.stats.discards, 1)
+
+    def check_ticket_expired(self, server, session):
+        report = imports.bulk_import(
+            session,
+            "ImportPart",
+            part_rows(30),
+            header=HEADER,
+            chunk_rows=10,
+            concurrency=1,
+            # Expire the ticket once the first chunk is imported.
+            progress=lambda report: server.expire_sessions(),
+        )
+        self.assertEqual((report.imported, report.failed), (20, 10))
+        self.assertEqual([(f.start, len(f.rows)) for f in report.failures], [(11, 10)])
+        self.assertIn("Invalid ticket", report.failures[0].message)
+        # The lost chunk isn't bisected, and the next one is imported after
+        # logging in again.
+        self.assertEqual(report.requests, 3)
+        self.assertEqual(len(server.imported["ImportPart"]), 20)
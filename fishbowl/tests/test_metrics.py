@@ -0,0 +1,106 @@
+from __future__ import unicode_literals
+
+from unittest import TestCase
+
+from fishbowl import api, fakeserver, metrics
+
+try:
+    from unittest import mock
+except ImportError:  # < Python 3.3
+    import mock
+
+
+class HistogramTest(TestCase):
+    def test_observe(self):
+        histogram = metrics.Histogram([1, 2, 4])
+        for value in (0.5, 1, 1.5, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1, 1])
+        self.assertEqual((histogram.count, histogram.sum), (5, 16))
+        self.assertEqual((histogram.min, histogram.max), (0.5, 10))
+        self.assertEqual(histogram.percentile(40), 1)
+        self.assertEqual(histogram.percentile(100), 10)
+        self.assertTrue(2 <= histogram.percentile(70) <= 4)
+
+    def test_empty(self):
+        self.assertEqual(metrics.Histogram().percentile(99), 0.0)
+        self.assertEqual(metrics.Histogram().as_dict()["count"], 0)
+
+
+class SinkTest(TestCase):
+    def test_histograms(self):
+        sink = metrics.HistogramSink()
+        sink.record(metrics.ROUND_TRIP, 0.002, "ExecuteQueryRq")
+        sink.record(metrics.ROUND_TRIP, 0.2, "CustomerGetRq")
+        sink.record(metrics.SENT_BYTES, 300, "CustomerGetRq")
+        self.assertEqual(sink.histogram(metrics.ROUND_TRIP).count, 2)
+        self.assertEqual(sink.histogram(metrics.ROUND_TRIP, "CustomerGetRq").sum, 0.2)
+        self.assertEqual(sink.histogram(metrics.SENT_BYTES).buckets, metrics.BYTE_BUCKETS)
+        self.assertEqual(
+            sorted(sink.as_dict()[metrics.ROUND_TRIP]), ["CustomerGetRq", "ExecuteQueryRq"]
+        )
+
+    def test_prometheus_text(self):
+        sink = metrics.HistogramSink(buckets={metrics.ROUND_TRIP: [0.1, 1]})
+        sink.record(metrics.ROUND_TRIP, 0.05, "LoadSORq")
+        sink.record(metrics.ROUND_TRIP, 0.5, "LoadSORq")
+        self.assertEqual(
+            metrics.prometheus_text(sink).splitlines(),
+            [
+                "# HELP fishbowl_round_trip_seconds " + metrics.DESCRIPTIONS[metrics.ROUND_TRIP],
+                "# TYPE fishbowl_round_trip_seconds histogram",
+                'fishbowl_round_trip_seconds_bucket{request_type="LoadSORq",le="0.1"} 1',
+                'fishbowl_round_trip_seconds_bucket{request_type="LoadSORq",le="1.0"} 2',
+                'fishbowl_round_trip_seconds_bucket{request_type="LoadSORq",le="+Inf"} 2',
+                'fishbowl_round_trip_seconds_sum{request_type="LoadSORq"} 0.55',
+                'fishbowl_round_trip_seconds_count{request_type="LoadSORq"} 2',
+            ],
+        )
+        self.assertEqual(metrics.prometheus_text(metrics.HistogramSink()), "")
+
+    def test_fan_out(self):
+        callback = mock.Mock()
+        broken = mock.Mock()
+        broken.record.side_effect = ValueError
+        sink = metrics.Metrics(broken, metrics.CallbackSink(callback))
+        sink.record(metrics.PARSE, 0.1, "UOMRq")
+        callback.assert_called_once_with(metrics.PARSE, 0.1, "UOMRq")
+
+
+class InstrumentedFishbowlTest(TestCase):
+    def setUp(self):
+        server = fakeserver.FishbowlTestServer(parts=20).start()
+        self.addCleanup(server.stop)
+        self.sink = metrics.HistogramSink()
+        self.fishbowl_api = api.FishbowlAPI(metrics=self.sink, **server.connection_args)
+
+    def test_requests(self):
+        with self.fishbowl_api as fb:
+            fb.send_query("SELECT * FROM part")
+            list(fb.iter_query("SELECT * FROM part"))
+            with fb.batch() as batch:
+                batch.send_request("UOMRq")
+                batch.send_request("UOMRq")
+        recorded = self.sink.as_dict()
+        self.assertEqual(recorded[metrics.CONNECT]["LoginRq"]["count"], 1)
+        self.assertEqual(recorded[metrics.LOGIN]["LoginRq"]["count"], 1)
+        for name in (
+            metrics.SENT_BYTES,
+            metrics.RECEIVED_BYTES,
+            metrics.FIRST_BYTE,
+            metrics.ROUND_TRIP,
+            metrics.PARSE,
+        ):
+            self.assertEqual(recorded[name]["ExecuteQueryRq"]["count"], 2, name)
+            self.assertEqual(recorded[name][metrics.BATCH]["count"], 1, name)
+        received = self.sink.histogram(metrics.RECEIVED_BYTES, "ExecuteQueryRq")
+        self.assertGreater(received.min, 1000)
+        round_trip = self.sink.histogram(metrics.ROUND_TRIP, "ExecuteQueryRq")
+        first_byte = self.sink.histogram(metrics.FIRST_BYTE, "ExecuteQueryRq")
+        self.assertLessEqual(first_byte.sum, round_trip.sum)
+
+    def test_materialize(self):
+        with self.fishbowl_api as fb:
+            fb.send_query = mock.Mock(return_value=[{"id": "1", "num": "P1", "customFields": ""}])
+            fb.get_products_fast(populate_uoms=False)
+        self.assertEqual(self.sink.histogram(metrics.MATERIALIZE, "get_products_fast").count, 1)
@@ -0,0 +1,189 @@
+from __future__ import unicode_literals
+
+import threading
+from unittest import TestCase
+
+from lxml import etree
+
+from fishbowl import api, fakeserver, multiplex, objects
+
+try:
+    from unittest import mock
+except ImportError:  # < Python 3.3
+    import mock
+
+
+class FakeFishbowl:
+    def __init__(self, task_name=None):
+        self.connected = False
+        self.key = None
+        self.active = 0
+
+    def connect(self, **kwargs):
+        self.connected = True
+        self.key = "ABC"
+
+    def close(self, skip_errors=False):
+        self.connected = False
+
+    def send_query(self, query):
+        # Fail if a session were ever used by two threads at once.
+        self.active += 1
+        try:
+            assert self.active == 1, "Session shared between threads"
+            threading.Event().wait(0.001)
+            return iter([{"query": query, "session": id(self)}])
+        finally:
+            self.active -= 1
+
+    def get_part_info(self, partnum):
+        if partnum == "BAD":
+            raise ValueError(partnum)
+        return partnum.lower()
+
+
+class MultiplexedFishbowlTest(TestCase):
+    def setUp(self):
+        self.fishbowl = multiplex.MultiplexedFishbowl(
+            client=FakeFishbowl, max_sessions=3, validate=False, username="test"
+        )
+        self.addCleanup(self.fishbowl.close)
+
+    def test_send_query(self):
+        rows = self.fishbowl.send_query("SELECT 1").result()
+        self.assertEqual(rows[0]["query"], "SELECT 1")
+
+    def test_concurrent(self):
+        futures = [self.fishbowl.send_query("SELECT {}".format(i)) for i in range(50)]
+        rows = [future.result()[0] for future in futures]
+        self.assertEqual(
+            [row["query"] for row in rows], ["SELECT {}".format(i) for i in range(50)]
+        )
+        self.assertLessEqual(len(set(row["session"] for row in rows)), 3)
+        self.assertLessEqual(len(self.fishbowl.pool), 3)
+
+    def test_map(self):
+        self.assertEqual(
+            list(self.fishbowl.map("get_part_info", ["A", "B", "C"])), ["a", "b", "c"]
+        )
+        results = self.fishbowl.map("get_part_info", ["A", "BAD"])
+        self.assertEqual(next(results), "a")
+        with self.assertRaises(ValueError):
+            next(results)
+
+    def test_callable(self):
+        future = self.fishbowl.submit(lambda fb, value: (fb.key, value), 1)
+        self.assertEqual(future.result(), ("ABC", 1))
+
+    def test_close(self):
+        self.fishbowl.send_query("SELECT 1").result()
+        self.fishbowl.close()
+        self.assertEqual(len(self.fishbowl.pool), 0)
+        with self.assertRaises(RuntimeError):
+            self.fishbowl.send_query("SELECT 1")
+
+
+class LazyObjectsTest(TestCase):
+    def setUp(self):
+        server = fakeserver.FishbowlTestServer(parts=5, customers=3).start()
+        self.addCleanup(server.stop)
+        self.fishbowl = multiplex.MultiplexedFishbowl(max_sessions=2, **server.connection_args)
+        self.addCleanup(self.fishbowl.close)
+
+    def test_loaded_after_release(self):
+        customers = self.fishbowl.submit("get_customers").result()
+        # Check the session that created them out again elsewhere.
+        with self.fishbowl.pool.session() as fb:
+            with mock.patch.object(fb, "send_message", side_effect=AssertionError):
+                self.assertTrue(customers[0]["Name"])
+        self.assertEqual(len(self.fishbowl.pool), 2)
+
+
+class ProductFishbowl(FakeFishbowl):
+    def send_request(self, request, value=None, response_node_name=None):
+        number = value["Number"]
+        if number == "BAD":
+            raise api.FishbowlError("Product not found")
+        product = etree.Element("Product")
+        etree.SubElement(product, "Num").text = number
+        etree.SubElement(product, "Description").text = "Thread {}".format(id(self))
+        return product
+
+
+class HydrateTest(TestCase):
+    def setUp(self):
+        self.multiplexer = multiplex.MultiplexedFishbowl(
+            client=ProductFishbowl, max_sessions=3, validate=False
+        )
+        self.addCleanup(self.multiplexer.close)
+        self.fb = api.Fishbowl()
+        self.fb._connected = True
+        numbers = ["P{}".format(i) for i in range(20)] + ["P3", "BAD", ""]
+        self.fb.get_parts = mock.Mock(
+            return_value=[objects.Part({"Num": number}) for number in numbers]
+        )
+
+    def test_get_products(self):
+        progress = []
+        products = self.fb.get_products(
+            lazy=False,
+            multiplexer=self.multiplexer,
+            progress=lambda *args: progress.append(args),
+        )
+        self.assertEqual(
+            [product["Num"] for product in products], ["P{}".format(i) for i in range(20)]
+        )
+        self.assertEqual(products[0].part["Num"], "P0")
+        self.assertEqual([args[:2] for args in progress], [(i, 21) for i in range(1, 22)])
+        self.assertEqual(progress[-1][2], {"Number": "BAD"})
+        self.assertIsInstance(progress[-1][3], api.FishbowlError)
+        self.assertIsNone(progress[0][3])
+
+    def test_failure_raised_without_progress(self):
+        with self.assertRaises(api.FishbowlError):
+            self.fb.get_products(lazy=False, multiplexer=self.multiplexer)
+
+    def test_sequential(self):
+        self.fb.send_request = ProductFishbowl().send_request
+        errors = []
+        products = self.fb.get_products(
+            lazy=False, progress=lambda done, total, value, error: errors.append(error)
+        )
+        self.assertEqual(len(products), 20)
+        self.assertEqual(len([error for error in errors if error]), 1)
+
+    def test_sequential_timeout(self):
+        send_request = ProductFishbowl().send_request
+        self.fb.send_request = mock.Mock(
+            side_effect=lambda *args: (
+                send_request(*args)
+                if args[1]["Number"] != "P2"
+                else self._raise(api.FishbowlTimeoutError("Connection timeout"))
+            )
+        )
+        errors = []
+        with self.assertRaises(api.FishbowlTimeoutError):
+            self.fb.get_products(
+                lazy=False, progress=lambda done, total, value, error: errors.append(error)
+            )
+        # The timeout closed the connection, so nothing more was sent.
+        self.assertEqual(self.fb.send_request.call_count, 3)
+        self.assertEqual(errors, [None, None])
+
+    def _raise(self, error):
+        raise error
+
+    def test_get_customers(self):
+        multiplexer = mock.Mock()
+        customer = etree.fromstring("<Customer><Name>A</Name><Number>1</Number></Customer>")
+        multiplexer.map.return_value = (node for node in [customer, etree.Element("empty")])
+        self.fb._customer_names = mock.Mock(return_value=["A", "Gone"])
+        customers = self.fb.get_customers(lazy=False, multiplexer=multiplexer)
+        self.assertEqual([str(customer) for customer in customers], ["A"])
+        multiplexer.map.assert_called_once_with(
+            "send_request",
+            ("CustomerGetRq", "CustomerGetRq"),
+            ({"Name": "A"}, {"Name": "Gone"}),
+            ("CustomerGetRs", "CustomerGetRs"),
+            return_exceptions=True,
+        )
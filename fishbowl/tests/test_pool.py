@@ -0,0 +1,148 @@
+from __future__ import unicode_literals
+
+import socket
+import threading
+from unittest import TestCase
+
+from fishbowl import api, pool
+
+try:
+    from unittest import mock
+except ImportError:  # < Python 3.3
+    import mock
+
+
+class FakeFishbowl:
+    instances = []
+
+    def __init__(self, task_name=None):
+        self.task_name = task_name
+        self.connected = False
+        self.key = None
+        self.stream = mock.MagicMock()
+        self.stream.recv.side_effect = BlockingIOError()
+        FakeFishbowl.instances.append(self)
+
+    def connect(self, **kwargs):
+        self.connect_kwargs = kwargs
+        self.connected = True
+        self.key = "ABC"
+
+    def close(self, skip_errors=False):
+        self.connected = False
+        self.key = None
+
+
+class SessionPoolTest(TestCase):
+    def setUp(self):
+        FakeFishbowl.instances = []
+        self.pool = pool.SessionPool(
+            client=FakeFishbowl, task_name="pooled", max_size=2, username="test", host="localhost"
+        )
+
+    def test_reuse(self):
+        fb = self.pool.acquire()
+        self.assertEqual(fb.connect_kwargs, {"username": "test", "host": "localhost"})
+        self.assertEqual(fb.task_name, "pooled")
+        self.pool.release(fb)
+        self.assertIs(self.pool.acquire(), fb)
+        self.assertEqual(len(FakeFishbowl.instances), 1)
+        self.assertEqual(self.pool.stats.hits, 1)
+        self.assertEqual(self.pool.stats.misses, 1)
+        self.assertEqual(self.pool.stats.hit_rate, 0.5)
+
+    def test_max_size(self):
+        self.pool.timeout = 0
+        self.pool.acquire()
+        self.pool.acquire()
+        self.assertRaises(pool.FishbowlPoolTimeout, self.pool.acquire)
+        self.assertEqual(self.pool.stats.timeouts, 1)
+        self.assertEqual(len(self.pool), 2)
+
+    def test_wait_for_release(self):
+        self.pool.max_size = 1
+        fb = self.pool.acquire()
+        timer = threading.Timer(0.05, self.pool.release, [fb])
+        timer.start()
+        self.assertIs(self.pool.acquire(), fb)
+        timer.join()
+        self.assertEqual(self.pool.stats.waits, 1)
+
+    def test_broken_session_discarded(self):
+        fb = self.pool.acquire()
+        self.pool.release(fb)
+        # A closed peer reads as an empty response.
+        fb.stream.recv.side_effect = None
+        fb.stream.recv.return_value = b""
+        new_fb = self.pool.acquire()
+        self.assertIsNot(new_fb, fb)
+        self.assertFalse(fb.connected)
+        self.assertEqual(self.pool.stats.discards, 1)
+        fb.stream.recv.assert_called_with(1, socket.MSG_PEEK)
+
+    def test_idle_eviction(self):
+        self.pool.max_idle = 0
+        fb = self.pool.acquire()
+        self.pool.release(fb)
+        self.assertIsNot(self.pool.acquire(), fb)
+        self.assertFalse(fb.connected)
+        self.assertEqual(self.pool.stats.evictions, 1)
+
+    def test_release_discard(self):
+        fb = self.pool.acquire()
+        self.pool.release(fb, discard=True)
+        self.assertFalse(fb.connected)
+        self.assertEqual(len(self.pool), 0)
+        self.assertRaises(ValueError, self.pool.release, fb)
+
+    def test_session_lost_discarded(self):
+        with self.assertRaises(api.FishbowlError):
+            with self.pool.session() as fb:
+                raise api.FishbowlError("Invalid ticket", code="1130")
+        self.assertEqual(len(self.pool), 0)
+        with self.assertRaises(api.FishbowlError):
+            with self.pool.session() as other:
+                raise api.FishbowlError("Not found", code="2000")
+        self.assertIsNot(other, fb)
+        self.assertEqual((self.pool.idle, self.pool.stats.discards), (1, 1))
+
+    def test_session_factory(self):
+        fb = self.pool.acquire()
+        self.assertEqual(fb.session_factory, self.pool.session)
+        self.pool.release(fb)
+        self.assertIsNone(fb.session_factory)
+
+    def test_failed_login_frees_slot(self):
+        self.pool.max_size = 1
+        with mock.patch.object(FakeFishbowl, "connect", side_effect=OSError()):
+            self.assertRaises(OSError, self.pool.acquire)
+        self.assertEqual(len(self.pool), 0)
+        self.pool.acquire()
+
+    def test_close(self):
+        fb = self.pool.acquire()
+        self.pool.release(fb)
+        self.pool.close()
+        self.assertFalse(fb.connected)
+        self.assertRaises(pool.FishbowlError, self.pool.acquire)
+
+
+class PooledFishbowlAPITest(TestCase):
+    def setUp(self):
+        FakeFishbowl.instances = []
+        self.api = pool.PooledFishbowlAPI(username="test", password="pw", max_size=1)
+        self.api.pool.client = FakeFishbowl
+
+    def test_context(self):
+        with self.api as fb:
+            self.assertTrue(fb.connected)
+        with self.api as fb2:
+            self.assertIs(fb2, fb)
+        self.assertEqual(self.api.stats.hits, 1)
+
+    def test_context_connection_error(self):
+        with self.assertRaises(OSError):
+            with self.api as fb:
+                raise OSError()
+        self.assertFalse(fb.connected)
+        self.assertEqual(self.api.pool.idle, 0)
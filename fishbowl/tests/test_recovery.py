@@ -0,0 +1,123 @@
+from __future__ import unicode_literals
+
+from unittest import TestCase
+
+from fishbowl import api, fakeserver, metrics, recovery, statuscodes, xmlrequests
+
+
+class StatusTest(TestCase):
+    def test_classification(self):
+        for code in ("1002", "1010", "1130", "1131", 1130, "1162"):
+            self.assertTrue(statuscodes.is_retryable(code), code)
+        for code in ("1000", "1004", "1120", "2100", None):
+            self.assertFalse(statuscodes.is_retryable(code), code)
+        self.assertTrue(api.FishbowlTimeoutError("Timeout").retryable)
+        self.assertTrue(api.FishbowlConnectionError("Closed").retryable)
+        self.assertFalse(api.FishbowlError("Error").retryable)
+
+    def test_check_status_code(self):
+        el = xmlrequests.etree.Element("FbiMsgsRs", statusCode="1131")
+        with self.assertRaises(api.FishbowlError) as cm:
+            api.check_status(el)
+        self.assertEqual(cm.exception.code, "1131")
+        self.assertEqual(str(cm.exception), statuscodes.CODES["1131"])
+        self.assertTrue(cm.exception.retryable)
+
+    def test_with_key(self):
+        compiled = xmlrequests.simple_request("ProductGetRq", {"Number": "B1"}, key="old")
+        self.assertEqual(
+            xmlrequests.with_key(compiled, "new").request,
+            xmlrequests.simple_request("ProductGetRq", {"Number": "B1"}, key="new").request,
+        )
+        request = xmlrequests.SimpleRequest("UOMRq", key="old")
+        self.assertIn(b"<Key>new</Key>", xmlrequests.with_key(request, "new").request)
+        self.assertIn(b"<Key>new</Key>", xmlrequests.with_key(request.request, "new"))
+
+    def test_delay(self):
+        policy = recovery.SessionRecovery(backoff=0.5, max_backoff=3)
+        self.assertEqual([policy.delay(i) for i in range(1, 5)], [0.5, 1.0, 2.0, 3])
+
+
+class SessionRecoveryTest(TestCase):
+    def start(self, attempts=3, **kwargs):
+        server = fakeserver.FishbowlTestServer(parts=20, customers=5, **kwargs).start()
+        self.addCleanup(server.stop)
+        self.recovery = recovery.SessionRecovery(attempts=attempts, backoff=0)
+        self.sink = metrics.HistogramSink()
+        fishbowl_api = api.FishbowlAPI(
+            recovery=self.recovery, metrics=self.sink, **server.connection_args
+        )
+        return server, fishbowl_api
+
+    def test_expired_ticket(self):
+        server, fishbowl_api = self.start()
+        with fishbowl_api as fb:
+            self.assertEqual(len(list(fb.send_query("SELECT * FROM part"))), 20)
+            server.expire_sessions()
+            self.assertEqual(len(list(fb.send_query("SELECT * FROM part"))), 20)
+            server.expire_sessions()
+            self.assertEqual(len(list(fb.iter_query("SELECT * FROM part"))), 20)
+            server.expire_sessions()
+            customer = fb.send_request(
+                "CustomerGetRq", {"Name": "Customer 000001"}, response_node_name="CustomerGetRs"
+            )
+            self.assertEqual(customer.findtext("Name"), "Customer 000001")
+        stats = self.recovery.stats
+        self.assertEqual((stats.recoveries, stats.retries, stats.gave_up), (3, 3, 0))
+        self.assertEqual(stats.causes, {"1130": 3})
+        self.assertEqual(server.stats["LoginRq"], 5)
+        self.assertEqual(self.sink.histogram(metrics.RECOVERY).count, 3)
+        self.assertEqual(self.sink.histogram(metrics.RECOVERY, "ExecuteQueryRq").count, 2)
+
+    def test_mutation_not_retried(self):
+        server, fishbowl_api = self.start()
+        rows = [("PartNumber", "PartDescription"), ("B1", "Part 1")]
+        with fishbowl_api as fb:
+            server.expire_sessions()
+            with self.assertRaises(api.FishbowlError) as cm:
+                fb.run_import("ImportPart", api.format_rows(rows))
+            self.assertEqual(cm.exception.code, "1130")
+            # The connection logged in again, so can be used for the next
+            # request.
+            self.assertEqual(len(list(fb.send_query("SELECT * FROM part"))), 20)
+        self.assertEqual(server.stats["ImportRq"], 1)
+        self.assertFalse(server.imported)
+        stats = self.recovery.stats
+        self.assertEqual((stats.not_retried, stats.recoveries, stats.retries), (1, 1, 0))
+
+    def test_dropped_connections(self):
+        server, fishbowl_api = self.start(
+            attempts=10, faults=fakeserver.Faults(drop_rate=0.3, seed=1)
+        )
+        with fishbowl_api as fb:
+            for _ in range(20):
+                self.assertEqual(len(list(fb.send_query("SELECT * FROM part"))), 20)
+        stats = self.recovery.stats
+        self.assertEqual(stats.retries, server.stats["drop"])
+        self.assertGreater(stats.retries, 0)
+        self.assertEqual(stats.causes, {"FishbowlConnectionError": stats.retries})
+
+    def test_gives_up(self):
+        server, fishbowl_api = self.start(attempts=2, faults=fakeserver.Faults(drop_rate=1))
+        with self.assertRaises(api.FishbowlConnectionError):
+            with fishbowl_api as fb:
+                fb.send_query("SELECT * FROM part")
+        self.assertEqual(server.stats["ExecuteQueryRq"], 3)
+        stats = self.recovery.stats
+        self.assertEqual((stats.retries, stats.gave_up), (2, 1))
+
+    def test_fatal_errors(self):
+        server, fishbowl_api = self.start()
+        with fishbowl_api.session() as fb:
+            with self.assertRaises(api.FishbowlError) as cm:
+                fb.send_request(
+                    "CustomerGetRq", {"Name": "Nobody"}, response_node_name="CustomerGetRs"
+                )
+            self.assertFalse(cm.exception.retryable)
+            server.expire_sessions()
+            server.password = "changed"
+            with self.assertRaises(api.FishbowlError) as cm:
+                fb.send_query("SELECT * FROM part")
+            self.assertEqual(cm.exception.code, "1120")
+        self.assertEqual(server.stats["CustomerGetRq"], 1)
+        self.assertEqual(self.recovery.stats.failed_logins, 1)
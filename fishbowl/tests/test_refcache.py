@@ -0,0 +1,140 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from unittest import TestCase
+
+from lxml import etree
+
+from fishbowl import api, refcache
+
+try:
+    from unittest import mock
+except ImportError:  # < Python 3.3
+    import mock
+
+UOM_RESPONSE = b"""
+<UOMRs statusCode="1000">
+<UOM><UOMID>1</UOMID><Name>Each</Name><Code>ea</Code><Active>true</Active></UOM>
+<UOM><UOMID>2</UOMID><Name>Pound</Name><Code>lbs</Code><Active>true</Active></UOM>
+</UOMRs>
+"""
+
+
+class FakeFishbowl:
+    def __init__(self):
+        self.fetches = []
+
+    def fetch_reference(self, name, serializable=False):
+        self.fetches.append(name)
+        return [{"id": str(len(self.fetches)), "name": name}]
+
+
+class ReferenceCacheTest(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, "cache.sqlite3")
+        self.fb = FakeFishbowl()
+
+    def make_cache(self, **kwargs):
+        cache = refcache.ReferenceCache(self.path, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_read_through(self):
+        cache = self.make_cache()
+        self.assertEqual(cache.get("states", self.fb), [{"id": "1", "name": "states"}])
+        self.assertEqual(cache.get("states", self.fb), [{"id": "1", "name": "states"}])
+        self.assertEqual(self.fb.fetches, ["states"])
+        # A new process reads the same database.
+        other = self.make_cache()
+        self.assertEqual(other.get("states", self.fb), [{"id": "1", "name": "states"}])
+        self.assertEqual(self.fb.fetches, ["states"])
+
+    def test_unknown(self):
+        with self.assertRaises(KeyError):
+            self.make_cache().get("orders", self.fb)
+
+    def test_no_connection(self):
+        cache = self.make_cache()
+        with self.assertRaises(ValueError):
+            cache.get("states")
+        cache.get("states", self.fb)
+        self.assertEqual(cache.get("states"), [{"id": "1", "name": "states"}])
+
+    def test_ttl(self):
+        cache = self.make_cache(ttl=60, ttls={"uoms": 0})
+        cache.get("uoms", self.fb)
+        cache.get("uoms", self.fb)
+        cache.get("states", self.fb)
+        cache.get("states", self.fb)
+        self.assertEqual(self.fb.fetches, ["uoms", "uoms", "states"])
+
+    def test_invalidate(self):
+        cache = self.make_cache()
+        cache.get("uoms", self.fb)
+        cache.get("states", self.fb)
+        cache.invalidate("uoms")
+        cache.get("uoms", self.fb)
+        cache.get("states", self.fb)
+        self.assertEqual(self.fb.fetches, ["uoms", "states", "uoms"])
+        cache.invalidate()
+        cache.get("states", self.fb)
+        self.assertEqual(self.fb.fetches, ["uoms", "states", "uoms", "states"])
+
+    def test_background_refresh(self):
+        background = FakeFishbowl()
+
+        @contextmanager
+        def session_factory():
+            yield background
+
+        cache = self.make_cache(ttl=0, session_factory=session_factory)
+        # Nothing cached yet, so this has to wait for a fetch.
+        self.assertEqual(cache.get("taxrates", self.fb)[0]["id"], "1")
+        # Expired data is returned as is while it is refreshed.
+        with mock.patch.object(cache, "refresh_in_background") as refresh_in_background:
+            self.assertEqual(cache.get("taxrates", self.fb)[0]["id"], "1")
+        refresh_in_background.assert_called_once_with(["taxrates"])
+        cache.refresh_in_background(["taxrates"]).join()
+        self.assertEqual(self.fb.fetches, ["taxrates"])
+        self.assertEqual(background.fetches, ["taxrates"])
+
+    def test_warm(self):
+        @contextmanager
+        def session_factory():
+            yield self.fb
+
+        cache = self.make_cache(session_factory=session_factory)
+        cache.get("uoms")
+        cache.warm(wait=True)
+        self.assertEqual(sorted(self.fb.fetches), sorted(refcache.REFERENCE_NAMES))
+        self.assertIsNone(cache.warm())
+
+
+class ReferenceCacheAPITest(TestCase):
+    def test_uom_map(self):
+        cache = refcache.ReferenceCache()
+        self.addCleanup(cache.close)
+        fb = api.Fishbowl()
+        fb._connected = True
+        fb.reference_cache = cache
+        fb.send_request = mock.Mock(return_value=etree.fromstring(UOM_RESPONSE))
+        self.assertEqual(fb.get_uom_map()[2]["Code"], "lbs")
+        uom_map = fb.get_uom_map()
+        self.assertEqual(fb.send_request.call_count, 1)
+        self.assertEqual(sorted(uom_map), [1, 2])
+        self.assertEqual(
+            uom_map[1].squash(), {"UOMID": 1, "Name": "Each", "Code": "ea", "Active": True}
+        )
+
+    def test_fishbowl_api(self):
+        cache = refcache.ReferenceCache()
+        self.addCleanup(cache.close)
+        with mock.patch.object(api.Fishbowl, "connect"):
+            with mock.patch.object(api.Fishbowl, "close"):
+                with api.FishbowlAPI(reference_cache=cache) as fb:
+                    self.assertIs(fb.reference_cache, cache)
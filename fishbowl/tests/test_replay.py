@@ -0,0 +1,116 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from fishbowl import api, fakeserver, pool, replay, xmlrequests
+
+
+class ScrubTest(TestCase):
+    def test_xml(self):
+        login = xmlrequests.Login("admin", "secret", key="abc123").request
+        scrubbed = replay.scrub(login)
+        self.assertNotIn(b"secret", scrubbed)
+        self.assertNotIn(b"abc123", scrubbed)
+        self.assertIn(b"<Key>scrubbed</Key>", scrubbed)
+        self.assertIn(b"<UserPassword>scrubbed</UserPassword>", scrubbed)
+        # The logout's empty password is left alone.
+        logout = xmlrequests.Login("admin", "").request
+        self.assertIn(b"<UserPassword></UserPassword>", replay.scrub(logout))
+
+    def test_json(self):
+        scrubbed = replay.scrub(b'{"Ticket": {"Key": "abc123"}, "UserPassword":"secret"}')
+        self.assertEqual(scrubbed, b'{"Ticket": {"Key": "scrubbed"}, "UserPassword":"scrubbed"}')
+
+
+class RecordReplayTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "traffic.gz")
+
+    def load(self, fb):
+        return (
+            fb.get_products_fast(),
+            fb.get_customers_fast(),
+            fb.get_pricing_rules(),
+        )
+
+    def test_round_trip(self):
+        recorder = replay.Recorder()
+        with fakeserver.FishbowlTestServer(parts=30, customers=4) as server:
+            with api.FishbowlAPI(transport=recorder, **server.connection_args) as fb:
+                products, customers, rules = self.load(fb)
+                key = fb.key
+        recorder.save(self.path)
+        with open(self.path, "rb") as f:
+            self.assertNotIn(key.encode("ascii"), f.read())
+
+        exchanges = replay.load_archive(self.path)
+        self.assertEqual(exchanges[0].request_type, "LoginRq")
+        self.assertGreater(exchanges[0].duration, 0)
+
+        # The server has gone, but its responses haven't.
+        connection_args = dict(server.connection_args, password="anything")
+        replayer = replay.Replayer.load(self.path)
+        for _ in range(2):
+            with api.FishbowlAPI(transport=replayer, **connection_args) as fb:
+                replayed = self.load(fb)
+            self.assertEqual([p.mapped for p in replayed[0]], [p.mapped for p in products])
+            self.assertEqual([c.mapped for c in replayed[1]], [c.mapped for c in customers])
+            self.assertEqual(
+                dict((customer, len(rules)) for customer, rules in replayed[2].items()),
+                dict((customer, len(rules)) for customer, rules in rules.items()),
+            )
+
+    def test_unrecorded_request(self):
+        with fakeserver.FishbowlTestServer(parts=5) as server:
+            recorder = replay.Recorder()
+            with api.FishbowlAPI(transport=recorder, **server.connection_args) as fb:
+                fb.get_uom_map()
+        replayer = replay.Replayer(recorder.exchanges)
+        with self.assertRaises(replay.ReplayError):
+            with api.FishbowlAPI(transport=replayer, **server.connection_args) as fb:
+                fb.send_query("SELECT * FROM part")
+
+    def test_pooled(self):
+        with fakeserver.FishbowlTestServer(parts=5) as server:
+            recorder = replay.Recorder()
+            with api.FishbowlAPI(transport=recorder, **server.connection_args) as fb:
+                fb.get_uom_map()
+        fishbowl_api = pool.PooledFishbowlAPI(
+            transport=replay.Replayer(recorder.exchanges), **server.connection_args
+        )
+        for _ in range(2):
+            with fishbowl_api as fb:
+                self.assertEqual(len(fb.get_uom_map()), 3)
+        self.assertEqual((fishbowl_api.stats.misses, fishbowl_api.stats.hits), (1, 1))
+
+
+class PacedReplayTest(TestCase):
+    def test_time_scale(self):
+        request = xmlrequests.SimpleRequest("UOMRq", key="abc").request
+        response = b"<FbiXml>" + b" " * 1000 + b"</FbiXml>"
+        exchange = replay.Exchange(request, response, first_byte=0.05, duration=0.1)
+        for time_scale, minimum, maximum in ((None, 0, 0.04), (1, 0.1, 0.5), (0.5, 0.05, 0.09)):
+            stream = replay.Replayer([exchange], time_scale=time_scale).open(None)
+            started = time.perf_counter()
+            stream.send(replay.pack(request))
+            received = bytearray()
+            while len(received) < len(response) + 4:
+                received += stream.recv(64)
+            elapsed = time.perf_counter() - started
+            self.assertEqual(bytes(received), replay.pack(response))
+            self.assertTrue(minimum <= elapsed <= maximum, (time_scale, elapsed))
+
+    def test_stream_alive(self):
+        request = xmlrequests.SimpleRequest("UOMRq", key="abc").request
+        stream = replay.Replayer([replay.Exchange(request, b"<FbiXml/>")]).open(None)
+        self.assertTrue(pool.stream_alive(stream))
+        stream.send(replay.pack(request))
+        self.assertFalse(pool.stream_alive(stream))
+        stream.close()
+        self.assertFalse(pool.stream_alive(stream))
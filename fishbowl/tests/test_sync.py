@@ -0,0 +1,115 @@
+from __future__ import unicode_literals
+
+from datetime import datetime
+from unittest import TestCase
+
+from fishbowl import api, objects, sync
+
+try:
+    from unittest import mock
+except ImportError:  # < Python 3.3
+    import mock
+
+
+class ModifiedSinceQueryTest(TestCase):
+    def test_query(self):
+        self.assertEqual(
+            api.modified_since_query("SELECT * FROM Part;", datetime(2019, 6, 1, 10, 30)),
+            "SELECT * FROM (SELECT * FROM Part) q "
+            "WHERE q.dateLastModified >= '2019-06-01 10:30:00.000000'",
+        )
+
+    def test_string_watermark(self):
+        self.assertEqual(
+            api.modified_since_query("SELECT 1", "2019-06-01T10:30:00", column="changed"),
+            "SELECT * FROM (SELECT 1) q WHERE q.changed >= '2019-06-01 10:30:00.000000'",
+        )
+        with self.assertRaises(ValueError):
+            api.modified_since_query("SELECT 1", "2019'; DROP TABLE Part")
+
+    def test_latest_modified(self):
+        parts = [
+            objects.Part({"PartID": "1", "DateLastModified": "2019-06-02T00:00:00"}),
+            objects.Part({"PartID": "2"}),
+        ]
+        self.assertEqual(api.latest_modified(parts), datetime(2019, 6, 2))
+        self.assertEqual(api.latest_modified(parts, datetime(2020, 1, 1)), datetime(2020, 1, 1))
+        self.assertIsNone(api.latest_modified([]))
+
+
+class IncrementalLoaderTest(TestCase):
+    def setUp(self):
+        self.fb = api.Fishbowl()
+        self.fb._connected = True
+
+    def test_customers(self):
+        customers = [{"id": "1", "accountId": "7", "name": "A", "dateLastModified": ""}]
+        addresses = [{"id": "3", "accountId": "7", "countryId": "", "stateId": "", "name": "X"}]
+        queries = []
+
+        def iter_query(sql):
+            queries.append(sql)
+            return iter(addresses if "ADDRESS" in sql else customers)
+
+        self.fb.iter_query = iter_query
+        self.fb.send_query = mock.Mock(return_value=[])
+        result = self.fb.get_customers_fast(modified_since=datetime(2019, 1, 1))
+        self.assertEqual([customer["Name"] for customer in result], ["A"])
+        self.assertEqual(
+            queries,
+            [
+                "SELECT * FROM (SELECT * FROM CUSTOMER) q "
+                "WHERE q.dateLastModified >= '2019-01-01 00:00:00.000000'",
+                "SELECT * FROM ADDRESS WHERE accountId IN (7)",
+            ],
+        )
+
+    def test_customers_unchanged(self):
+        self.fb.iter_query = mock.Mock(return_value=iter([]))
+        self.fb.send_query = mock.Mock()
+        self.assertEqual(self.fb.get_customers_fast(modified_since=datetime(2019, 1, 1)), [])
+        self.assertEqual(self.fb.iter_query.call_count, 1)
+        self.fb.send_query.assert_not_called()
+
+
+class SnapshotTest(TestCase):
+    def test_sync(self):
+        fb = mock.Mock()
+        fb.get_parts_all.side_effect = [
+            [
+                objects.Part(
+                    {"PartID": "1", "Num": "A", "DateLastModified": "2019-06-01T00:00:00"}
+                ),
+                objects.Part(
+                    {"PartID": "2", "Num": "B", "DateLastModified": "2019-06-02T00:00:00"}
+                ),
+            ],
+            [
+                objects.Part(
+                    {"PartID": "1", "Num": "A2", "DateLastModified": "2019-06-03T00:00:00"}
+                )
+            ],
+            [],
+        ]
+        snapshot = sync.Snapshot("parts", compact=True)
+        self.assertEqual(len(snapshot.sync(fb)), 2)
+        fb.get_parts_all.assert_called_with(modified_since=None, compact=True)
+        self.assertEqual(snapshot.watermark, datetime(2019, 6, 2))
+
+        self.assertEqual(len(snapshot.sync(fb)), 1)
+        fb.get_parts_all.assert_called_with(modified_since=datetime(2019, 6, 2), compact=True)
+        self.assertEqual(snapshot[1]["Num"], "A2")
+        self.assertEqual(snapshot[2]["Num"], "B")
+        self.assertEqual(snapshot.watermark, datetime(2019, 6, 3))
+
+        self.assertEqual(snapshot.sync(fb), [])
+        self.assertEqual(snapshot.watermark, datetime(2019, 6, 3))
+        self.assertEqual(len(snapshot), 2)
+
+        snapshot.reset()
+        self.assertEqual(len(snapshot), 0)
+        self.assertIsNone(snapshot.watermark)
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            sync.Snapshot("orders")
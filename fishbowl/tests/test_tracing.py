@@ -0,0 +1,108 @@
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from fishbowl import api, fakeserver, tracing
+
+
+def children(spans, parent):
+    return [span["name"] for span in spans if span["parent_id"] == parent["span_id"]]
+
+
+def find(spans, name):
+    return [span for span in spans if span["name"] == name]
+
+
+class TracerTest(TestCase):
+    def test_nesting(self):
+        spans = []
+        tracer = tracing.Tracer(spans.append)
+        with tracer.span("outer", size=1) as outer:
+            with tracer.span("inner") as inner:
+                inner.set(rows=2)
+            self.assertIs(tracer.current(), outer)
+        self.assertIsNone(tracer.current())
+        self.assertEqual([span["name"] for span in spans], ["inner", "outer"])
+        self.assertEqual(spans[0]["parent_id"], spans[1]["span_id"])
+        self.assertEqual(spans[0]["trace_id"], spans[1]["trace_id"])
+        self.assertEqual(spans[0]["attributes"], {"rows": 2})
+        self.assertGreaterEqual(spans[1]["duration"], spans[0]["duration"])
+
+    def test_error(self):
+        spans = []
+        tracer = tracing.Tracer(spans.append)
+        with self.assertRaises(ValueError):
+            with tracer.span("failing"):
+                raise ValueError("bad")
+        self.assertEqual(spans[0]["error"], "ValueError('bad')")
+
+    def test_profile(self):
+        spans = []
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        tracer = tracing.Tracer(spans.append, profile=["outer"], profile_dir=directory)
+        with tracer.span("outer"):
+            with tracer.span("inner"):
+                sorted(range(1000), key=str)
+        inner, outer = spans
+        self.assertNotIn("profile", inner)
+        self.assertIn("function calls", outer["profile"]["summary"])
+        self.assertTrue(os.path.exists(outer["profile"]["path"]))
+
+    def test_jsonl(self):
+        out = io.StringIO()
+        tracer = tracing.Tracer(tracing.JSONLSink(out))
+        with tracer.span("one"):
+            pass
+        with tracer.span("two"):
+            pass
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+
+class TracedFishbowlTest(TestCase):
+    def setUp(self):
+        server = fakeserver.FishbowlTestServer(parts=20, customers=5).start()
+        self.addCleanup(server.stop)
+        self.spans = []
+        self.fishbowl_api = api.FishbowlAPI(
+            tracer=tracing.Tracer(self.spans.append), **server.connection_args
+        )
+
+    def test_customers_fast(self):
+        with self.fishbowl_api as fb:
+            customers = fb.get_customers_fast()
+        self.assertEqual(len(customers), 5)
+        (loader,) = find(self.spans, "get_customers_fast")
+        self.assertEqual(
+            children(self.spans, loader),
+            ["send_query", "send_query", "iter_query", "iter_query", "materialize"],
+        )
+        customer_query = find(self.spans, "iter_query")[1]
+        self.assertEqual(customer_query["attributes"]["query"], "SELECT * FROM CUSTOMER")
+        self.assertEqual(customer_query["attributes"]["rows"], 5)
+        self.assertEqual(children(self.spans, customer_query), ["send_message", "parse_rows"])
+        (message,) = [
+            span
+            for span in find(self.spans, "send_message")
+            if span["parent_id"] == customer_query["span_id"]
+        ]
+        self.assertTrue(message["attributes"]["streamed"])
+        self.assertGreater(message["attributes"]["received_bytes"], 100)
+        self.assertEqual(find(self.spans, "materialize")[0]["attributes"], {"objects": 5})
+
+    def test_send_query(self):
+        with self.fishbowl_api as fb:
+            self.assertEqual(len(fb.send_query("SELECT * FROM part")), 20)
+        (query,) = find(self.spans, "send_query")
+        self.assertEqual(query["attributes"]["rows"], 20)
+        self.assertEqual(children(self.spans, query), ["send_message", "parse_rows"])
+        message = find(self.spans, "send_message")[1]
+        self.assertEqual(children(self.spans, message), ["read_response", "parse"])
+        self.assertEqual(message["attributes"]["request_type"], "ExecuteQueryRq")
+        self.assertGreater(message["attributes"]["sent_bytes"], 0)
+        (read,) = [span for span in self.spans if span["parent_id"] == message["span_id"]][:1]
+        self.assertEqual(message["attributes"]["received_bytes"], read["attributes"]["bytes"])
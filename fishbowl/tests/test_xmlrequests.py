@@ -1,7 +1,9 @@
 from __future__ import unicode_literals
 
+import datetime
 from unittest import TestCase
 from lxml import etree
+from fishbowl import xmlrequests
 from fishbowl.xmlrequests import Request
 
 
@@ -18,3 +20,47 @@ class XMLRequestsTest(TestCase):
         self.assertEqual(
             etree.tostring(r.el_request), b"<FbiMsgsRq><test>&#8226;</test></FbiMsgsRq>"
         )
+
+
+class RequestTemplateTest(TestCase):
+    def assertSameRequest(self, name, value, key="ABC+/="):
+        expected = xmlrequests.SimpleRequest(name, value, key=key)
+        compiled = xmlrequests.simple_request(name, value, key=key)
+        self.assertIsInstance(compiled, xmlrequests.CompiledRequest)
+        self.assertEqual(compiled.request, etree.tostring(expected.el_root))
+        self.assertEqual(compiled.body, etree.tostring(expected.el_request[0]))
+        self.assertEqual(compiled.request_type, name)
+
+    def test_matches_simple_request(self):
+        for value in (
+            "SELECT * FROM part WHERE num = 'A&B' AND qty < 5 > 2",
+            "café • \U0001f600",
+            "line\r\nbreak\ttab ]]>",
+            "",
+            None,
+            12,
+            datetime.datetime(2020, 1, 2, 3, 4, 5),
+        ):
+            self.assertSameRequest("ExecuteQueryRq", {"Query": value})
+            self.assertSameRequest("CustomerGetRq", {"Name": value})
+
+    def test_fallback(self):
+        for name, value, key in (
+            ("UOMRq", None, "ABC"),
+            ("ProductGetRq", {"Number": "B201", "GetImage": "false"}, "ABC"),
+            ("ProductGetRq", "B201", "ABC"),
+        ):
+            self.assertIsInstance(
+                xmlrequests.simple_request(name, value, key=key), xmlrequests.SimpleRequest
+            )
+        with self.assertRaises(TypeError):
+            xmlrequests.simple_request("ProductGetRq", {"Number": "B201"})
+
+    def test_invalid_text(self):
+        with self.assertRaises(ValueError):
+            xmlrequests.simple_request("CustomerGetRq", {"Name": "A\x00"}, key="ABC")
+
+    def test_el_request(self):
+        compiled = xmlrequests.simple_request("InvQtyRq", {"PartNum": "B201"}, key="ABC")
+        batch = xmlrequests.BatchRequest([compiled, compiled], key="ABC")
+        self.assertEqual([el.findtext("PartNum") for el in batch.el_request], ["B201", "B201"])
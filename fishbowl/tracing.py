@@ -0,0 +1,226 @@
+"""
+Nested span tracing of request lifecycles, with optional profiling.
+
+Setting a connection's ``tracer`` records a span for each stage of a call:
+the loader (``get_customers_fast``...), each query (``send_query`` or
+``iter_query``), each message (``send_message``) and its ``read_response`` and
+``parse`` stages, parsing the query rows (``parse_rows``) and building the
+objects (``materialize``). Spans carry their byte and row counts.
+
+Example usage::
+
+    from fishbowl.api import FishbowlAPI
+    from fishbowl.tracing import JSONLSink, Tracer
+
+    tracer = Tracer(JSONLSink("trace.jsonl"), profile=["get_customers_fast"])
+    with FishbowlAPI(tracer=tracer, **connection_args) as connection:
+        customers = connection.get_customers_fast()
+
+Each finished span is passed to the sink (any callable) as a dictionary::
+
+    {"trace_id": 1, "span_id": 3, "parent_id": 2, "name": "send_message",
+     "start": 1571234567.8, "duration": 0.42, "thread": "MainThread",
+     "attributes": {"request_type": "ExecuteQueryRq", "sent_bytes": 412,
+                    "received_bytes": 1843302}}
+
+Children are emitted before their parents. While tracing, streamed queries
+are read in full inside their span so that the network, parsing and
+materializing stages don't interleave.
+"""
+
+from __future__ import unicode_literals
+
+import cProfile
+import io
+import itertools
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def set(self, **attributes):
+        pass
+
+
+# A span that records nothing, for when tracing is off.
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    A timed stage of a call. Use :meth:`set` to add attributes (such as byte
+    or row counts) before it finishes.
+    """
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.span_id = next(tracer._ids)
+        self.parent_id = None
+        self.trace_id = self.span_id
+        self.start = None
+        self.duration = None
+        self.error = None
+        self.profile = None
+        self._profiler = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.tracer._push(self)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self._started
+        if exc_value is not None:
+            self.error = repr(exc_value)
+        self.tracer._pop(self)
+
+    def as_dict(self):
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "thread": threading.current_thread().name,
+            "attributes": self.attributes,
+        }
+        if self.error is not None:
+            record["error"] = self.error
+        if self.profile is not None:
+            record["profile"] = self.profile
+        return record
+
+
+class Tracer:
+    """
+    Record nested spans, passing each one to a sink when it finishes.
+
+    :param sink: A callable passed the dictionary of each finished span (see
+        :cls:`JSONLSink`)
+    :param profile: Run ``cProfile`` during spans: ``True`` for every
+        outermost span, or the names of the spans to profile. Profiles don't
+        nest, so spans inside a profiled span aren't profiled themselves.
+    :param profile_limit: The number of functions in each profile summary
+    :param profile_dir: Also save each profile's raw stats here, for tools
+        like ``snakeviz``
+    """
+
+    def __init__(self, sink, profile=False, profile_limit=25, profile_dir=None):
+        self.sink = sink
+        if profile and profile is not True:
+            profile = frozenset(profile)
+        self.profile = profile
+        self.profile_limit = profile_limit
+        self.profile_dir = profile_dir
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+
+    def span(self, name, **attributes):
+        """
+        Return a new span, to be used as a context manager.
+        """
+        return Span(self, name, attributes)
+
+    def current(self):
+        """
+        Return the innermost open span of this thread, or ``None``.
+        """
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else None
+
+    def _push(self, span):
+        stack = self._local.__dict__.setdefault("stack", [])
+        if stack:
+            span.parent_id = stack[-1].span_id
+            span.trace_id = stack[-1].trace_id
+        stack.append(span)
+        if self._profiling(span):
+            self._local.profiler = span._profiler = cProfile.Profile()
+            span._profiler.enable()
+
+    def _pop(self, span):
+        profiler = span._profiler
+        if profiler is not None:
+            profiler.disable()
+            self._local.profiler = None
+            span.profile = self._summarize(span, profiler)
+        stack = self._local.stack
+        # A generator's span can be closed after spans opened around it.
+        if stack and stack[-1] is span:
+            stack.pop()
+        elif span in stack:
+            stack.remove(span)
+        try:
+            self.sink(span.as_dict())
+        except Exception:
+            logger.exception("Failed to record the %s span", span.name)
+
+    def _profiling(self, span):
+        if not self.profile or getattr(self._local, "profiler", None) is not None:
+            return False
+        return self.profile is True or span.name in self.profile
+
+    def _summarize(self, span, profiler):
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        stats.sort_stats("cumulative").print_stats(self.profile_limit)
+        profile = {"summary": out.getvalue()}
+        if self.profile_dir:
+            path = os.path.join(self.profile_dir, "{}-{}.prof".format(span.span_id, span.name))
+            stats.dump_stats(path)
+            profile["path"] = path
+        return profile
+
+
+class JSONLSink:
+    """
+    A thread safe sink writing each span as a line of JSON.
+
+    :param file: A path to append to, or a text file object
+    """
+
+    def __init__(self, file):
+        if isinstance(file, str):
+            file = open(file, "a", encoding="utf-8")
+            self._owned = True
+        else:
+            self._owned = False
+        self.file = file
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        if self._owned:
+            self.file.close()
+
+
+def read_trace(path):
+    """
+    Read the spans written by a :cls:`JSONLSink`.
+    """
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
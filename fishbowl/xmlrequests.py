@@ -1,6 +1,9 @@
 from __future__ import unicode_literals
 
+import copy
 import datetime
+import functools
+import re
 import struct
 from collections import OrderedDict
 from decimal import Decimal
@@ -114,11 +117,7 @@ class Request(BaseRequest):
         for name, value in elements:
             el = etree.SubElement(parent, name)
             if value is not None:
-                if isinstance(value, datetime.datetime):
-                    value = value.strftime("%Y-%m-%dT%H:%M:%S")
-                else:
-                    value = "%s" % value
-                el.text = value
+                el.text = element_text(value)
 
     def add_request_element(self, name):
         return etree.SubElement(self.el_request, name)
@@ -225,6 +224,200 @@ class SimpleRequest(Request):
                 el.text = str(value)
 
 
+def element_text(value):
+    """
+    Returns a value formatted as the text of a simple request element.
+    """
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S")
+    return "%s" % value
+
+
+_ESCAPED = re.compile("[&<>\r\x80-\U0010ffff]")
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+
+def escape_text(text):
+    """
+    Encode text as the content of an XML element, escaped just as lxml
+    serializes it.
+    """
+    if _INVALID_XML.search(text):
+        raise ValueError(
+            "All strings must be XML compatible: Unicode or ASCII, no NULL bytes or "
+            "control characters"
+        )
+    if _ESCAPED.search(text):
+        text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        text = text.replace("\r", "&#13;")
+        return text.encode("ascii", "xmlcharrefreplace")
+    return text.encode("ascii")
+
+
+class CompiledRequest:
+    """
+    A request rendered straight to bytes by a :cls:`RequestTemplate`.
+
+    The request type is carried along, so the request never needs parsing
+    (``el_request`` is only parsed if something asks for it).
+    """
+
+    __slots__ = ("request", "body", "request_type", "_el_request")
+
+    def __init__(self, request, body, request_type):
+        self.request = request
+        self.body = body
+        self.request_type = request_type
+        self._el_request = None
+
+    @property
+    def el_request(self):
+        if self._el_request is None:
+            self._el_request = etree.fromstring(self.request).find("FbiMsgsRq")
+        return self._el_request
+
+    def __repr__(self):
+        return "<CompiledRequest {}>".format(self.request_type)
+
+
+class RequestTemplate:
+    """
+    A precompiled byte template of a simple request with the given child
+    elements, rendering the same (unindented) XML as :cls:`SimpleRequest`.
+
+    Use :meth:`bind` to get a template with the session key filled in.
+    """
+
+    def __init__(self, request_name, fields=()):
+        self.request_name = request_name
+        self.fields = tuple(fields)
+        self._field_set = frozenset(self.fields)
+        name = request_name.encode("ascii")
+        self._tags = [
+            (b"<" + field + b">", b"</" + field + b">", b"<" + field + b"/>")
+            for field in (field.encode("ascii") for field in self.fields)
+        ]
+        if self.fields:
+            self._open, self._close = b"<" + name + b">", b"</" + name + b">"
+        else:
+            self._open, self._close = b"<" + name + b"/>", b""
+
+    def matches(self, value):
+        """
+        Whether a :cls:`SimpleRequest` value can be rendered by this template.
+        """
+        if not self.fields:
+            return value is None
+        return isinstance(value, dict) and value.keys() == self._field_set
+
+    def render_body(self, value):
+        """
+        Render the request element.
+        """
+        parts = [self._open]
+        for field, (open_tag, close_tag, empty_tag) in zip(self.fields, self._tags):
+            field_value = value[field]
+            if field_value is None:
+                parts.append(empty_tag)
+            else:
+                parts += (open_tag, escape_text(element_text(field_value)), close_tag)
+        parts.append(self._close)
+        return b"".join(parts)
+
+    def bind(self, key):
+        return BoundTemplate(self, key)
+
+
+class BoundTemplate:
+    """
+    A :cls:`RequestTemplate` with the session key baked in.
+    """
+
+    def __init__(self, template, key):
+        self.template = template
+        self.key = key
+        self._prefix = b"<FbiXml><Ticket><Key>%s</Key></Ticket><FbiMsgsRq>" % escape_text(key)
+        self._suffix = b"</FbiMsgsRq></FbiXml>"
+
+    def render(self, value=None):
+        return self.render_compiled(self.template.render_body(value))
+
+    def render_compiled(self, body):
+        """
+        Wrap an already rendered request element.
+        """
+        return CompiledRequest(
+            self._prefix + body + self._suffix, body, self.template.request_name
+        )
+
+
+# Templates of the requests sent most often, by request name.
+TEMPLATES = {
+    "ExecuteQueryRq": RequestTemplate("ExecuteQueryRq", ["Query"]),
+    "CustomerGetRq": RequestTemplate("CustomerGetRq", ["Name"]),
+    "ProductGetRq": RequestTemplate("ProductGetRq", ["Number"]),
+    "InvQtyRq": RequestTemplate("InvQtyRq", ["PartNum"]),
+}
+
+
+@functools.lru_cache(maxsize=256)
+def bound_template(request_name, key):
+    return TEMPLATES[request_name].bind(key)
+
+
+def simple_request(request_name, value=None, key=""):
+    """
+    Return a :cls:`CompiledRequest` if there is a template for the request,
+    otherwise a :cls:`SimpleRequest`.
+    """
+    template = TEMPLATES.get(request_name)
+    if template is None or not key or not template.matches(value):
+        return SimpleRequest(request_name, value, key=key)
+    return bound_template(request_name, key).render(value)
+
+
+def with_key(msg, key):
+    """
+    Return a message (a :cls:`Request`, :cls:`CompiledRequest` or XML bytes)
+    with its session key replaced, such as to send it again after logging in
+    again. A :cls:`Request` is changed in place.
+    """
+    if isinstance(msg, CompiledRequest):
+        return bound_template(msg.request_type, key).render_compiled(msg.body)
+    if isinstance(msg, Request):
+        msg.el_root.find("Ticket/Key").text = key
+        return msg
+    root = etree.fromstring(msg)
+    root.find("Ticket/Key").text = key
+    return etree.tostring(root)
+
+
+class BatchRequest(Request):
+    """
+    Several requests sent together in a single ``FbiMsgsRq``.
+
+    Each added request must contain exactly one request node, which is copied
+    into this request.
+    """
+
+    def __init__(self, requests=(), key=""):
+        Request.__init__(self, key)
+        for request in requests:
+            self.add_request(request)
+
+    def __len__(self):
+        return len(self.el_request)
+
+    def add_request(self, request):
+        if len(request.el_request) != 1:
+            raise ValueError(
+                "Expected a single request node in {} request".format(request.__class__.__name__)
+            )
+        el = copy.deepcopy(request.el_request[0])
+        self.el_request.append(el)
+        return el
+
+
 class ImportListRequest(Request):
     def __init__(self, key=""):
         Request.__init__(self, key)
@@ -313,7 +506,7 @@ class InventoryQuantity(Request):
 
 
 class GetTotalInventory(Request):
-    def __init__(self, partnum, locationgroup):
+    def __init__(self, partnum, locationgroup, key=""):
         Request.__init__(self, key)
         el_rq = self.add_request_element("GetTotalInventoryRq")
         self.add_elements(el_rq, {"PartNumber": partnum, "LocationGroup": locationgroup})